@@ -0,0 +1,109 @@
+"""
+Micro-benchmark: extract_row per event vs extract_batch.
+
+Generates synthetic raw events shaped like the API's dream_event_body
+(plus a share of nested render payloads), checks both paths produce the
+same table, and reports rows/s for each.
+
+    python analytics/bench_extract.py --events 100000 --repeat 3
+"""
+
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+import pyarrow as pa
+
+from dream_rows import DREAMS_SCHEMA, extract_batch, extract_row
+
+REGISTERS = ["Imaginary", "Symbolic", "Real"]
+WISHES = ["direct", "displaced", "inverted", "anxiety", None]
+
+
+def synthetic_events(count: int, nested_fraction: float, seed: int = 0) -> List[bytes]:
+    rnd = random.Random(seed)
+    start = datetime(2023, 1, 1)
+    bodies: List[bytes] = []
+    for i in range(count):
+        dream = {
+            "id": f"dream-{i:08d}",
+            "created_at": str(start + timedelta(seconds=rnd.randint(0, 365 * 86400), microseconds=rnd.randint(0, 999999))),
+            "title": f"Dream {i}",
+            "narrative": " ".join(rnd.choice(["stairs", "ocean", "mother", "train", "teeth", "house"]) for _ in range(60)),
+            "mood": rnd.randint(1, 5),
+            "sleep_quality": rnd.choice([None, 1, 2, 3, 4, 5]),
+            "mbti": rnd.choice([None, "INFP", "ENTJ"]),
+            "listening_to": None,
+            "watching": rnd.choice([None, "Stalker"]),
+            "reading": None,
+            "context_note": None,
+            "spotify_url": None,
+            "letterboxd_url": None,
+            "goodreads_url": None,
+        }
+        event = dream
+        if rnd.random() < nested_fraction:
+            event = {
+                "dream": dream,
+                "render": {
+                    "video_url": rnd.choice([None, f"s3://videos/luma_outputs/{dream['id']}/out.mp4"]),
+                    "psycho_metadata": {
+                        "day_residues": ["a"] * rnd.randint(0, 4),
+                        "key_signifiers": ["b"] * rnd.randint(0, 6),
+                        "register_feel": rnd.choice(REGISTERS),
+                        "wish_fulfillment_type": rnd.choice(WISHES),
+                        "subject_position": "observer",
+                    },
+                },
+            }
+        bodies.append(json.dumps(event).encode("utf-8"))
+    return bodies
+
+
+def run_rows(bodies: List[bytes]) -> pa.Table:
+    return pa.Table.from_pylist([extract_row(json.loads(b)) for b in bodies], schema=DREAMS_SCHEMA)
+
+
+def run_batch(bodies: List[bytes]) -> pa.Table:
+    return extract_batch(bodies)[0]
+
+
+def best_of(fn, bodies: List[bytes], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(bodies)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--nested-fraction", type=float, default=0.3)
+    parser.add_argument("--batch-size", type=int, default=5000,
+                        help="bodies per extract_batch call, as in the materializer")
+    args = parser.parse_args()
+
+    bodies = synthetic_events(args.events, args.nested_fraction)
+    chunks = [bodies[i : i + args.batch_size] for i in range(0, len(bodies), args.batch_size)]
+
+    if not run_rows(bodies).equals(run_batch(bodies)):
+        raise SystemExit("extract_batch output differs from extract_row")
+
+    rows_s = best_of(run_rows, bodies, args.repeat)
+    batch_s = best_of(lambda _: [run_batch(c) for c in chunks], bodies, args.repeat)
+    mb = sum(len(b) for b in bodies) / 1e6
+
+    print(f"{args.events} events, {mb:.1f} MB, best of {args.repeat}")
+    print(f"extract_row   {args.events / rows_s:>12,.0f} rows/s  ({rows_s:.3f}s)")
+    print(f"extract_batch {args.events / batch_s:>12,.0f} rows/s  ({batch_s:.3f}s)")
+    print(f"speedup       {rows_s / batch_s:>12.1f}x")
+
+
+if __name__ == "__main__":
+    main()
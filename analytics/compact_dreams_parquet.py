@@ -0,0 +1,266 @@
+"""
+Compact the structured dreams table.
+
+Every materializer run adds one part file to each partition it touches, so
+busy partitions fill up with small files. This job finds partitions with
+too many small files, merges each into target-size files sorted by
+created_at with duplicate dream_ids removed, and swaps them in through the
+partition manifest before deleting the old files.
+
+    python analytics/compact_dreams_parquet.py --dry-run
+    python analytics/compact_dreams_parquet.py --min-small-files 4
+"""
+
+import argparse
+import io
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+import materialize_dreams_parquet as materializer
+from dream_rollups import refresh_rollup
+from lake_manifest import (
+    ManifestConflict,
+    PartitionManifest,
+    delete_keys,
+    list_partitions,
+    read_partition,
+    read_partition_versioned,
+    write_partition,
+)
+
+SMALL_FILE_BYTES = int(os.getenv("COMPACT_SMALL_FILE_BYTES", str(32 * 1024 * 1024)))
+MIN_SMALL_FILES = int(os.getenv("COMPACT_MIN_SMALL_FILES", "4"))
+TARGET_FILE_BYTES = int(os.getenv("COMPACT_TARGET_FILE_BYTES", str(128 * 1024 * 1024)))
+COMPACT_CONCURRENCY = int(os.getenv("COMPACT_CONCURRENCY", "8"))
+# Manifest swaps retried when a materializer commit races the compaction.
+SWAP_ATTEMPTS = 5
+
+
+@dataclass
+class PartitionPlan:
+    event_date: str
+    files: List[str]
+    sizes: Dict[str, int]
+    small_files: int
+
+    @property
+    def bytes(self) -> int:
+        return sum(self.sizes.get(f, 0) for f in self.files)
+
+    def expected_files(self, target_bytes: int) -> int:
+        return max(1, math.ceil(self.bytes / target_bytes))
+
+
+def file_sizes(event_date: str) -> Dict[str, int]:
+    prefix = f"{materializer.STRUCTURED_PREFIX}event_date={event_date}/"
+    sizes: Dict[str, int] = {}
+    paginator = materializer.get_s3().get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=materializer.BUCKET, Prefix=prefix):
+        for obj in page.get("Contents", []):
+            sizes[obj["Key"]] = obj["Size"]
+    return sizes
+
+
+def plan_partition(event_date: str, small_file_bytes: int, min_small_files: int) -> Optional[PartitionPlan]:
+    manifest = read_partition(materializer.get_s3(), materializer.BUCKET, materializer.STRUCTURED_PREFIX, event_date)
+    if manifest is None or len(manifest.files) < 2:
+        return None
+    sizes = file_sizes(event_date)
+    small = sum(1 for f in manifest.files if sizes.get(f, 0) < small_file_bytes)
+    if small < min_small_files:
+        return None
+    return PartitionPlan(event_date, list(manifest.files), sizes, small)
+
+
+def conform(table: pa.Table) -> pa.Table:
+    """Bring files written before DREAMS_SCHEMA existed onto it."""
+    columns = []
+    for field in materializer.DREAMS_SCHEMA:
+        if field.name in table.column_names:
+            columns.append(table.column(field.name).cast(field.type))
+        else:
+            columns.append(pa.nulls(table.num_rows, field.type))
+    return pa.Table.from_arrays(columns, schema=materializer.DREAMS_SCHEMA)
+
+
+def read_file(key: str) -> pa.Table:
+    body = materializer.get_s3().get_object(Bucket=materializer.BUCKET, Key=key)["Body"].read()
+    return conform(pq.read_table(io.BytesIO(body)))
+
+
+def sort_and_dedupe(table: pa.Table) -> pa.Table:
+    """Sort by created_at and keep the first row per dream_id (rows without an id are kept)."""
+    table = table.sort_by([("created_at", "ascending"), ("dream_id", "ascending")])
+    table = table.append_column("__row", pa.array(range(table.num_rows), pa.int64()))
+    has_id = pc.is_valid(table.column("dream_id"))
+    with_id = table.filter(has_id)
+    first = with_id.group_by("dream_id", use_threads=False).aggregate([("__row", "min")])
+    rows = pa.concat_arrays([
+        first.column("__row_min").combine_chunks(),
+        table.filter(pc.invert(has_id)).column("__row").combine_chunks(),
+    ])
+    rows = rows.take(pc.sort_indices(rows))  # back in created_at order
+    return table.take(rows).drop_columns(["__row"])
+
+
+def compact_partition(
+    plan: PartitionPlan,
+    target_bytes: int,
+    options: materializer.WriteOptions,
+) -> Dict[str, Any]:
+    tables = [read_file(key) for key in plan.files]
+    merged = sort_and_dedupe(pa.concat_tables(tables))
+    input_rows = sum(t.num_rows for t in tables)
+
+    rows_per_file = max(1, math.ceil(merged.num_rows / plan.expected_files(target_bytes)))
+    new_files: List[str] = []
+    try:
+        for offset in range(0, merged.num_rows, rows_per_file):
+            chunk = merged.slice(offset, rows_per_file)
+            key = materializer.write_batches_to_s3(
+                chunk.to_batches(max_chunksize=options.row_group_size), plan.event_date, options
+            )
+            if key:
+                new_files.append(key)
+    except BaseException:
+        delete_keys(materializer.get_s3(), materializer.BUCKET, new_files)
+        raise
+
+    # Swap: re-read the manifest so files a concurrent materializer run
+    # appended after planning are carried over rather than dropped, and
+    # write it only if it is still the version read; a commit that lands
+    # in between makes the write fail and the merge is redone.
+    compacted = set(plan.files)
+    for _ in range(SWAP_ATTEMPTS):
+        current, etag = read_partition_versioned(
+            materializer.get_s3(), materializer.BUCKET, materializer.STRUCTURED_PREFIX, plan.event_date
+        )
+        if current is None or not compacted <= set(current.files):
+            # replaced by a full refresh (or dropped) since planning
+            print(f"Partition {plan.event_date} changed under compaction; skipping it.")
+            delete_keys(materializer.get_s3(), materializer.BUCKET, new_files)
+            return {
+                "event_date": plan.event_date,
+                "files_before": len(plan.files),
+                "files_after": len(plan.files),
+                "bytes_before": plan.bytes,
+                "bytes_after": plan.bytes,
+                "rows_before": input_rows,
+                "rows_after": input_rows,
+            }
+        carried = [f for f in current.files if f not in compacted]
+        manifest = PartitionManifest(
+            event_date=plan.event_date,
+            files=new_files + carried,
+            processed_keys=current.processed_keys,
+            rows=current.rows - input_rows + merged.num_rows,
+        )
+        try:
+            write_partition(
+                materializer.get_s3(), materializer.BUCKET, materializer.STRUCTURED_PREFIX, manifest, if_match=etag
+            )
+            break
+        except ManifestConflict:
+            print(f"Partition {plan.event_date} was committed to during the swap; retrying.")
+    else:
+        delete_keys(materializer.get_s3(), materializer.BUCKET, new_files)
+        raise RuntimeError(f"Partition {plan.event_date} kept changing; gave up after {SWAP_ATTEMPTS} attempts")
+
+    if materializer.ROLLUPS:
+        # dedupe may have dropped rows; the merged table is the new truth
+        refresh_rollup(materializer.get_s3(), materializer.BUCKET, plan.event_date, manifest.files, [(new_files, merged)])
+    delete_keys(materializer.get_s3(), materializer.BUCKET, [f for f in plan.files if f not in manifest.files])
+
+    return {
+        "event_date": plan.event_date,
+        "files_before": len(plan.files),
+        "files_after": len(new_files),
+        "bytes_before": plan.bytes,
+        "bytes_after": sum(file_sizes(plan.event_date).get(f, 0) for f in new_files),
+        "rows_before": input_rows,
+        "rows_after": merged.num_rows,
+    }
+
+
+def print_report(results: List[Dict[str, Any]], dry_run: bool) -> None:
+    # A dry run can't know the compacted size (dedupe and re-encoding change
+    # it), so bytes_after is None there and shown as "?".
+    header = "Compaction plan (dry run)" if dry_run else "Compaction result"
+    print(header)
+    print(f"{'event_date':<14}{'files':>14}{'bytes':>28}")
+    for r in results:
+        files = f"{r['files_before']} -> {r['files_after']}"
+        size = f"{r['bytes_before']:,} -> {_bytes(r['bytes_after'])}"
+        print(f"{r['event_date']:<14}{files:>14}{size:>28}")
+    totals = {k: sum(r[k] for r in results) for k in ("files_before", "files_after", "bytes_before")}
+    bytes_after = None if dry_run else sum(r["bytes_after"] for r in results)
+    print(
+        f"{len(results)} partitions: {totals['files_before']} -> {totals['files_after']} files, "
+        f"{totals['bytes_before']:,} -> {_bytes(bytes_after)} bytes"
+        + (" (file count after is estimated)" if dry_run else "")
+    )
+
+
+def _bytes(value: Optional[int]) -> str:
+    return "?" if value is None else f"{value:,}"
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Compact small Parquet files in the dreams table.")
+    parser.add_argument("--dry-run", action="store_true", help="report what would be compacted and stop")
+    parser.add_argument("--partition", action="append", dest="partitions",
+                        help="only this event_date (repeatable)")
+    parser.add_argument("--small-file-bytes", type=int, default=SMALL_FILE_BYTES,
+                        help="files below this size count as small")
+    parser.add_argument("--min-small-files", type=int, default=MIN_SMALL_FILES,
+                        help="compact partitions with at least this many small files")
+    parser.add_argument("--target-file-bytes", type=int, default=TARGET_FILE_BYTES,
+                        help="approximate size of the compacted files")
+    parser.add_argument("--concurrency", type=int, default=COMPACT_CONCURRENCY,
+                        help="partitions planned and compacted in parallel")
+    parser.add_argument("--row-group-size", type=int, default=materializer.ROW_GROUP_SIZE)
+    parser.add_argument("--compression", default=materializer.PARQUET_COMPRESSION)
+    parser.add_argument("--dictionary", choices=("auto", "all", "none"), default=materializer.PARQUET_DICTIONARY)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    options = materializer.WriteOptions(args.row_group_size, args.compression, args.dictionary)
+
+    dates = args.partitions or list_partitions(materializer.get_s3(), materializer.BUCKET, materializer.STRUCTURED_PREFIX)
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        plans = [
+            p for p in pool.map(
+                lambda d: plan_partition(d, args.small_file_bytes, args.min_small_files), dates
+            )
+            if p is not None
+        ]
+        print(f"{len(plans)} of {len(dates)} partitions need compaction.")
+
+        if args.dry_run:
+            results = [
+                {
+                    "event_date": p.event_date,
+                    "files_before": len(p.files),
+                    "files_after": p.expected_files(args.target_file_bytes),
+                    "bytes_before": p.bytes,
+                    "bytes_after": None,
+                }
+                for p in plans
+            ]
+        else:
+            results = list(pool.map(lambda p: compact_partition(p, args.target_file_bytes, options), plans))
+
+    print_report(results, args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,3 @@
+# The analytics scripts import each other as top-level modules (they are run
+# as `python analytics/<script>.py`); pytest puts this directory on sys.path
+# because it holds a conftest, so tests import them the same way.
@@ -0,0 +1,216 @@
+"""
+Daily rollups of the structured dreams table.
+
+One small Parquet file per event_date under
+structured/dream_rollups/v1/event_date=<date>/rollup.parquet, with one row
+per (register_feel, wish_fulfillment_type) seen that day. Every measure is
+additive (counts and sums), so any coarser question - per day, per register
+across a year, the whole range - is a sum over rows, and the means and rates
+stored next to them are just sum / count. A year of dashboards reads 365
+tiny files instead of the detail table.
+
+Each rollup records in its Parquet metadata the detail files it was built
+from. When the materializer adds a file to a partition, the rollup is
+extended with the new rows only if it already covers every other file in
+the manifest; otherwise (first run, a compaction, a crash between the two
+writes) the missing files are read back and folded in, so the rollup always
+matches the partition's manifest.
+"""
+
+import io
+import json
+from typing import Any, Iterable, List, Optional, Sequence, Tuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from botocore.exceptions import ClientError
+
+from dream_rows import DREAMS_SCHEMA
+
+ROLLUP_PREFIX = "structured/dream_rollups/v1/"
+ROLLUP_FILE = "rollup.parquet"
+SOURCES_METADATA_KEY = b"dream_rollups.source_files"
+
+GROUP_COLUMNS = ["register_feel", "wish_fulfillment_type"]
+# Additive measures; everything else in the schema is derived from them.
+SUM_COLUMNS = ["dreams", "mood_count", "mood_sum", "sleep_quality_count", "sleep_quality_sum", "with_video"]
+# Detail columns a rollup needs.
+DETAIL_COLUMNS = GROUP_COLUMNS + ["mood", "sleep_quality", "has_video"]
+
+ROLLUP_SCHEMA = pa.schema(
+    [
+        ("event_date", pa.string()),
+        ("register_feel", pa.string()),
+        ("wish_fulfillment_type", pa.string()),
+        ("dreams", pa.int64()),
+        ("mood_count", pa.int64()),
+        ("mood_sum", pa.int64()),
+        ("mood_mean", pa.float64()),
+        ("sleep_quality_count", pa.int64()),
+        ("sleep_quality_sum", pa.int64()),
+        ("sleep_quality_mean", pa.float64()),
+        ("with_video", pa.int64()),
+        ("video_rate", pa.float64()),
+    ]
+)
+
+_COUNT_ALL = pc.CountOptions(mode="all")
+
+
+def rollup_key(event_date: str) -> str:
+    return f"{ROLLUP_PREFIX}event_date={event_date}/{ROLLUP_FILE}"
+
+
+def _finish(event_date: str, sums: pa.Table) -> pa.Table:
+    """Add event_date and the derived means/rates to a table of group keys + sums."""
+    def ratio(num: str, den: str) -> pa.Array:
+        den_values = sums.column(den)
+        safe = pc.if_else(pc.equal(den_values, 0), None, den_values)
+        return pc.divide(sums.column(num).cast(pa.float64()), safe.cast(pa.float64()))
+
+    columns = {
+        "event_date": pa.array([event_date] * sums.num_rows, pa.string()),
+        **{c: sums.column(c) for c in GROUP_COLUMNS + SUM_COLUMNS},
+        "mood_mean": ratio("mood_sum", "mood_count"),
+        "sleep_quality_mean": ratio("sleep_quality_sum", "sleep_quality_count"),
+        "video_rate": ratio("with_video", "dreams"),
+    }
+    table = pa.Table.from_pydict({f.name: columns[f.name] for f in ROLLUP_SCHEMA}, schema=ROLLUP_SCHEMA)
+    return table.sort_by([(c, "ascending") for c in GROUP_COLUMNS])
+
+
+def aggregate(event_date: str, detail: pa.Table) -> pa.Table:
+    """Rollup rows for detail rows that all belong to one partition."""
+    has_video = pc.fill_null(detail.column("has_video"), False).cast(pa.int64())
+    table = pa.table(
+        {
+            "register_feel": detail.column("register_feel"),
+            "wish_fulfillment_type": detail.column("wish_fulfillment_type"),
+            "mood": detail.column("mood"),
+            "sleep_quality": detail.column("sleep_quality"),
+            "with_video": has_video,
+        }
+    )
+    grouped = table.group_by(GROUP_COLUMNS, use_threads=False).aggregate(
+        [
+            ("register_feel", "count", _COUNT_ALL),
+            ("mood", "count"),
+            ("mood", "sum"),
+            ("sleep_quality", "count"),
+            ("sleep_quality", "sum"),
+            ("with_video", "sum"),
+        ]
+    )
+    sums = pa.table(
+        {
+            **{c: grouped.column(c) for c in GROUP_COLUMNS},
+            "dreams": grouped.column("register_feel_count"),
+            "mood_count": grouped.column("mood_count"),
+            # sum over an all-null group is null; the rollup stores 0
+            "mood_sum": pc.fill_null(grouped.column("mood_sum"), 0),
+            "sleep_quality_count": grouped.column("sleep_quality_count"),
+            "sleep_quality_sum": pc.fill_null(grouped.column("sleep_quality_sum"), 0),
+            "with_video": pc.fill_null(grouped.column("with_video_sum"), 0),
+        }
+    )
+    return _finish(event_date, sums)
+
+
+def merge(event_date: str, rollups: Sequence[pa.Table]) -> pa.Table:
+    """Combine rollups of disjoint sets of detail rows from the same partition."""
+    rollups = [r for r in rollups if r.num_rows]
+    if not rollups:
+        return ROLLUP_SCHEMA.empty_table()
+    if len(rollups) == 1:
+        return rollups[0]
+    combined = pa.concat_tables([r.select(GROUP_COLUMNS + SUM_COLUMNS) for r in rollups])
+    grouped = combined.group_by(GROUP_COLUMNS, use_threads=False).aggregate([(c, "sum") for c in SUM_COLUMNS])
+    sums = pa.table(
+        {
+            **{c: grouped.column(c) for c in GROUP_COLUMNS},
+            **{c: grouped.column(f"{c}_sum") for c in SUM_COLUMNS},
+        }
+    )
+    return _finish(event_date, sums)
+
+
+def read_rollup(s3: Any, bucket: str, event_date: str) -> Optional[Tuple[pa.Table, List[str]]]:
+    """The partition's rollup and the detail files it covers, or None."""
+    try:
+        body = s3.get_object(Bucket=bucket, Key=rollup_key(event_date))["Body"].read()
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+            return None
+        raise
+    table = pq.read_table(io.BytesIO(body))
+    metadata = table.schema.metadata or {}
+    sources = json.loads(metadata.get(SOURCES_METADATA_KEY, b"[]"))
+    return table.replace_schema_metadata(None), sources
+
+
+def write_rollup(s3: Any, bucket: str, event_date: str, rollup: pa.Table, sources: List[str]) -> None:
+    table = rollup.replace_schema_metadata({SOURCES_METADATA_KEY: json.dumps(sources).encode("utf-8")})
+    buf = io.BytesIO()
+    pq.write_table(table, buf, compression="zstd")
+    s3.put_object(
+        Bucket=bucket,
+        Key=rollup_key(event_date),
+        Body=buf.getvalue(),
+        ContentType="application/vnd.apache.parquet",
+    )
+
+
+def delete_rollup(s3: Any, bucket: str, event_date: str) -> None:
+    s3.delete_object(Bucket=bucket, Key=rollup_key(event_date))
+
+
+def read_detail(s3: Any, bucket: str, key: str) -> pa.Table:
+    body = pq.ParquetFile(io.BytesIO(s3.get_object(Bucket=bucket, Key=key)["Body"].read()))
+    present = [c for c in DETAIL_COLUMNS if c in body.schema_arrow.names]
+    table = body.read(columns=present)
+    # a file written before a column existed reads it as null
+    return pa.table(
+        {
+            c: table.column(c).cast(DREAMS_SCHEMA.field(c).type) if c in present
+            else pa.nulls(table.num_rows, DREAMS_SCHEMA.field(c).type)
+            for c in DETAIL_COLUMNS
+        }
+    )
+
+
+def refresh_rollup(
+    s3: Any,
+    bucket: str,
+    event_date: str,
+    files: List[str],
+    known: Iterable[Tuple[List[str], pa.Table]] = (),
+) -> bool:
+    """
+    Bring the partition's rollup in line with its manifest `files`.
+
+    `known` pairs detail tables the caller already has in memory with the
+    files they were written to, so those are never read back. The stored
+    rollup is reused when everything it covers is still in the manifest.
+    Returns False when the stored rollup was already current.
+    """
+    known = list(known)
+    covered = {f for keys, _ in known for f in keys}
+    parts = [aggregate(event_date, table) for _, table in known]
+
+    current = read_rollup(s3, bucket, event_date)
+    if current is not None:
+        table, sources = current
+        if not known and set(sources) == set(files):
+            return False
+        if set(sources) <= set(files) and not covered & set(sources):
+            parts.append(table)
+            covered.update(sources)
+
+    for key in files:
+        if key not in covered:
+            parts.append(aggregate(event_date, read_detail(s3, bucket, key)))
+
+    rollup = merge(event_date, parts)
+    write_rollup(s3, bucket, event_date, rollup, list(files))
+    return True
@@ -0,0 +1,330 @@
+"""
+Raw dream event -> flat row for the structured dreams table.
+
+extract_row is the reference, one event dict at a time. extract_batch does
+the same for many raw JSON bodies at once: pyarrow.json parses them in bulk
+against RAW_EVENT_SCHEMA and every column, including the derived ones, is
+computed with Arrow compute kernels. Anything the vectorized path cannot
+decide exactly as extract_row would (a body that does not fit the schema, a
+nested object whose fields are all unknown or null, an unusual created_at)
+goes through extract_row instead, so both paths produce identical rows.
+"""
+
+import io
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.json as pj
+
+
+def extract_row(event: Dict[str, Any]) -> Dict[str, Any]:
+    dream = event.get("dream") or event
+    render = event.get("render") or event.get("render_result") or {}
+
+    psycho_meta = render.get("psycho_metadata") or event.get("psycho_metadata") or {}
+    key_signifiers = psycho_meta.get("key_signifiers") or []
+
+    created_at_str = dream.get("created_at") or event.get("created_at")
+    created_at_dt = None
+    event_date = None
+    if isinstance(created_at_str, str):
+        try:
+            created_at_dt = datetime.fromisoformat(created_at_str.replace("Z", "+00:00"))
+            event_date = created_at_dt.date().isoformat()
+        except Exception:
+            event_date = None
+
+    row: Dict[str, Any] = {
+        # core
+        "dream_id": dream.get("id"),
+        "created_at": created_at_str,
+        "event_date": event_date,
+        "title": dream.get("title"),
+        "narrative": dream.get("narrative"),
+
+        # context
+        "mood": dream.get("mood"),
+        "sleep_quality": dream.get("sleep_quality"),
+        "mbti": dream.get("mbti"),
+        "listening_to": dream.get("listening_to"),
+        "watching": dream.get("watching"),
+        "reading": dream.get("reading"),
+        "context_note": dream.get("context_note"),
+
+        # links
+        "spotify_url": dream.get("spotify_url"),
+        "letterboxd_url": dream.get("letterboxd_url"),
+        "goodreads_url": dream.get("goodreads_url"),
+
+        # psycho-metadata (from model)
+        "register_feel": psycho_meta.get("register_feel"),
+        "wish_fulfillment_type": psycho_meta.get("wish_fulfillment_type"),
+        "subject_position": psycho_meta.get("subject_position"),
+        "day_residues_count": len(psycho_meta.get("day_residues") or []),
+        "key_signifiers_count": len(key_signifiers),
+
+        # output
+        "has_video": bool(render.get("video_url") or event.get("video_url")),
+        "video_s3_prefix": render.get("video_url") or event.get("video_url"),
+    }
+
+    return row
+
+
+# One declared schema for every partition, so a column that happens to be
+# all-null on one day has the same type as on every other day.
+DREAMS_SCHEMA = pa.schema(
+    [
+        # core
+        ("dream_id", pa.string()),
+        ("created_at", pa.string()),
+        ("event_date", pa.string()),
+        ("title", pa.string()),
+        ("narrative", pa.string()),
+        # context
+        ("mood", pa.int64()),
+        ("sleep_quality", pa.int64()),
+        ("mbti", pa.string()),
+        ("listening_to", pa.string()),
+        ("watching", pa.string()),
+        ("reading", pa.string()),
+        ("context_note", pa.string()),
+        # links
+        ("spotify_url", pa.string()),
+        ("letterboxd_url", pa.string()),
+        ("goodreads_url", pa.string()),
+        # psycho-metadata (from model)
+        ("register_feel", pa.string()),
+        ("wish_fulfillment_type", pa.string()),
+        ("subject_position", pa.string()),
+        ("day_residues_count", pa.int64()),
+        ("key_signifiers_count", pa.int64()),
+        # output
+        ("has_video", pa.bool_()),
+        ("video_s3_prefix", pa.string()),
+    ]
+)
+
+
+# --- batch path ---
+
+# dream field -> output column
+_DREAM_COLUMNS = {
+    "id": "dream_id",
+    "title": "title",
+    "narrative": "narrative",
+    "mood": "mood",
+    "sleep_quality": "sleep_quality",
+    "mbti": "mbti",
+    "listening_to": "listening_to",
+    "watching": "watching",
+    "reading": "reading",
+    "context_note": "context_note",
+    "spotify_url": "spotify_url",
+    "letterboxd_url": "letterboxd_url",
+    "goodreads_url": "goodreads_url",
+}
+_PSYCHO_COLUMNS = ("register_feel", "wish_fulfillment_type", "subject_position")
+
+_DREAM_FIELDS = [
+    pa.field(name, DREAMS_SCHEMA.field(column).type) for name, column in _DREAM_COLUMNS.items()
+] + [pa.field("created_at", pa.string())]
+_PSYCHO_TYPE = pa.struct(
+    [pa.field(name, pa.string()) for name in _PSYCHO_COLUMNS]
+    + [pa.field("day_residues", pa.list_(pa.string())), pa.field("key_signifiers", pa.list_(pa.string()))]
+)
+_RENDER_TYPE = pa.struct([pa.field("video_url", pa.string()), pa.field("psycho_metadata", _PSYCHO_TYPE)])
+
+# The event shapes extract_row understands: a flat dream (what the API
+# writes), optionally with nested dream / render / psycho_metadata objects.
+RAW_EVENT_SCHEMA = pa.schema(
+    _DREAM_FIELDS
+    + [
+        pa.field("dream", pa.struct(_DREAM_FIELDS)),
+        pa.field("render", _RENDER_TYPE),
+        pa.field("render_result", _RENDER_TYPE),
+        pa.field("psycho_metadata", _PSYCHO_TYPE),
+        pa.field("video_url", pa.string()),
+    ]
+)
+
+_PARSE_OPTIONS = pj.ParseOptions(explicit_schema=RAW_EVENT_SCHEMA, unexpected_field_behavior="ignore")
+
+# created_at strings whose date fromisoformat accepts on every supported
+# Python version; everything else is decided by extract_row's own code.
+_ISO_DATETIME = (
+    r"^\d{4}-\d{2}-\d{2}"
+    r"([T ]([01]\d|2[0-3])(:[0-5]\d(:[0-5]\d(\.(\d{3}|\d{6}))?)?)?"
+    r"(Z|[+-]([01]\d|2[0-3]):[0-5]\d)?)?$"
+)
+
+
+def _nonempty(values: pa.Array) -> pa.Array:
+    """Python truthiness of an optional string column."""
+    return pc.fill_null(pc.not_equal(values, ""), False)
+
+
+def _present(struct: pa.Array) -> Tuple[pa.Array, pa.Array]:
+    """
+    (truthy, ambiguous) for an optional JSON object column. An object whose
+    known fields are all null may be {} (falsy) or hold only unknown keys
+    (truthy); those rows are left to extract_row.
+    """
+    valid = pc.is_valid(struct)
+    any_field = pa.array([False] * len(struct), pa.bool_())
+    for i in range(struct.type.num_fields):
+        any_field = pc.or_(any_field, pc.is_valid(pc.struct_field(struct, [i])))
+    return pc.and_(valid, any_field), pc.and_(valid, pc.invert(any_field))
+
+
+def _pick(condition: pa.Array, left: pa.Array, right: pa.Array) -> pa.Array:
+    return pc.if_else(condition, left, right)
+
+
+def _field(struct: pa.Array, name: str) -> pa.Array:
+    return pc.struct_field(struct, [struct.type.get_field_index(name)])
+
+
+def _event_dates(created_at: pa.Array) -> Tuple[pa.Array, pa.Array]:
+    """(event_date, needs_python) for the created_at column."""
+    fast = pc.fill_null(pc.match_substring_regex(created_at, _ISO_DATETIME), False)
+    day = pc.utf8_slice_codeunits(created_at, 0, 10)
+    parsed = pc.strptime(day, format="%Y-%m-%d", unit="s", error_is_null=True)
+    # strptime rolls 2023-02-30 over to March; only keep exact round trips
+    valid = pc.and_(
+        pc.fill_null(pc.equal(pc.strftime(parsed, format="%Y-%m-%d"), day), False),
+        pc.invert(pc.fill_null(pc.starts_with(day, "0000"), True)),
+    )
+    fast = pc.and_(fast, valid)
+    needs_python = pc.and_(pc.is_valid(created_at), pc.invert(fast))
+    return _pick(fast, day, pa.nulls(len(created_at), pa.string())), needs_python
+
+
+def _extract_columns(events: pa.Table) -> Tuple[pa.Table, pa.Array]:
+    """Vectorized extract_row over parsed events; returns (rows, rows to redo in Python)."""
+    columns = {name: events.column(name).combine_chunks() for name in events.column_names}
+
+    dream_present, dream_unsure = _present(columns["dream"])
+    render_present, render_unsure = _present(columns["render"])
+    result_present, result_unsure = _present(columns["render_result"])
+    unsure = pc.or_(dream_unsure, pc.or_(render_unsure, result_unsure))
+
+    # render = event.get("render") or event.get("render_result") or {}
+    render = _pick(render_present, columns["render"], columns["render_result"])
+    has_render = pc.or_(render_present, result_present)
+
+    # psycho_meta = render.get("psycho_metadata") or event.get("psycho_metadata") or {}
+    render_psycho = _field(render, "psycho_metadata")
+    render_psycho_present, render_psycho_unsure = _present(render_psycho)
+    render_psycho_present = pc.and_(has_render, render_psycho_present)
+    event_psycho_present, event_psycho_unsure = _present(columns["psycho_metadata"])
+    unsure = pc.or_(unsure, pc.or_(pc.and_(has_render, render_psycho_unsure), event_psycho_unsure))
+    psycho = _pick(render_psycho_present, render_psycho, columns["psycho_metadata"])
+    has_psycho = pc.or_(render_psycho_present, event_psycho_present)
+
+    out: Dict[str, pa.Array] = {}
+    for name, column in _DREAM_COLUMNS.items():
+        out[column] = _pick(dream_present, _field(columns["dream"], name), columns[name])
+
+    # created_at = dream.get("created_at") or event.get("created_at")
+    dream_created = _pick(dream_present, _field(columns["dream"], "created_at"), columns["created_at"])
+    created_at = _pick(_nonempty(dream_created), dream_created, columns["created_at"])
+    out["created_at"] = created_at
+    out["event_date"], date_unsure = _event_dates(created_at)
+    unsure = pc.or_(unsure, date_unsure)
+
+    for name in _PSYCHO_COLUMNS:
+        out[name] = _pick(has_psycho, _field(psycho, name), pa.nulls(len(psycho), pa.string()))
+    for name in ("day_residues", "key_signifiers"):
+        lengths = pc.list_value_length(_pick(has_psycho, _field(psycho, name), pa.nulls(len(psycho), pa.list_(pa.string()))))
+        out[f"{name}_count"] = pc.cast(pc.fill_null(lengths, 0), pa.int64())
+
+    # video = render.get("video_url") or event.get("video_url")
+    render_video = _pick(has_render, _field(render, "video_url"), pa.nulls(len(render), pa.string()))
+    video = _pick(_nonempty(render_video), render_video, columns["video_url"])
+    out["has_video"] = _nonempty(video)
+    out["video_s3_prefix"] = video
+
+    table = pa.Table.from_arrays([out[f.name] for f in DREAMS_SCHEMA], schema=DREAMS_SCHEMA)
+    return table, unsure
+
+
+def extract_rows(bodies: List[bytes]) -> List[Optional[Dict[str, Any]]]:
+    """extract_row per body; None where the body is rejected or does not fit DREAMS_SCHEMA."""
+    rows: List[Optional[Dict[str, Any]]] = []
+    for body in bodies:
+        try:
+            row = extract_row(json.loads(body))
+            pa.RecordBatch.from_pylist([row], schema=DREAMS_SCHEMA)  # must fit the table
+            rows.append(row)
+        except Exception as e:
+            print(f"Skipping event due to error: {e}")
+            rows.append(None)
+    return rows
+
+
+def _parse(bodies: List[bytes]) -> Optional[pa.Table]:
+    # JSON has no raw newlines inside strings, so flattening them is safe
+    # and gives one event per line.
+    data = b"\n".join(b.replace(b"\n", b" ").replace(b"\r", b" ") for b in bodies)
+    try:
+        events = pj.read_json(io.BytesIO(data), parse_options=_PARSE_OPTIONS)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return None
+    return events if events.num_rows == len(bodies) else None
+
+
+def _extract(bodies: List[bytes]) -> List[Tuple[int, Optional[pa.Table], Optional[Dict[str, Any]]]]:
+    """(index, one-row-or-more table, python row) pieces, in body order."""
+    events = _parse(bodies)
+    if events is None:
+        if len(bodies) == 1:
+            return [(0, None, extract_rows(bodies)[0])]
+        # a body that does not fit the schema; bisect to isolate it
+        mid = len(bodies) // 2
+        left = _extract(bodies[:mid])
+        right = [(i + mid, t, r) for i, t, r in _extract(bodies[mid:])]
+        return left + right
+
+    table, unsure = _extract_columns(events)
+    unsure_rows = [i for i, flag in enumerate(unsure.to_pylist()) if flag]
+    if not unsure_rows:
+        return [(0, table, None)]
+
+    pieces: List[Tuple[int, Optional[pa.Table], Optional[Dict[str, Any]]]] = []
+    python_rows = extract_rows([bodies[i] for i in unsure_rows])
+    start = 0
+    for i, row in zip(unsure_rows, python_rows):
+        if i > start:
+            pieces.append((start, table.slice(start, i - start), None))
+        pieces.append((i, None, row))
+        start = i + 1
+    if start < len(bodies):
+        pieces.append((start, table.slice(start), None))
+    return pieces
+
+
+def extract_batch(bodies: List[bytes]) -> Tuple[pa.Table, List[int]]:
+    """
+    Rows for many raw event bodies at once, identical to running
+    extract_row on each. Returns (table in DREAMS_SCHEMA, index into
+    `bodies` of each row); bodies extract_row would reject are skipped.
+    """
+    if not bodies:
+        return DREAMS_SCHEMA.empty_table(), []
+
+    tables: List[pa.Table] = []
+    indices: List[int] = []
+    for start, table, row in _extract(bodies):
+        if table is not None:
+            tables.append(table)
+            indices.extend(range(start, start + table.num_rows))
+        elif row is not None:
+            tables.append(pa.Table.from_pylist([row], schema=DREAMS_SCHEMA))
+            indices.append(start)
+    if not tables:
+        return DREAMS_SCHEMA.empty_table(), []
+    return pa.concat_tables(tables).combine_chunks(), indices
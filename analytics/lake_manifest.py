@@ -0,0 +1,146 @@
+"""
+Per-partition manifests for the structured dreams table.
+
+Each event_date partition has one small JSON object under
+<table prefix>_manifest/partitions/event_date=<date>.json listing the
+Parquet files that make up the partition and the raw event keys they were
+built from. Writing the manifest is the commit point: a file only belongs
+to the table once a manifest names it, so replacing a partition's files is
+a single PUT, and readers that go through the manifest never see a
+half-written partition or a duplicate. Writers that merge with the
+current manifest (compaction, incremental appends) write it conditionally
+on the ETag they read, so a commit that lands in between is never lost.
+"""
+
+import json
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+MANIFEST_DIR = "_manifest/partitions/"
+UNKNOWN_DATE = "unknown_date"
+DELETE_BATCH_SIZE = 1000
+# S3 answers a failed If-Match / If-None-Match with 412, or 409 when a
+# concurrent conditional write to the same key won the race.
+CONFLICT_CODES = ("PreconditionFailed", "ConditionalRequestConflict", "412", "409")
+
+
+class ManifestConflict(RuntimeError):
+    """A conditional manifest write lost to another commit of the same partition."""
+
+
+@dataclass
+class PartitionManifest:
+    event_date: str
+    files: List[str] = field(default_factory=list)
+    processed_keys: List[str] = field(default_factory=list)
+    rows: int = 0
+    updated_at: str = ""
+
+    @classmethod
+    def from_json(cls, body: bytes) -> "PartitionManifest":
+        data = json.loads(body)
+        return cls(
+            event_date=data["event_date"],
+            files=list(data.get("files", [])),
+            processed_keys=list(data.get("processed_keys", [])),
+            rows=int(data.get("rows", 0)),
+            updated_at=data.get("updated_at", ""),
+        )
+
+    def to_json(self) -> bytes:
+        return json.dumps(asdict(self), separators=(",", ":")).encode("utf-8")
+
+
+def manifest_key(table_prefix: str, event_date: str) -> str:
+    return f"{table_prefix}{MANIFEST_DIR}event_date={event_date}.json"
+
+
+def list_partitions(s3: Any, bucket: str, table_prefix: str) -> List[str]:
+    """Dates of every partition that has a manifest, sorted."""
+    prefix = f"{table_prefix}{MANIFEST_DIR}event_date="
+    dates: List[str] = []
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get("Contents", []):
+            name = obj["Key"][len(prefix):]
+            if name.endswith(".json"):
+                dates.append(name[: -len(".json")])
+    return sorted(dates)
+
+
+def read_partition(s3: Any, bucket: str, table_prefix: str, event_date: str) -> Optional[PartitionManifest]:
+    return read_partition_versioned(s3, bucket, table_prefix, event_date)[0]
+
+
+def read_partition_versioned(
+    s3: Any, bucket: str, table_prefix: str, event_date: str
+) -> Tuple[Optional[PartitionManifest], Optional[str]]:
+    """The manifest and its ETag, for a conditional write_partition; (None, None) if absent."""
+    try:
+        resp = s3.get_object(Bucket=bucket, Key=manifest_key(table_prefix, event_date))
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+            return None, None
+        raise
+    return PartitionManifest.from_json(resp["Body"].read()), resp.get("ETag")
+
+
+def write_partition(
+    s3: Any,
+    bucket: str,
+    table_prefix: str,
+    manifest: PartitionManifest,
+    if_match: Optional[str] = None,
+    if_absent: bool = False,
+) -> None:
+    """
+    PUT the manifest. With if_match (an ETag from read_partition_versioned)
+    or if_absent, the write only lands if nobody committed in between;
+    otherwise ManifestConflict is raised and the caller re-reads and retries.
+    """
+    manifest.updated_at = datetime.now(timezone.utc).isoformat()
+    conditions: Dict[str, str] = {}
+    if if_match is not None:
+        conditions["IfMatch"] = if_match
+    elif if_absent:
+        conditions["IfNoneMatch"] = "*"
+    try:
+        s3.put_object(
+            Bucket=bucket,
+            Key=manifest_key(table_prefix, manifest.event_date),
+            Body=manifest.to_json(),
+            ContentType="application/json",
+            **conditions,
+        )
+    except ClientError as e:
+        if conditions and e.response.get("Error", {}).get("Code") in CONFLICT_CODES:
+            raise ManifestConflict(manifest.event_date) from e
+        raise
+
+
+def delete_partition(s3: Any, bucket: str, table_prefix: str, event_date: str) -> None:
+    s3.delete_object(Bucket=bucket, Key=manifest_key(table_prefix, event_date))
+
+
+def delete_keys(s3: Any, bucket: str, keys: Iterable[str]) -> int:
+    """Delete objects in batches; returns how many were requested."""
+    keys = list(keys)
+    for i in range(0, len(keys), DELETE_BATCH_SIZE):
+        batch = keys[i : i + DELETE_BATCH_SIZE]
+        s3.delete_objects(
+            Bucket=bucket,
+            Delete={"Objects": [{"Key": k} for k in batch], "Quiet": True},
+        )
+    return len(keys)
+
+
+def list_data_files(s3: Any, bucket: str, table_prefix: str) -> List[str]:
+    """Every Parquet object under the table prefix, manifested or not."""
+    keys: List[str] = []
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=table_prefix):
+        keys.extend(o["Key"] for o in page.get("Contents", []) if o["Key"].endswith(".parquet"))
+    return keys
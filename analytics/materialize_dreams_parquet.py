@@ -1,19 +1,93 @@
+import argparse
 import json
+import multiprocessing
 import os
-from datetime import datetime
+import queue
+import threading
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date, timedelta
+from itertools import islice
 from uuid import uuid4
-from typing import Any, Dict, List
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, List, Optional, Set, Tuple, Union
 
-import boto3
 import pyarrow as pa
+import pyarrow.compute as pc
 import pyarrow.parquet as pq
 
+from lake_manifest import (
+    UNKNOWN_DATE,
+    ManifestConflict,
+    PartitionManifest,
+    delete_keys,
+    delete_partition,
+    list_data_files,
+    list_partitions,
+    read_partition,
+    read_partition_versioned,
+    write_partition,
+)
+from s3_multipart import S3MultipartWriter
+from dream_rollups import delete_rollup, refresh_rollup
+from dream_rows import DREAMS_SCHEMA, extract_batch, extract_row, extract_rows  # noqa: F401 (re-exported)
+
 
 BUCKET = os.getenv("DREAM_LAKE_BUCKET", "dream-film-lake-dev-sachi")
 RAW_PREFIX = "raw/dream_journal_events/"
 STRUCTURED_PREFIX = "structured/dreams_parquet/v1/"
 
-s3 = boto3.client("s3")
+# Ingest concurrency. Raw events are one small object per dream, so a rebuild
+# is bound by per-request latency; these keep many requests in flight.
+LIST_CONCURRENCY = int(os.getenv("MATERIALIZE_LIST_CONCURRENCY", "8"))
+FETCH_CONCURRENCY = int(os.getenv("MATERIALIZE_FETCH_CONCURRENCY", "64"))
+# Keys listed but not yet fetched; listing blocks once this many are waiting.
+FETCH_QUEUE_SIZE = int(os.getenv("MATERIALIZE_FETCH_QUEUE_SIZE", "1000"))
+# Incremental runs re-list this many days before the watermark to pick up
+# events that reached the lake late (e.g. replayed from the API's local WAL).
+LOOKBACK_DAYS = int(os.getenv("MATERIALIZE_LOOKBACK_DAYS", "2"))
+# Appends to a partition re-read its manifest and retry this many times
+# when a compaction swap lands in between.
+MANIFEST_COMMIT_ATTEMPTS = 5
+# Bodies are turned into rows this many at a time ("arrow": vectorized
+# extract_batch; "rows": extract_row per event).
+EXTRACT_MODE = os.getenv("MATERIALIZE_EXTRACT", "arrow")
+EXTRACT_BATCH_SIZE = int(os.getenv("MATERIALIZE_EXTRACT_BATCH_SIZE", "5000"))
+# Parquet output. Memory while writing is bounded by one row group plus one
+# multipart part, whatever the partition size.
+ROW_GROUP_SIZE = int(os.getenv("MATERIALIZE_ROW_GROUP_SIZE", "50000"))
+PARQUET_COMPRESSION = os.getenv("MATERIALIZE_PARQUET_COMPRESSION", "zstd")
+# "auto": dictionary-encode the low-cardinality columns; "all" or "none"
+PARQUET_DICTIONARY = os.getenv("MATERIALIZE_PARQUET_DICTIONARY", "auto")
+MULTIPART_PART_SIZE = int(os.getenv("MATERIALIZE_MULTIPART_PART_SIZE", str(8 * 1024 * 1024)))
+# Keep structured/dream_rollups/v1/ in step with every partition written.
+ROLLUPS = os.getenv("MATERIALIZE_ROLLUPS", "true").lower() == "true"
+# Local worker processes; each runs its own shard of the partitions.
+PROCESSES = int(os.getenv("MATERIALIZE_PROCESSES", "1"))
+# HTTP connections kept by the S3 client; defaults to one per concurrent request.
+MAX_POOL_CONNECTIONS = int(os.getenv("MATERIALIZE_MAX_POOL_CONNECTIONS", "0")) or None
+
+
+def make_s3_client(max_pool_connections: int) -> Any:
+    # imported on first use; boto3 takes longer to load than this whole module
+    import boto3
+    from botocore.config import Config
+
+    return boto3.client("s3", config=Config(max_pool_connections=max_pool_connections))
+
+
+_s3: Any = None
+_s3_lock = threading.Lock()
+
+
+def get_s3() -> Any:
+    """The shared S3 client, created on first use so importing this module stays cheap."""
+    global _s3
+    with _s3_lock:
+        if _s3 is None:
+            _s3 = make_s3_client(MAX_POOL_CONNECTIONS or FETCH_CONCURRENCY + LIST_CONCURRENCY)
+        return _s3
 
 
 def list_raw_keys() -> List[str]:
@@ -29,7 +103,7 @@ def list_raw_keys() -> List[str]:
         if continuation_token:
             kwargs["ContinuationToken"] = continuation_token
 
-        resp = s3.list_objects_v2(**kwargs)
+        resp = get_s3().list_objects_v2(**kwargs)
         for obj in resp.get("Contents", []):
             key = obj["Key"]
             if key.endswith(".json"):
@@ -44,105 +118,548 @@ def list_raw_keys() -> List[str]:
 
 
 def read_json_from_s3(key: str) -> Dict[str, Any]:
-    resp = s3.get_object(Bucket=BUCKET, Key=key)
+    resp = get_s3().get_object(Bucket=BUCKET, Key=key)
     body = resp["Body"].read()
     return json.loads(body)
 
 
-def extract_row(event: Dict[str, Any]) -> Dict[str, Any]:
-    dream = event.get("dream") or event
-    render = event.get("render") or event.get("render_result") or {}
-
-    psycho_meta = render.get("psycho_metadata") or event.get("psycho_metadata") or {}
-    key_signifiers = psycho_meta.get("key_signifiers") or []
-
-    created_at_str = dream.get("created_at") or event.get("created_at")
-    created_at_dt = None
-    event_date = None
-    if isinstance(created_at_str, str):
+def list_level(prefix: str) -> Tuple[List[str], List[str]]:
+    """One delimited listing: (sub-prefixes, .json keys directly under prefix)."""
+    prefixes: List[str] = []
+    keys: List[str] = []
+    paginator = get_s3().get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=BUCKET, Prefix=prefix, Delimiter="/"):
+        prefixes.extend(p["Prefix"] for p in page.get("CommonPrefixes", []))
+        keys.extend(o["Key"] for o in page.get("Contents", []) if o["Key"].endswith(".json"))
+    return prefixes, keys
+
+
+def _prefix_before(prefix: str, since: date) -> bool:
+    """True if a YYYY/, YYYY/MM/ or YYYY/MM/DD/ prefix lies entirely before `since`."""
+    parts = prefix[len(RAW_PREFIX):].strip("/").split("/")
+    try:
+        numbers = tuple(int(p) for p in parts)
+    except ValueError:
+        return False  # not a date prefix; keep it
+    return numbers < (since.year, since.month, since.day)[: len(numbers)]
+
+
+def list_date_prefixes(
+    pool: ThreadPoolExecutor,
+    since: Optional[date] = None,
+) -> Tuple[List[str], List[str]]:
+    """
+    Walk raw/dream_journal_events/YYYY/MM/DD/ one level at a time, listing
+    each level's prefixes concurrently. Years, months and days before
+    `since` are pruned without being listed. Returns (day prefixes, stray
+    keys found above day level).
+    """
+    level = [RAW_PREFIX]
+    stray: List[str] = []
+    for _ in ("year", "month", "day"):
+        next_level: List[str] = []
+        for prefixes, keys in pool.map(list_level, level):
+            next_level.extend(p for p in prefixes if since is None or not _prefix_before(p, since))
+            stray.extend(keys)
+        level = next_level
+    return sorted(level), stray
+
+
+@dataclass(frozen=True)
+class Shard:
+    """
+    One of `count` disjoint slices of the table. Partitions are assigned by
+    a stable hash of event_date, so shards on different processes or
+    machines agree on ownership without talking to each other, and each
+    partition's manifest only ever has one writer.
+    """
+
+    index: int = 0
+    count: int = 1
+
+    def owns(self, event_date: str) -> bool:
+        if self.count == 1:
+            return True
+        if event_date == UNKNOWN_DATE:
+            return self.index == 0
+        return zlib.crc32(event_date.encode("utf-8")) % self.count == self.index
+
+    def owns_prefix(self, day_prefix: str) -> bool:
+        """Raw events under YYYY/MM/DD/ belong to the partition of that day."""
+        parts = day_prefix[len(RAW_PREFIX):].strip("/").split("/")
+        if len(parts) != 3 or not all(p.isdigit() for p in parts):
+            return self.owns(UNKNOWN_DATE)
+        return self.owns("-".join(parts))
+
+    def __str__(self) -> str:
+        return f"shard {self.index + 1}/{self.count}"
+
+
+@dataclass
+class IngestStats:
+    listed: int = 0
+    skipped: int = 0
+    fetched: int = 0
+    failed: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+
+    def report(self) -> str:
+        seconds = max(self.seconds, 1e-9)
+        return (
+            f"Fetched {self.fetched} objects ({self.bytes / 1e6:.1f} MB, {self.failed} failed) "
+            f"in {self.seconds:.1f}s: {self.fetched / seconds:.1f} objects/s, "
+            f"{self.bytes / 1e6 / seconds:.2f} MB/s"
+        )
+
+
+_DONE = object()
+
+
+def extract_bodies(records: List[Tuple[str, bytes]], mode: str = EXTRACT_MODE) -> Tuple[List[str], pa.Table]:
+    """Rows for (key, body) pairs; returns the keys that produced a row and the rows."""
+    bodies = [body for _, body in records]
+    if mode == "arrow":
+        table, indices = extract_batch(bodies)
+        return [records[i][0] for i in indices], table
+    rows = extract_rows(bodies)
+    kept = [(key, row) for (key, _), row in zip(records, rows) if row is not None]
+    return [key for key, _ in kept], pa.Table.from_pylist([row for _, row in kept], schema=DREAMS_SCHEMA)
+
+
+def ingest_events(
+    list_concurrency: int = LIST_CONCURRENCY,
+    fetch_concurrency: int = FETCH_CONCURRENCY,
+    since: Optional[date] = None,
+    skip: FrozenSet[str] = frozenset(),
+    extract: str = EXTRACT_MODE,
+    shard: Shard = Shard(),
+) -> Tuple[List[str], pa.Table, IngestStats]:
+    """
+    List the raw events sharded by day prefix and fetch them with a bounded
+    pool of concurrent GETs; bodies are extracted in batches of
+    EXTRACT_BATCH_SIZE as they arrive. Returns (raw keys, rows) aligned
+    row for row.
+
+    Day prefixes before `since` or owned by another shard are not listed,
+    and keys in `skip` (already materialized) are not fetched.
+
+    Listing and fetching overlap: listers push keys into a bounded queue
+    that the fetchers drain, so a slow fetch side throttles listing instead
+    of buffering the whole key space.
+    """
+    stats = IngestStats()
+    started = time.monotonic()
+    keys: "queue.Queue[Any]" = queue.Queue(maxsize=FETCH_QUEUE_SIZE)
+    pending: List[Tuple[str, bytes]] = []
+    chunks: List[Tuple[List[str], pa.Table]] = []
+    lock = threading.Lock()
+    # First error that stopped a fetcher; re-raised once the pool is joined.
+    errors: List[BaseException] = []
+
+    def extract_chunk(chunk: List[Tuple[str, bytes]]) -> None:
+        chunk_keys, table = extract_bodies(chunk, extract)
+        with lock:
+            chunks.append((chunk_keys, table))
+            stats.failed += len(chunk) - len(chunk_keys)
+
+    def fetch_worker() -> None:
         try:
-            created_at_dt = datetime.fromisoformat(created_at_str.replace("Z", "+00:00"))
-            event_date = created_at_dt.date().isoformat()
-        except Exception:
-            event_date = None
-
-    row: Dict[str, Any] = {
-        # core
-        "dream_id": dream.get("id"),
-        "created_at": created_at_str,
-        "event_date": event_date,
-        "title": dream.get("title"),
-        "narrative": dream.get("narrative"),
-
-        # context
-        "mood": dream.get("mood"),
-        "sleep_quality": dream.get("sleep_quality"),
-        "mbti": dream.get("mbti"),
-        "listening_to": dream.get("listening_to"),
-        "watching": dream.get("watching"),
-        "reading": dream.get("reading"),
-        "context_note": dream.get("context_note"),
-
-        # links
-        "spotify_url": dream.get("spotify_url"),
-        "letterboxd_url": dream.get("letterboxd_url"),
-        "goodreads_url": dream.get("goodreads_url"),
-
-        # psycho-metadata (from model)
-        "register_feel": psycho_meta.get("register_feel"),
-        "wish_fulfillment_type": psycho_meta.get("wish_fulfillment_type"),
-        "subject_position": psycho_meta.get("subject_position"),
-        "day_residues_count": len(psycho_meta.get("day_residues") or []),
-        "key_signifiers_count": len(key_signifiers),
-
-        # output
-        "has_video": bool(render.get("video_url") or event.get("video_url")),
-        "video_s3_prefix": render.get("video_url") or event.get("video_url"),
-    }
-
-    return row
-
-
-def group_rows_by_event_date(rows: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
-    grouped: Dict[str, List[Dict[str, Any]]] = {}
-    for row in rows:
-        date = row.get("event_date") or "unknown_date"
-        grouped.setdefault(date, []).append(row)
+            fetch_keys()
+        except BaseException as e:
+            with lock:
+                errors.append(e)
+            # keep draining so listers blocked on the queue can finish
+            while keys.get() is not _DONE:
+                pass
+
+    def fetch_keys() -> None:
+        nonlocal pending
+        while True:
+            key = keys.get()
+            if key is _DONE:
+                return
+            if errors:
+                continue  # the run is failing; don't fetch the rest
+            try:
+                body = get_s3().get_object(Bucket=BUCKET, Key=key)["Body"].read()
+            except Exception as e:
+                print(f"Skipping {key} due to error: {e}")
+                with lock:
+                    stats.failed += 1
+                continue
+            chunk = None
+            with lock:
+                pending.append((key, body))
+                stats.fetched += 1
+                stats.bytes += len(body)
+                if len(pending) >= EXTRACT_BATCH_SIZE:
+                    chunk, pending = pending, []
+            if chunk:
+                extract_chunk(chunk)
+
+    def enqueue(listed: List[str]) -> None:
+        new = [k for k in listed if k not in skip]
+        for key in new:
+            if errors:
+                break
+            keys.put(key)  # blocks while the fetchers are behind
+        with lock:
+            stats.listed += len(listed)
+            stats.skipped += len(listed) - len(new)
+
+    def list_day(prefix: str) -> None:
+        enqueue(list_level(prefix)[1])
+
+    fetchers = [
+        threading.Thread(target=fetch_worker, name=f"materialize-fetch-{i}", daemon=True)
+        for i in range(fetch_concurrency)
+    ]
+    for t in fetchers:
+        t.start()
+
+    try:
+        with ThreadPoolExecutor(max_workers=list_concurrency, thread_name_prefix="materialize-list") as pool:
+            day_prefixes, stray = list_date_prefixes(pool, since)
+            day_prefixes = [p for p in day_prefixes if shard.owns_prefix(p)]
+            print(f"Listing {len(day_prefixes)} day prefixes under s3://{BUCKET}/{RAW_PREFIX}")
+            if shard.owns(UNKNOWN_DATE):
+                enqueue(stray)
+            # list() re-raises the first listing error
+            list(pool.map(list_day, day_prefixes))
+    finally:
+        for _ in fetchers:
+            keys.put(_DONE)
+        for t in fetchers:
+            t.join()
+    if errors:
+        raise errors[0]
+    if pending:
+        extract_chunk(pending)
+
+    stats.seconds = time.monotonic() - started
+    all_keys = [k for chunk_keys, _ in chunks for k in chunk_keys]
+    tables = [table for _, table in chunks]
+    table = pa.concat_tables(tables) if tables else DREAMS_SCHEMA.empty_table()
+    return all_keys, table, stats
+
+
+DICTIONARY_COLUMNS = [
+    "event_date",
+    "mbti",
+    "register_feel",
+    "wish_fulfillment_type",
+    "subject_position",
+]
+
+
+@dataclass
+class WriteOptions:
+    row_group_size: int = ROW_GROUP_SIZE
+    compression: str = PARQUET_COMPRESSION
+    dictionary: str = PARQUET_DICTIONARY
+
+    def use_dictionary(self) -> Union[bool, List[str]]:
+        if self.dictionary == "all":
+            return True
+        if self.dictionary == "none":
+            return False
+        return DICTIONARY_COLUMNS
+
+
+def group_by_event_date(keys: List[str], table: pa.Table) -> Dict[str, Tuple[List[str], pa.Table]]:
+    """Split rows (and their raw keys) into event_date partitions with one sort."""
+    dates = pc.fill_null(table.column("event_date"), UNKNOWN_DATE)
+    order = pc.sort_indices(dates)
+    table = table.take(order)
+    keys = [keys[i] for i in order.to_pylist()]
+
+    grouped: Dict[str, Tuple[List[str], pa.Table]] = {}
+    offset = 0
+    for item in pc.value_counts(dates.take(order)).to_pylist():
+        count = item["counts"]
+        grouped[item["values"]] = (keys[offset : offset + count], table.slice(offset, count))
+        offset += count
     return grouped
 
 
-def write_parquet_to_s3(rows: List[Dict[str, Any]], date: str) -> None:
-    if not rows:
-        return
-
-    table = pa.Table.from_pylist(rows)
-
-    key = f"{STRUCTURED_PREFIX}event_date={date}/part-{uuid4().hex}.parquet"
-    local_path = f"/tmp/{uuid4().hex}.parquet"
-
-    pq.write_table(table, local_path)
-
-    print(f"Uploading Parquet for date={date} to s3://{BUCKET}/{key}")
-    s3.upload_file(local_path, BUCKET, key)
-
-
-def main() -> None:
-    keys = list_raw_keys()
-    print(f"Found {len(keys)} raw event files.")
-
-    rows: List[Dict[str, Any]] = []
-    for key in keys:
+def rows_to_batches(rows: Iterable[Dict[str, Any]], batch_size: int) -> Iterator[pa.RecordBatch]:
+    it = iter(rows)
+    while True:
+        chunk = list(islice(it, batch_size))
+        if not chunk:
+            return
+        yield pa.RecordBatch.from_pylist(chunk, schema=DREAMS_SCHEMA)
+
+
+def write_batches_to_s3(
+    batches: Iterable[pa.RecordBatch],
+    date: str,
+    options: Optional[WriteOptions] = None,
+    table_prefix: str = STRUCTURED_PREFIX,
+) -> Optional[str]:
+    """
+    Stream record batches into one new part file for the partition,
+    straight into S3 (multipart once it outgrows one part). Returns the
+    key, or None if there were no rows.
+    """
+    options = options or WriteOptions()
+    batches = iter(batches)
+    first = next((b for b in batches if b.num_rows), None)
+    if first is None:
+        return None
+
+    key = f"{table_prefix}event_date={date}/part-{uuid4().hex}.parquet"
+    print(f"Writing Parquet for date={date} to s3://{BUCKET}/{key}")
+
+    with S3MultipartWriter(get_s3(), BUCKET, key, part_size=MULTIPART_PART_SIZE) as sink:
+        writer = pq.ParquetWriter(
+            sink,
+            DREAMS_SCHEMA,
+            compression=options.compression,
+            use_dictionary=options.use_dictionary(),
+        )
         try:
-            event = read_json_from_s3(key)
-            row = extract_row(event)
-            rows.append(row)
-        except Exception as e:
-            print(f"Skipping {key} due to error: {e}")
-
-    grouped = group_rows_by_event_date(rows)
+            writer.write_batch(first, row_group_size=options.row_group_size)
+            for batch in batches:
+                writer.write_batch(batch, row_group_size=options.row_group_size)
+        finally:
+            writer.close()
+    return key
+
+
+def write_parquet_to_s3(
+    rows: Iterable[Dict[str, Any]],
+    date: str,
+    options: Optional[WriteOptions] = None,
+) -> Optional[str]:
+    """Write one new part file for the partition; returns its key."""
+    options = options or WriteOptions()
+    return write_batches_to_s3(rows_to_batches(rows, options.row_group_size), date, options)
+
+
+def load_manifests(dates: List[str]) -> Dict[str, PartitionManifest]:
+    with ThreadPoolExecutor(max_workers=LIST_CONCURRENCY) as pool:
+        manifests = pool.map(lambda d: read_partition(get_s3(), BUCKET, STRUCTURED_PREFIX, d), dates)
+        return {m.event_date: m for m in manifests if m is not None}
+
+
+def plan_incremental(partition_dates: List[str], lookback_days: int) -> Tuple[date, Dict[str, PartitionManifest]]:
+    """
+    Watermark = newest partition with a manifest. Returns the first day to
+    list (watermark minus the lookback) and the manifests of every partition
+    from that day on, whose processed keys are skipped.
+    """
+    dated = [d for d in partition_dates if d != UNKNOWN_DATE]
+    watermark = date.fromisoformat(max(dated)) if dated else date.min
+    since = watermark - timedelta(days=lookback_days) if dated else date.min
+    recent = [d for d in partition_dates if d == UNKNOWN_DATE or date.fromisoformat(d) >= since]
+    print(f"Watermark {watermark.isoformat()}; listing raw events from {since.isoformat()}")
+    return since, load_manifests(recent)
+
+
+def commit_partitions(
+    grouped: Dict[str, Tuple[List[str], pa.Table]],
+    replace: bool,
+    options: Optional[WriteOptions] = None,
+    rollups: bool = ROLLUPS,
+) -> None:
+    """
+    Write one new file per touched partition, then its manifest, then (with
+    rollups) the partition's daily rollup. With replace=False the file is
+    appended to the partition's current files, read just before the commit
+    and written back only if unchanged (compaction may swap files at any
+    time); with replace=True it becomes the partition's only file.
+    """
+    options = options or WriteOptions()
+    for event_date, (new_keys, table) in sorted(grouped.items()):
+        file_key = write_batches_to_s3(table.to_batches(max_chunksize=options.row_group_size), event_date, options)
+
+        for _ in range(MANIFEST_COMMIT_ATTEMPTS):
+            current, etag = (None, None) if replace else read_partition_versioned(
+                get_s3(), BUCKET, STRUCTURED_PREFIX, event_date
+            )
+            manifest = PartitionManifest(event_date=event_date)
+            if current is not None:
+                manifest.files = list(current.files)
+                manifest.processed_keys = list(current.processed_keys)
+                manifest.rows = current.rows
+            manifest.files.append(file_key)
+            manifest.processed_keys.extend(new_keys)
+            manifest.rows += table.num_rows
+            try:
+                write_partition(
+                    get_s3(), BUCKET, STRUCTURED_PREFIX, manifest,
+                    if_match=etag, if_absent=not replace and current is None,
+                )
+                break
+            except ManifestConflict:
+                print(f"Partition {event_date} changed during the commit; retrying.")
+        else:
+            raise RuntimeError(f"Partition {event_date} kept changing; gave up committing {file_key}")
+        if rollups:
+            refresh_rollup(get_s3(), BUCKET, event_date, manifest.files, [([file_key], table)])
+
+
+def rebuild_rollups(dates: List[str]) -> int:
+    """Refresh the rollup of every given partition; returns how many were rewritten."""
+    def refresh(event_date: str) -> bool:
+        manifest = read_partition(get_s3(), BUCKET, STRUCTURED_PREFIX, event_date)
+        if manifest is None:
+            return False
+        return refresh_rollup(get_s3(), BUCKET, event_date, manifest.files)
+
+    with ThreadPoolExecutor(max_workers=LIST_CONCURRENCY) as pool:
+        return sum(pool.map(refresh, dates))
+
+
+def _partition_of(file_key: str) -> str:
+    for part in file_key[len(STRUCTURED_PREFIX):].split("/"):
+        if part.startswith("event_date="):
+            return part[len("event_date="):]
+    return UNKNOWN_DATE
+
+
+def sweep_after_full_refresh(old_dates: List[str], new_dates: Set[str], shard: Shard = Shard()) -> None:
+    """
+    Once every new manifest is in place: drop manifests of partitions that no
+    longer have rows, then delete every Parquet file no manifest references
+    (the previous generation and anything written before manifests existed).
+    Only the shard's own partitions are touched.
+    """
+    for event_date in old_dates:
+        if event_date not in new_dates and shard.owns(event_date):
+            delete_partition(get_s3(), BUCKET, STRUCTURED_PREFIX, event_date)
+            delete_rollup(get_s3(), BUCKET, event_date)
+
+    live: Set[str] = set()
+    for manifest in load_manifests(sorted(new_dates)).values():
+        live.update(manifest.files)
+    stale = [
+        k for k in list_data_files(get_s3(), BUCKET, STRUCTURED_PREFIX)
+        if k not in live and shard.owns(_partition_of(k))
+    ]
+    delete_keys(get_s3(), BUCKET, stale)
+    print(f"Full refresh removed {len(stale)} superseded files.")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Materialize raw dream events into Parquet.")
+    parser.add_argument("--list-concurrency", type=int, default=LIST_CONCURRENCY,
+                        help="concurrent LIST requests across day prefixes")
+    parser.add_argument("--fetch-concurrency", type=int, default=FETCH_CONCURRENCY,
+                        help="concurrent GET requests for raw events")
+    parser.add_argument("--max-pool-connections", type=int, default=MAX_POOL_CONNECTIONS,
+                        help="S3 connection pool size (default: list + fetch concurrency)")
+    parser.add_argument("--full-refresh", action="store_true",
+                        help="rebuild every partition from all raw events and swap it in")
+    parser.add_argument("--lookback-days", type=int, default=LOOKBACK_DAYS,
+                        help="days before the watermark to re-list in incremental runs")
+    parser.add_argument("--row-group-size", type=int, default=ROW_GROUP_SIZE,
+                        help="rows per Parquet row group (bounds writer memory)")
+    parser.add_argument("--compression", default=PARQUET_COMPRESSION,
+                        help="Parquet codec: zstd, snappy, gzip, none")
+    parser.add_argument("--dictionary", choices=("auto", "all", "none"), default=PARQUET_DICTIONARY,
+                        help="dictionary encoding: low-cardinality columns, all columns, or none")
+    parser.add_argument("--extract", choices=("arrow", "rows"), default=EXTRACT_MODE,
+                        help="vectorized batch extraction, or extract_row per event")
+    parser.add_argument("--shard", type=int, default=0,
+                        help="which shard this machine runs (0-based)")
+    parser.add_argument("--num-shards", type=int, default=1,
+                        help="number of machines splitting the partitions")
+    parser.add_argument("--processes", type=int, default=PROCESSES,
+                        help="local processes; splits this machine's shard further")
+    parser.add_argument("--no-rollups", dest="rollups", action="store_false", default=ROLLUPS,
+                        help="don't update structured/dream_rollups/v1/")
+    parser.add_argument("--rebuild-rollups", action="store_true",
+                        help="also bring every partition's rollup in line with its manifest")
+    args = parser.parse_args(argv)
+    if not 0 <= args.shard < args.num_shards:
+        parser.error("--shard must be in [0, --num-shards)")
+    return args
+
+
+def run(args: argparse.Namespace, shard: Shard) -> Dict[str, Any]:
+    """Materialize the partitions `shard` owns; returns a summary of the run."""
+    global _s3
+    _s3 = make_s3_client(args.max_pool_connections or args.fetch_concurrency + args.list_concurrency)
+    label = f"[{shard}] " if shard.count > 1 else ""
+
+    partition_dates = list_partitions(get_s3(), BUCKET, STRUCTURED_PREFIX)
+    owned_dates = [d for d in partition_dates if shard.owns(d)]
+    full_refresh = args.full_refresh or not owned_dates
+    if full_refresh:
+        if not args.full_refresh:
+            print(f"{label}No partition manifests yet; running a full refresh.")
+        since, manifests = None, {}
+    else:
+        # watermark over the whole table; skip lists from our partitions only
+        since, manifests = plan_incremental(partition_dates, args.lookback_days)
+        manifests = {d: m for d, m in manifests.items() if shard.owns(d)}
+
+    skip = frozenset(k for m in manifests.values() for k in m.processed_keys)
+    keys, table, stats = ingest_events(
+        args.list_concurrency, args.fetch_concurrency, since, skip, args.extract, shard
+    )
+    print(f"{label}Found {stats.listed} raw event files, {stats.skipped} already materialized.")
+    print(f"{label}{stats.report()}")
+
+    grouped = group_by_event_date(keys, table)
+    foreign = {d: g for d, g in grouped.items() if not shard.owns(d)}
+    if foreign:
+        # created_at disagrees with the raw key's day; left unprocessed for
+        # an unsharded run rather than written into another shard's partition
+        count = sum(len(k) for k, _ in foreign.values())
+        print(f"{label}Skipping {count} rows whose event_date belongs to another shard.")
+        grouped = {d: g for d, g in grouped.items() if shard.owns(d)}
+
+    options = WriteOptions(args.row_group_size, args.compression, args.dictionary)
+    commit_partitions(grouped, replace=full_refresh, options=options, rollups=args.rollups)
+    rows = sum(t.num_rows for _, t in grouped.values())
+    print(f"{label}Wrote {rows} rows to {len(grouped)} partitions.")
+
+    if full_refresh:
+        sweep_after_full_refresh(owned_dates, set(grouped), shard)
+    if args.rebuild_rollups:
+        # partitions written before rollups existed, or left stale by a crash
+        dates = list_partitions(get_s3(), BUCKET, STRUCTURED_PREFIX)
+        rebuilt = rebuild_rollups([d for d in dates if shard.owns(d)])
+        print(f"{label}Rebuilt {rebuilt} rollups.")
+
+    return {"rows": rows, "partitions": len(grouped), "fetched": stats.fetched, "bytes": stats.bytes}
+
+
+def local_shards(shard: Shard, processes: int) -> List[Shard]:
+    """
+    Split `shard` (i of n) across `processes` local workers as shards
+    i + n*j of n*p. crc % (n*p) == i + n*j implies crc % n == i, so the
+    local shards exactly cover what the machine shard owns, whatever
+    --processes the other machines run with.
+    """
+    count = shard.count * processes
+    return [Shard(shard.index + shard.count * j, count) for j in range(processes)]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    if args.processes <= 1:
+        run(args, Shard(args.shard, args.num_shards))
+        return
 
-    for date, group in grouped.items():
-        write_parquet_to_s3(group, date)
+    shards = local_shards(Shard(args.shard, args.num_shards), args.processes)
+    started = time.monotonic()
+    context = multiprocessing.get_context("spawn")  # boto3 clients are not fork-safe
+    with ProcessPoolExecutor(max_workers=args.processes, mp_context=context) as pool:
+        summaries = list(pool.map(run, [args] * len(shards), shards))
+
+    seconds = max(time.monotonic() - started, 1e-9)
+    fetched = sum(s["fetched"] for s in summaries)
+    mb = sum(s["bytes"] for s in summaries) / 1e6
+    print(
+        f"All {len(shards)} local shards done: {sum(s['rows'] for s in summaries)} rows in "
+        f"{sum(s['partitions'] for s in summaries)} partitions, "
+        f"{fetched / seconds:.1f} objects/s, {mb / seconds:.2f} MB/s overall"
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,108 @@
+"""
+Write-only file object that streams straight into an S3 object.
+
+Bytes are buffered up to one part and sent with upload_part as soon as a
+part is full, so memory stays at about one part however large the object
+gets and nothing touches local disk. Objects that never fill a part are
+sent with a single put_object instead of a multipart upload.
+"""
+
+from typing import Any, Dict, List, Optional
+
+# S3's minimum size for every part but the last.
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+class S3MultipartWriter:
+    def __init__(self, s3: Any, bucket: str, key: str, part_size: int = 8 * 1024 * 1024, content_type: str = "application/octet-stream"):
+        self._s3 = s3
+        self._bucket = bucket
+        self._key = key
+        self._part_size = max(part_size, MIN_PART_SIZE)
+        self._content_type = content_type
+
+        self._buffer = bytearray()
+        self._position = 0
+        self._upload_id: Optional[str] = None
+        self._parts: List[Dict[str, Any]] = []
+        self.closed = False
+
+    # --- file protocol used by pyarrow ---
+
+    def write(self, data: bytes) -> int:
+        if self.closed:
+            raise ValueError("write to closed S3MultipartWriter")
+        self._buffer += data
+        self._position += len(data)
+        while len(self._buffer) >= self._part_size:
+            self._upload_part(bytes(self._buffer[: self._part_size]))
+            del self._buffer[: self._part_size]
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def writable(self) -> bool:
+        return True
+
+    def close(self) -> None:
+        """Finish the object; it becomes visible in S3 only now."""
+        if self.closed:
+            return
+        if self._upload_id is None:
+            self._s3.put_object(
+                Bucket=self._bucket,
+                Key=self._key,
+                Body=bytes(self._buffer),
+                ContentType=self._content_type,
+            )
+        else:
+            if self._buffer:
+                self._upload_part(bytes(self._buffer))
+            self._s3.complete_multipart_upload(
+                Bucket=self._bucket,
+                Key=self._key,
+                UploadId=self._upload_id,
+                MultipartUpload={"Parts": self._parts},
+            )
+        self._buffer = bytearray()
+        self.closed = True
+
+    def abort(self) -> None:
+        """Drop everything written; no object is created."""
+        if self.closed:
+            return
+        if self._upload_id is not None:
+            self._s3.abort_multipart_upload(Bucket=self._bucket, Key=self._key, UploadId=self._upload_id)
+        self._buffer = bytearray()
+        self.closed = True
+
+    def __enter__(self) -> "S3MultipartWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    # --- internals ---
+
+    def _upload_part(self, body: bytes) -> None:
+        if self._upload_id is None:
+            resp = self._s3.create_multipart_upload(
+                Bucket=self._bucket, Key=self._key, ContentType=self._content_type
+            )
+            self._upload_id = resp["UploadId"]
+        number = len(self._parts) + 1
+        resp = self._s3.upload_part(
+            Bucket=self._bucket,
+            Key=self._key,
+            UploadId=self._upload_id,
+            PartNumber=number,
+            Body=body,
+        )
+        self._parts.append({"ETag": resp["ETag"], "PartNumber": number})
@@ -0,0 +1,23 @@
+from datetime import date, timedelta
+
+from lake_manifest import UNKNOWN_DATE
+from materialize_dreams_parquet import Shard, local_shards
+
+DATES = [(date(2023, 1, 1) + timedelta(days=i)).isoformat() for i in range(730)] + [UNKNOWN_DATE]
+
+
+def test_local_shards_partition_the_machine_shard():
+    for count in (1, 3, 4):
+        for index in range(count):
+            machine = Shard(index, count)
+            for processes in (1, 2, 8):
+                shards = local_shards(machine, processes)
+                for d in DATES:
+                    owners = [s for s in shards if s.owns(d)]
+                    assert len(owners) == (1 if machine.owns(d) else 0), (machine, processes, d)
+
+
+def test_machines_with_different_process_counts_cover_each_partition_once():
+    shards = local_shards(Shard(0, 2), 1) + local_shards(Shard(1, 2), 8)
+    for d in DATES:
+        assert sum(s.owns(d) for s in shards) == 1, d
@@ -0,0 +1,141 @@
+# backend/app/aws_clients.py
+# Shared, lazily built boto3 clients.
+#
+# Importing boto3 and building a client (service model, endpoint rules,
+# credential chain) costs ~200 ms for the import plus ~100 ms per client, and
+# every module used to pay it at import time with its own client. Modules now
+# hold a LazyClient: the real client is built on first use from one shared
+# session and reused by every module asking for the same (service, region),
+# so there is one connection pool per service instead of one per module.
+#
+# A client's pool is sized from the concurrency its users declare
+# (connections=...), not botocore's default of 10, which left warm-start,
+# WAL upload and Luma I/O threads queueing for sockets and discarding
+# connections ("Connection pool is full").
+
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+AWS_REGION = os.getenv("BEDROCK_REGION", "us-west-2")
+S3_REGION = os.getenv("S3_REGION", AWS_REGION)
+# Overrides the declared pool size for every client when set.
+AWS_MAX_POOL_CONNECTIONS = int(os.getenv("AWS_MAX_POOL_CONNECTIONS", "0")) or None
+AWS_MIN_POOL_CONNECTIONS = 10  # botocore's default
+AWS_CONNECT_TIMEOUT_SECONDS = float(os.getenv("AWS_CONNECT_TIMEOUT_SECONDS", "5"))
+AWS_READ_TIMEOUT_SECONDS = float(os.getenv("AWS_READ_TIMEOUT_SECONDS", "30"))
+# A full Claude render can take longer than a minute to come back.
+BEDROCK_READ_TIMEOUT_SECONDS = float(os.getenv("BEDROCK_READ_TIMEOUT_SECONDS", "120"))
+
+_READ_TIMEOUTS = {"bedrock-runtime": BEDROCK_READ_TIMEOUT_SECONDS}
+
+Key = Tuple[str, str]
+
+_lock = threading.Lock()
+_session: Any = None
+_clients: Dict[Key, Any] = {}
+_connections: Dict[Key, int] = {}
+_lazy: List["LazyClient"] = []
+
+
+def _key(service: str, region: Optional[str]) -> Key:
+    return service, region or (S3_REGION if service == "s3" else AWS_REGION)
+
+
+def pool_size(service: str, region: Optional[str] = None) -> int:
+    """Connections the client for (service, region) keeps open."""
+    if AWS_MAX_POOL_CONNECTIONS:
+        return AWS_MAX_POOL_CONNECTIONS
+    return max(AWS_MIN_POOL_CONNECTIONS, _connections.get(_key(service, region), 0))
+
+
+def require_connections(service: str, count: int, region: Optional[str] = None) -> None:
+    """Add `count` concurrent callers to the pool size of a client not built yet."""
+    key = _key(service, region)
+    with _lock:
+        _connections[key] = _connections.get(key, 0) + count
+        if key in _clients:
+            print(f"[AWS] {key[0]} client already built; {count} more connections not applied")
+
+
+def get_client(service: str, region: Optional[str] = None) -> Any:
+    """The shared client for (service, region), built on first call."""
+    global _session
+    key = _key(service, region)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+    # boto3 sessions aren't thread-safe; build clients one at a time
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            import boto3
+            from botocore.config import Config
+
+            if _session is None:
+                _session = boto3.session.Session()
+            client = _clients[key] = _session.client(
+                service,
+                region_name=key[1],
+                config=Config(
+                    max_pool_connections=pool_size(*key),
+                    connect_timeout=AWS_CONNECT_TIMEOUT_SECONDS,
+                    read_timeout=_READ_TIMEOUTS.get(service, AWS_READ_TIMEOUT_SECONDS),
+                ),
+            )
+    return client
+
+
+class LazyClient:
+    """Stands in for a boto3 client; attribute access goes to the shared client."""
+
+    __slots__ = ("service", "region", "_client")
+
+    def __init__(self, service: str, region: Optional[str] = None):
+        self.service = service
+        self.region = region
+        self._client: Any = None
+
+    def resolve(self) -> Any:
+        client = self._client
+        if client is None:
+            client = self._client = get_client(self.service, self.region)
+        return client
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.resolve(), name)
+
+    def __repr__(self) -> str:
+        state = "built" if self._client is not None else "not built"
+        return f"<LazyClient {self.service} {_key(self.service, self.region)[1]} ({state})>"
+
+
+def lazy_client(service: str, region: Optional[str] = None, connections: int = 0) -> LazyClient:
+    """A LazyClient, declaring `connections` concurrent callers for its pool."""
+    if connections:
+        require_connections(service, connections, region)
+    client = LazyClient(service, region)
+    with _lock:
+        _lazy.append(client)
+    return client
+
+
+def warm(clients: Optional[Iterable[LazyClient]] = None) -> None:
+    """Build clients ahead of their first request (all lazy clients by default)."""
+    with _lock:
+        pending = list(_lazy if clients is None else clients)
+    for client in pending:
+        try:
+            client.resolve()
+        except Exception as e:
+            print(f"[AWS] Building {client.service} client failed: {e}")
+
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        keys = set(_connections) | set(_clients)
+        built = set(_clients)
+    return {
+        f"{service}/{region}": {"pool_size": pool_size(service, region), "built": (service, region) in built}
+        for service, region in sorted(keys)
+    }
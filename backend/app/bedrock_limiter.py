@@ -0,0 +1,299 @@
+# backend/app/bedrock_limiter.py
+# Client-side admission control in front of bedrock_client.invoke_model.
+#
+# Three layers, checked in order for every call:
+#   1. token buckets sized from the account's RPM / TPM quota,
+#   2. an AIMD concurrency limit that shrinks by 30% on ThrottlingException and
+#      creeps back up on success,
+#   3. a bounded wait queue with a per-call deadline; throttled calls are
+#      retried with full-jitter exponential backoff inside that deadline.
+# When the queue is full or the deadline passes, BedrockOverloaded is raised
+# so the API can answer 503 + Retry-After instead of a bare 500.
+
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, Optional, Tuple, TypeVar
+
+from botocore.exceptions import ClientError
+
+BEDROCK_RPM_LIMIT = int(os.getenv("BEDROCK_RPM_LIMIT", "50"))
+BEDROCK_TPM_LIMIT = int(os.getenv("BEDROCK_TPM_LIMIT", "200000"))
+BEDROCK_MAX_CONCURRENCY = int(os.getenv("BEDROCK_MAX_CONCURRENCY", "16"))
+BEDROCK_MIN_CONCURRENCY = 1
+BEDROCK_QUEUE_MAX = int(os.getenv("BEDROCK_QUEUE_MAX", "64"))
+BEDROCK_QUEUE_TIMEOUT_SECONDS = float(os.getenv("BEDROCK_QUEUE_TIMEOUT_SECONDS", "60"))
+BEDROCK_MAX_RETRIES = int(os.getenv("BEDROCK_MAX_RETRIES", "4"))
+BEDROCK_BACKOFF_BASE_SECONDS = 0.5
+BEDROCK_BACKOFF_CAP_SECONDS = 20.0
+# Multiplicative decrease applied to the concurrency limit on throttling.
+# Only calls admitted after the last decrease can trigger another one, so a
+# burst of throttles from one overloaded window counts as a single signal.
+AIMD_DECREASE = 0.7
+# Window for the reported throttle rate.
+STATS_WINDOW_SECONDS = 60.0
+
+RETRYABLE_CODES = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceUnavailableException",
+    "ModelNotReadyException",
+}
+
+T = TypeVar("T")
+
+
+class BedrockOverloaded(RuntimeError):
+    """Raised when a call could not be admitted (queue full or deadline hit)."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def is_throttle(error: BaseException) -> bool:
+    if not isinstance(error, ClientError):
+        return False
+    return error.response.get("Error", {}).get("Code") in RETRYABLE_CODES
+
+
+class TokenBucket:
+    """Classic token bucket; not thread-safe on its own (guarded by the limiter)."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` tokens are available (0 if they are now)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.tokens -= min(amount, self.capacity)
+
+    def adjust(self, amount: float) -> None:
+        """Give back (positive) or charge extra (negative) tokens after the fact."""
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class AdaptiveLimiter:
+    def __init__(
+        self,
+        rpm: int = BEDROCK_RPM_LIMIT,
+        tpm: int = BEDROCK_TPM_LIMIT,
+        max_concurrency: int = BEDROCK_MAX_CONCURRENCY,
+        queue_max: int = BEDROCK_QUEUE_MAX,
+        queue_timeout: float = BEDROCK_QUEUE_TIMEOUT_SECONDS,
+        max_retries: int = BEDROCK_MAX_RETRIES,
+    ):
+        self._requests = TokenBucket(rpm)
+        self._tokens = TokenBucket(tpm)
+        self._max_concurrency = max_concurrency
+        self._limit = float(max_concurrency)
+        self._queue_max = queue_max
+        self._queue_timeout = queue_timeout
+        self._max_retries = max_retries
+
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._waiting = 0
+        self._last_decrease = 0.0
+
+        # rolling window of (timestamp, throttled) per attempt
+        self._attempts: Deque[Tuple[float, bool]] = deque()
+        self._counters = {
+            "calls": 0,
+            "throttles": 0,
+            "retries": 0,
+            "rejected_queue_full": 0,
+            "rejected_deadline": 0,
+        }
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._admitted = 0
+
+    # --- public API ---
+
+    def call(self, fn: Callable[[], T], estimated_tokens: int, timeout: Optional[float] = None) -> T:
+        """
+        Run fn() once admitted, retrying throttled attempts with jittered
+        backoff until the deadline. Raises BedrockOverloaded if the call
+        cannot be admitted in time; other errors propagate unchanged.
+        """
+        result, admitted_at = self._admit_and_run(fn, estimated_tokens, timeout)
+        self._release(admitted_at, throttled=False)
+        return result
+
+    @contextmanager
+    def hold(self, fn: Callable[[], T], estimated_tokens: int, timeout: Optional[float] = None) -> Iterator[T]:
+        """
+        call() for responses the model keeps working on after fn returns, such
+        as a response stream: the slot stays taken until the with block exits.
+        """
+        result, admitted_at = self._admit_and_run(fn, estimated_tokens, timeout)
+        throttled = failed = False
+        try:
+            yield result
+        except Exception as e:
+            throttled = is_throttle(e)
+            failed = not throttled
+            raise
+        finally:
+            self._release(admitted_at, throttled=throttled, failed=failed)
+
+    def reconcile(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """Correct the TPM bucket once the real token count is known."""
+        with self._cond:
+            self._tokens.adjust(estimated_tokens - actual_tokens)
+
+    def saturated(self) -> bool:
+        """True when new calls would be rejected right away."""
+        with self._cond:
+            return self._waiting >= self._queue_max
+
+    def retry_after(self) -> float:
+        with self._cond:
+            return self._retry_after_locked(1, time.monotonic())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            now = time.monotonic()
+            self._trim(now)
+            attempts = len(self._attempts)
+            throttled = sum(1 for _, t in self._attempts if t)
+            out: Dict[str, Any] = dict(self._counters)
+            out.update(
+                queue_depth=self._waiting,
+                in_flight=self._in_flight,
+                concurrency_limit=round(self._limit, 2),
+                wait_seconds_avg=round(self._wait_total / self._admitted, 4) if self._admitted else 0.0,
+                wait_seconds_max=round(self._wait_max, 4),
+                throttle_rate=round(throttled / attempts, 4) if attempts else 0.0,
+                rpm_tokens_available=round(self._requests.tokens, 1),
+                tpm_tokens_available=round(self._tokens.tokens, 1),
+            )
+        return out
+
+    # --- internals ---
+
+    def _admit_and_run(
+        self, fn: Callable[[], T], estimated_tokens: int, timeout: Optional[float]
+    ) -> Tuple[T, float]:
+        # Returns fn()'s result with the slot still taken; the caller releases it.
+        deadline = time.monotonic() + (self._queue_timeout if timeout is None else timeout)
+        attempt = 0
+        with self._cond:
+            self._counters["calls"] += 1
+
+        while True:
+            admitted_at = self._acquire(estimated_tokens, deadline)
+            try:
+                result = fn()
+            except Exception as e:
+                throttled = is_throttle(e)
+                self._release(admitted_at, throttled=throttled, failed=not throttled)
+                if not throttled or attempt >= self._max_retries:
+                    raise
+                attempt += 1
+                backoff = random.uniform(
+                    0, min(BEDROCK_BACKOFF_CAP_SECONDS, BEDROCK_BACKOFF_BASE_SECONDS * 2 ** attempt)
+                )
+                if time.monotonic() + backoff >= deadline:
+                    raise BedrockOverloaded(
+                        "Bedrock is throttling and the retry deadline has passed",
+                        retry_after=backoff,
+                    ) from e
+                with self._cond:
+                    self._counters["retries"] += 1
+                print(f"[BEDROCK] Throttled; retry {attempt} in {backoff:.2f}s")
+                time.sleep(backoff)
+                continue
+
+            return result, admitted_at
+
+    def _acquire(self, tokens: int, deadline: float) -> float:
+        start = time.monotonic()
+        with self._cond:
+            if self._waiting >= self._queue_max:
+                self._counters["rejected_queue_full"] += 1
+                raise BedrockOverloaded(
+                    "Bedrock request queue is full",
+                    retry_after=self._retry_after_locked(tokens, start),
+                )
+            self._waiting += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait: Optional[float] = None
+                    if self._in_flight < max(BEDROCK_MIN_CONCURRENCY, int(self._limit)):
+                        wait = max(
+                            self._requests.wait_time(1, now),
+                            self._tokens.wait_time(tokens, now),
+                        )
+                        if wait == 0.0:
+                            self._requests.take(1)
+                            self._tokens.take(tokens)
+                            self._in_flight += 1
+                            waited = now - start
+                            self._admitted += 1
+                            self._wait_total += waited
+                            self._wait_max = max(self._wait_max, waited)
+                            return now
+
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self._counters["rejected_deadline"] += 1
+                        raise BedrockOverloaded(
+                            "Timed out waiting for Bedrock capacity",
+                            retry_after=self._retry_after_locked(tokens, now),
+                        )
+                    # Either a slot frees up (notify) or tokens refill (timeout).
+                    self._cond.wait(timeout=remaining if wait is None else min(remaining, wait))
+            finally:
+                self._waiting -= 1
+
+    def _release(self, admitted_at: float, throttled: bool, failed: bool = False) -> None:
+        # Only throttles and successes move the limit: a run of other errors
+        # (bad requests, 5xx) says nothing about capacity.
+        with self._cond:
+            now = time.monotonic()
+            self._in_flight -= 1
+            self._attempts.append((now, throttled))
+            self._trim(now)
+            if throttled:
+                self._counters["throttles"] += 1
+                if admitted_at >= self._last_decrease:
+                    self._limit = max(float(BEDROCK_MIN_CONCURRENCY), self._limit * AIMD_DECREASE)
+                    self._last_decrease = now
+            elif not failed:
+                # additive increase: about +1 per "window" of successful calls
+                self._limit = min(float(self._max_concurrency), self._limit + 1.0 / self._limit)
+            self._cond.notify_all()
+
+    def _trim(self, now: float) -> None:
+        cutoff = now - STATS_WINDOW_SECONDS
+        while self._attempts and self._attempts[0][0] < cutoff:
+            self._attempts.popleft()
+
+    def _retry_after_locked(self, tokens: int, now: float) -> float:
+        return max(
+            1.0,
+            self._requests.wait_time(1, now),
+            self._tokens.wait_time(tokens, now),
+        )
+
+
+bedrock_limiter = AdaptiveLimiter()
@@ -0,0 +1,363 @@
+# backend/app/dream_event_wal.py
+# Write-behind for raw dream events.
+#
+# create_dream appends the event to a local write-ahead log (fsync'd JSON
+# lines) and returns; a background writer drains the log to S3 with bounded
+# concurrency and retries. Each log segment has a sidecar .ack file listing
+# the entries already uploaded. On startup every un-acked entry is replayed,
+# and a segment is deleted once it is closed and fully acked, so an accepted
+# dream is never lost even if S3 is down or the process dies mid-upload.
+#
+# Every process (e.g. each `uvicorn --workers N` worker) writes its own
+# subdirectory of DREAM_WAL_DIR and holds an flock on it while it runs. On
+# start, a process adopts the segments of every subdirectory whose lock it
+# can take, i.e. whose owner is gone, so each orphaned log is replayed by
+# exactly one process and no process touches another live process's files.
+
+import fcntl
+import heapq
+import json
+import os
+import queue
+import random
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from uuid import uuid4
+
+DREAM_WAL_DIR = os.getenv("DREAM_WAL_DIR", ".wal/dream_events")
+DREAM_WAL_FSYNC = os.getenv("DREAM_WAL_FSYNC", "true").lower() == "true"
+DREAM_WAL_SEGMENT_BYTES = int(os.getenv("DREAM_WAL_SEGMENT_BYTES", str(4 * 1024 * 1024)))
+DREAM_WAL_UPLOAD_CONCURRENCY = int(os.getenv("DREAM_WAL_UPLOAD_CONCURRENCY", "8"))
+DREAM_WAL_RETRY_CAP_SECONDS = 60.0
+DREAM_WAL_SHUTDOWN_TIMEOUT_SECONDS = float(os.getenv("DREAM_WAL_SHUTDOWN_TIMEOUT_SECONDS", "10"))
+
+# (key, body) -> None; raises on failure
+PutFn = Callable[[str, str], None]
+
+
+@dataclass(order=True)
+class _Entry:
+    not_before: float
+    id: str = field(compare=False)
+    segment: int = field(compare=False)
+    key: str = field(compare=False)
+    body: str = field(compare=False)
+    attempts: int = field(default=0, compare=False)
+
+
+class DreamEventWAL:
+    def __init__(
+        self,
+        directory: str,
+        put: PutFn,
+        concurrency: int = DREAM_WAL_UPLOAD_CONCURRENCY,
+        fsync: bool = DREAM_WAL_FSYNC,
+        segment_bytes: int = DREAM_WAL_SEGMENT_BYTES,
+    ):
+        self._base = directory
+        self._dir = directory  # this process's subdirectory once started
+        self._owner_fd: Optional[int] = None
+        self._put = put
+        self._concurrency = concurrency
+        self._fsync = fsync
+        self._segment_bytes = segment_bytes
+
+        self._lock = threading.Lock()
+        self._segment = 0
+        self._segment_file: Optional[Any] = None
+        self._outstanding: Dict[int, int] = {}
+
+        self._ready: "queue.Queue[_Entry]" = queue.Queue()
+        self._retries: List[_Entry] = []  # heap ordered by not_before
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._in_flight = 0
+        # queued or uploading; set before an entry is queued so flush() never
+        # misses one the writer has dequeued but not yet submitted
+        self._unsettled = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._writer: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._idle = threading.Condition(self._lock)
+        self._start_lock = threading.Lock()
+        self._started = False
+
+        self._counters = {"appended": 0, "replayed": 0, "flushed": 0, "upload_failures": 0}
+
+    # --- lifecycle ---
+
+    def start(self) -> None:
+        """Replay un-acked entries from previous runs and start the writer."""
+        with self._start_lock:
+            if self._started:
+                return
+            self._claim_directory()
+            with self._lock:
+                self._replay()
+                self._open_segment(self._segment + 1)
+
+            self._stop.clear()
+            self._executor = ThreadPoolExecutor(
+                max_workers=self._concurrency, thread_name_prefix="dream-wal-upload"
+            )
+            self._writer = threading.Thread(target=self._run, name="dream-wal-writer", daemon=True)
+            self._writer.start()
+            self._started = True
+
+    def close(self, timeout: float = DREAM_WAL_SHUTDOWN_TIMEOUT_SECONDS) -> None:
+        """
+        Try to flush everything to S3 within `timeout`, then stop. Anything
+        still pending stays in the log and is replayed on the next start.
+        """
+        with self._start_lock:
+            if not self._started:
+                return
+            self.flush(timeout)
+            self._stop.set()
+            self._writer.join(timeout=5)
+            self._executor.shutdown(wait=True)
+            with self._lock:
+                self._segment_file.close()
+                self._segment_file = None
+                drained = not any(self._outstanding.values())
+            self._release_directory(remove=drained)
+            self._started = False
+
+    def flush(self, timeout: float) -> bool:
+        """
+        Wait until every entry has had an upload attempt and nothing is in
+        flight. Returns True if that happened within `timeout`.
+        """
+        deadline = time.monotonic() + timeout
+        with self._idle:
+            while self._pending_locked():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._idle.wait(timeout=min(remaining, 0.5))
+        return True
+
+    # --- request path ---
+
+    def append(self, key: str, body: str) -> None:
+        """Durably record an event; returns once it is on local disk."""
+        if not self._started:
+            self.start()
+        entry_id = uuid4().hex
+        line = json.dumps({"id": entry_id, "key": key, "body": body}) + "\n"
+        with self._lock:
+            f = self._segment_file
+            f.write(line)
+            f.flush()
+            if self._fsync:
+                os.fsync(f.fileno())
+            segment = self._segment
+            self._outstanding[segment] = self._outstanding.get(segment, 0) + 1
+            self._counters["appended"] += 1
+            self._unsettled += 1
+            if f.tell() >= self._segment_bytes:
+                self._open_segment(segment + 1)
+        self._ready.put(_Entry(0.0, entry_id, segment, key, body))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            out = dict(self._counters)
+            out.update(
+                pending=self._ready.qsize() + len(self._retries),
+                in_flight=self._in_flight,
+                segments=len(self._outstanding),
+            )
+        return out
+
+    # --- writer ---
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            entry = self._next_entry()
+            if entry is None:
+                continue
+            self._slots.acquire()
+            with self._lock:
+                self._in_flight += 1
+            self._executor.submit(self._upload, entry)
+
+    def _next_entry(self) -> Optional[_Entry]:
+        with self._lock:
+            now = time.monotonic()
+            if self._retries and self._retries[0].not_before <= now:
+                self._unsettled += 1
+                return heapq.heappop(self._retries)
+            wait = self._retries[0].not_before - now if self._retries else 0.5
+        try:
+            return self._ready.get(timeout=min(wait, 0.5))
+        except queue.Empty:
+            return None
+
+    def _upload(self, entry: _Entry) -> None:
+        try:
+            self._put(entry.key, entry.body)
+        except Exception as e:
+            entry.attempts += 1
+            backoff = min(DREAM_WAL_RETRY_CAP_SECONDS, 2.0 ** entry.attempts) * random.uniform(0.5, 1.0)
+            print(f"[WAL] Upload of {entry.key} failed (attempt {entry.attempts}), retrying in {backoff:.1f}s: {e}")
+            entry.not_before = time.monotonic() + backoff
+            with self._lock:
+                self._counters["upload_failures"] += 1
+                heapq.heappush(self._retries, entry)
+        else:
+            self._ack(entry)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self._unsettled -= 1
+                self._idle.notify_all()
+            self._slots.release()
+
+    def _ack(self, entry: _Entry) -> None:
+        with self._lock:
+            with open(self._ack_path(entry.segment), "a", encoding="utf-8") as f:
+                f.write(entry.id + "\n")
+                f.flush()
+                if self._fsync:
+                    os.fsync(f.fileno())
+            self._counters["flushed"] += 1
+            self._outstanding[entry.segment] -= 1
+            if self._outstanding[entry.segment] == 0 and entry.segment != self._segment:
+                self._drop_segment(entry.segment)
+
+    # --- ownership ---
+
+    def _guard(self) -> Any:
+        # Serializes claiming, adopting and removing subdirectories across
+        # processes; held only briefly at start and close.
+        f = open(os.path.join(self._base, ".lock"), "a")
+        fcntl.flock(f, fcntl.LOCK_EX)
+        return f
+
+    def _claim_directory(self) -> None:
+        os.makedirs(self._base, exist_ok=True)
+        with self._guard():
+            self._dir = os.path.join(self._base, f"{os.getpid()}-{uuid4().hex[:8]}")
+            os.makedirs(self._dir)
+            self._owner_fd = os.open(os.path.join(self._dir, ".lock"), os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(self._owner_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+            # segments written before logs were per process
+            adopted = self._adopt_segments(self._base, 0)
+            for name in sorted(os.listdir(self._base)):
+                path = os.path.join(self._base, name)
+                if path != self._dir and os.path.isdir(path):
+                    adopted = self._adopt_orphan(path, adopted)
+
+    def _adopt_orphan(self, path: str, adopted: int) -> int:
+        try:
+            fd: Optional[int] = os.open(os.path.join(path, ".lock"), os.O_RDWR)
+        except FileNotFoundError:
+            fd = None  # owner died before taking its lock
+        try:
+            if fd is not None:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return adopted  # owner still running
+            adopted = self._adopt_segments(path, adopted)
+            print(f"[WAL] Adopted the log of stopped process {os.path.basename(path)}")
+            shutil.rmtree(path, ignore_errors=True)
+        finally:
+            if fd is not None:
+                os.close(fd)
+        return adopted
+
+    def _adopt_segments(self, path: str, adopted: int) -> int:
+        # Move another directory's segments into ours, renumbered after the
+        # ones already adopted; _replay then treats them as our own. A crash
+        # between the two renames only means re-uploading acked entries.
+        for segment in self._segment_numbers(path):
+            adopted += 1
+            name = f"segment-{segment:08d}"
+            os.rename(os.path.join(path, name + ".log"), self._segment_path(adopted))
+            if os.path.exists(os.path.join(path, name + ".ack")):
+                os.rename(os.path.join(path, name + ".ack"), self._ack_path(adopted))
+        return adopted
+
+    def _release_directory(self, remove: bool) -> None:
+        with self._guard():
+            if remove:
+                shutil.rmtree(self._dir, ignore_errors=True)
+            os.close(self._owner_fd)
+            self._owner_fd = None
+
+    # --- segments ---
+
+    @staticmethod
+    def _segment_numbers(directory: str) -> List[int]:
+        return sorted(
+            int(name[len("segment-"):-len(".log")])
+            for name in os.listdir(directory)
+            if name.startswith("segment-") and name.endswith(".log")
+        )
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self._dir, f"segment-{segment:08d}.log")
+
+    def _ack_path(self, segment: int) -> str:
+        return os.path.join(self._dir, f"segment-{segment:08d}.ack")
+
+    def _open_segment(self, segment: int) -> None:
+        # caller holds self._lock
+        previous = self._segment
+        if self._segment_file is not None:
+            self._segment_file.close()
+            if self._outstanding.get(previous, 0) == 0:
+                self._drop_segment(previous)
+        self._segment = segment
+        self._segment_file = open(self._segment_path(segment), "a", encoding="utf-8")
+        self._outstanding.setdefault(segment, 0)
+
+    def _drop_segment(self, segment: int) -> None:
+        self._outstanding.pop(segment, None)
+        for path in (self._segment_path(segment), self._ack_path(segment)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _replay(self) -> None:
+        segments = self._segment_numbers(self._dir)
+        for segment in segments:
+            acked: Set[str] = set()
+            if os.path.exists(self._ack_path(segment)):
+                with open(self._ack_path(segment), encoding="utf-8") as f:
+                    acked = {line.strip() for line in f if line.strip()}
+
+            pending: List[Tuple[str, str, str]] = []
+            with open(self._segment_path(segment), encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # torn final write from a crash; the request never got its 200
+                        continue
+                    if record["id"] not in acked:
+                        pending.append((record["id"], record["key"], record["body"]))
+
+            if not pending:
+                self._drop_segment(segment)
+                continue
+
+            self._outstanding[segment] = len(pending)
+            self._unsettled += len(pending)
+            for entry_id, key, body in pending:
+                self._ready.put(_Entry(0.0, entry_id, segment, key, body))
+            self._counters["replayed"] += len(pending)
+            print(f"[WAL] Replaying {len(pending)} unflushed events from segment {segment}")
+
+        self._segment = max(segments, default=0)
+
+    def _pending_locked(self) -> bool:
+        # Entries backing off after a failed upload don't count: they are
+        # safe in the log and get replayed on the next start.
+        return self._unsettled > 0
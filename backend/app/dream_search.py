@@ -0,0 +1,403 @@
+# backend/app/dream_search.py
+# Full-text search and "similar dreams" over titles, narratives and the
+# key_signifiers the model produces at render time.
+#
+# The index lives in memory: term -> {doc: weighted tf} postings for boolean
+# queries ranked with BM25, and MinHash signatures bucketed with LSH for
+# near-duplicate lookups, so a query touches only the postings of its terms
+# and a similarity lookup only the dreams sharing an LSH band.
+#
+# Each dream's forward entry (its term counts and signifiers) is also written
+# to a SQLite file with a sequence number. On startup the postings are rebuilt
+# from that file without re-tokenizing, and every query first picks up rows
+# other `uvicorn --workers` processes added since it last looked.
+
+import hashlib
+import heapq
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .dream_store import DREAM_STORE, DreamStore
+from .schemas import Dream
+
+# "" keeps the index in memory only (the default with DREAM_STORE=memory).
+DREAM_SEARCH_PATH = os.getenv(
+    "DREAM_SEARCH_PATH", "" if DREAM_STORE == "memory" else ".data/dream_search.sqlite3"
+)
+DREAM_SEARCH_BACKFILL_BATCH = int(os.getenv("DREAM_SEARCH_BACKFILL_BATCH", "1000"))
+
+# A term in the title counts twice, a model-chosen signifier three times.
+FIELD_WEIGHTS = {"title": 2, "narrative": 1, "signifiers": 3}
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+MINHASH_PERMUTATIONS = 64
+# 16 bands of 4 rows: dreams with Jaccard >= ~0.5 share a band with high probability.
+LSH_BANDS = 16
+_LSH_ROWS = MINHASH_PERMUTATIONS // LSH_BANDS
+
+_TOKEN = re.compile(r"[^\W_]+(?:'[^\W_]+)?")
+_STOPWORDS = frozenset(
+    """a about after again all also am an and any are as at be been before being but by
+    can could did do does doing down during each for from further had has have having he
+    her here hers him his how i if in into is it its just me more most my no nor not now
+    of off on once only or other our out over own same she should so some such than that
+    the their them then there these they this those through to too under until up very
+    was we were what when where which while who whom why will with would you your""".split()
+)
+
+_MASK32 = (1 << 32) - 1
+_MASK64 = (1 << 64) - 1
+
+
+def _permutations() -> List[Tuple[int, int]]:
+    # fixed seeds: signatures are persisted and must not change between runs
+    params = []
+    for i in range(MINHASH_PERMUTATIONS):
+        digest = hashlib.blake2b(f"minhash-{i}".encode(), digest_size=16).digest()
+        a = int.from_bytes(digest[:8], "little") | 1
+        b = int.from_bytes(digest[8:], "little")
+        params.append((a, b))
+    return params
+
+
+_PERMUTATIONS = _permutations()
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        if token.endswith("'s"):
+            token = token[:-2]
+        if len(token) > 1 and token not in _STOPWORDS:
+            tokens.append(token)
+    return tokens
+
+
+def document_terms(dream: Dream, signifiers: Iterable[str] = ()) -> Dict[str, int]:
+    """Field-weighted term frequencies for one dream."""
+    terms: Counter = Counter()
+    for field, text in (("title", dream.title), ("narrative", dream.narrative)):
+        weight = FIELD_WEIGHTS[field]
+        for token in tokenize(text):
+            terms[token] += weight
+    for signifier in signifiers:
+        for token in tokenize(signifier):
+            terms[token] += FIELD_WEIGHTS["signifiers"]
+    return dict(terms)
+
+
+# term -> its 64 permuted hash values; dream vocabularies are Zipfian, so a
+# modest cache turns most of the MinHash cost into a lookup
+_term_hashes: Dict[str, array] = {}
+_TERM_HASH_CACHE_MAX = int(os.getenv("DREAM_SEARCH_TERM_HASH_CACHE", "50000"))
+
+
+def _term_hash(term: str) -> array:
+    values = _term_hashes.get(term)
+    if values is None:
+        h = int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little")
+        values = array("I", (((a * h + b) & _MASK64) >> 32 for a, b in _PERMUTATIONS))
+        if len(_term_hashes) >= _TERM_HASH_CACHE_MAX:
+            _term_hashes.clear()
+        _term_hashes[term] = values
+    return values
+
+
+def minhash(terms: Iterable[str]) -> array:
+    """MinHash signature of a term set (64 x 32-bit)."""
+    rows = [_term_hash(t) for t in terms]
+    if not rows:
+        return array("I", [_MASK32] * MINHASH_PERMUTATIONS)
+    return array("I", map(min, zip(*rows)))
+
+
+def _bands(signature: array) -> List[Tuple[int, bytes]]:
+    raw = signature.tobytes()
+    width = _LSH_ROWS * signature.itemsize
+    return [(i, raw[i * width : (i + 1) * width]) for i in range(LSH_BANDS)]
+
+
+class QueryError(ValueError):
+    pass
+
+
+def parse_query(query: str) -> List[Tuple[List[str], List[str]]]:
+    """
+    Boolean query -> OR of (required terms, excluded terms) groups.
+
+      teeth exams            both terms (AND is implied; "AND" is accepted)
+      teeth OR exams         either
+      teeth -school          teeth but not school ("NOT school" works too)
+    """
+    groups: List[Tuple[List[str], List[str]]] = []
+    for clause in re.split(r"\s+OR\s+|\s*\|\s*", query.strip()):
+        required: List[str] = []
+        excluded: List[str] = []
+        negate = False
+        for word in clause.split():
+            if word == "AND":
+                continue
+            if word == "NOT":
+                negate = True
+                continue
+            target = excluded if negate or word.startswith("-") else required
+            target.extend(tokenize(word.lstrip("-")))
+            negate = False
+        if required:
+            groups.append((required, excluded))
+    if not groups:
+        raise QueryError("query has no searchable terms")
+    return groups
+
+
+class DreamSearchIndex:
+    _SCHEMA = """
+    CREATE TABLE IF NOT EXISTS search_docs (
+        dream_id TEXT PRIMARY KEY,
+        seq INTEGER NOT NULL,
+        terms TEXT NOT NULL,
+        signifiers TEXT NOT NULL,
+        signature BLOB NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS search_docs_seq ON search_docs (seq);
+    """
+
+    def __init__(self, path: str = DREAM_SEARCH_PATH):
+        self._path = path
+        self._local = threading.local()
+        self._lock = threading.RLock()
+        self._seq = 0  # highest persisted row applied to memory
+
+        self._ids: List[str] = []
+        self._doc: Dict[str, int] = {}
+        self._terms: List[Dict[str, int]] = []
+        self._signifiers: List[List[str]] = []
+        self._lengths: List[int] = []
+        self._total_length = 0
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._signatures: List[array] = []
+        self._buckets: Dict[Tuple[int, bytes], Set[int]] = {}
+
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = self._conn()
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(self._SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # --- writes ---
+
+    def add(self, dream: Dream) -> None:
+        """Index a new dream (or re-index an edited one), keeping its signifiers."""
+        with self._lock:
+            doc = self._doc.get(dream.id)
+            signifiers = self._signifiers[doc] if doc is not None else []
+        self._upsert(dream.id, document_terms(dream, signifiers), signifiers)
+
+    def set_signifiers(self, dream: Dream, signifiers: Iterable[str]) -> None:
+        """Fold the render's key_signifiers into the dream's entry."""
+        signifiers = [s for s in signifiers if isinstance(s, str) and s.strip()]
+        with self._lock:
+            doc = self._doc.get(dream.id)
+            if doc is not None and self._signifiers[doc] == signifiers:
+                return
+        self._upsert(dream.id, document_terms(dream, signifiers), signifiers)
+
+    def backfill(self, store: DreamStore, batch_size: int = DREAM_SEARCH_BACKFILL_BATCH) -> int:
+        """Index every stored dream the index doesn't know yet; returns how many."""
+        self.refresh()
+        added = 0
+        offset = 0
+        while True:
+            dreams = store.list(limit=batch_size, offset=offset)
+            if not dreams:
+                return added
+            offset += len(dreams)
+            for dream in dreams:
+                with self._lock:
+                    known = dream.id in self._doc
+                if not known:
+                    self._upsert(dream.id, document_terms(dream), [])
+                    added += 1
+
+    def _upsert(self, dream_id: str, terms: Dict[str, int], signifiers: List[str]) -> None:
+        signature = minhash(terms)
+        with self._lock:
+            if self._path:
+                conn = self._conn()
+                conn.execute(
+                    "INSERT INTO search_docs (dream_id, seq, terms, signifiers, signature) "
+                    "VALUES (?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM search_docs), ?, ?, ?) "
+                    "ON CONFLICT (dream_id) DO UPDATE SET seq = excluded.seq, terms = excluded.terms, "
+                    "signifiers = excluded.signifiers, signature = excluded.signature",
+                    (dream_id, json.dumps(terms, separators=(",", ":")), json.dumps(signifiers), signature.tobytes()),
+                )
+                (seq,) = conn.execute("SELECT seq FROM search_docs WHERE dream_id = ?", (dream_id,)).fetchone()
+                if seq == self._seq + 1:
+                    # nothing from other processes in between; otherwise refresh replays it
+                    self._seq = seq
+            self._apply(dream_id, terms, signifiers, signature)
+
+    def _apply(self, dream_id: str, terms: Dict[str, int], signifiers: List[str], signature: array) -> None:
+        doc = self._doc.get(dream_id)
+        if doc is None:
+            doc = len(self._ids)
+            self._doc[dream_id] = doc
+            self._ids.append(dream_id)
+            self._terms.append({})
+            self._signifiers.append([])
+            self._lengths.append(0)
+            self._signatures.append(signature)
+        else:
+            for term in self._terms[doc]:
+                postings = self._postings[term]
+                del postings[doc]
+                if not postings:
+                    del self._postings[term]
+            for band in _bands(self._signatures[doc]):
+                self._buckets[band].discard(doc)
+            self._total_length -= self._lengths[doc]
+
+        for term, tf in terms.items():
+            self._postings.setdefault(term, {})[doc] = tf
+        for band in _bands(signature):
+            self._buckets.setdefault(band, set()).add(doc)
+        length = sum(terms.values())
+        self._terms[doc] = terms
+        self._signifiers[doc] = signifiers
+        self._signatures[doc] = signature
+        self._lengths[doc] = length
+        self._total_length += length
+
+    def refresh(self) -> int:
+        """Apply rows persisted since the last refresh (by this or another process)."""
+        if not self._path:
+            return 0
+        cursor = self._conn().execute(
+            "SELECT dream_id, seq, terms, signifiers, signature FROM search_docs WHERE seq > ? ORDER BY seq",
+            (self._seq,),
+        )
+        applied = 0
+        while True:
+            # in batches, so a cold start doesn't block queries for the whole load
+            rows = cursor.fetchmany(DREAM_SEARCH_BACKFILL_BATCH)
+            if not rows:
+                return applied
+            with self._lock:
+                for dream_id, seq, terms, signifiers, signature in rows:
+                    if seq > self._seq:
+                        self._apply(dream_id, json.loads(terms), json.loads(signifiers), array("I", signature))
+                        self._seq = seq
+            applied += len(rows)
+
+    # --- reads ---
+
+    def search(self, query: str, limit: int = 20) -> Tuple[int, List[Tuple[str, float]]]:
+        """
+        Boolean query (see parse_query) ranked with BM25. Returns the number
+        of matching dreams and the top `limit` (dream_id, score) pairs.
+        """
+        groups = parse_query(query)
+        self.refresh()
+        with self._lock:
+            matched: Set[int] = set()
+            for required, excluded in groups:
+                lists = sorted((self._postings.get(t, {}) for t in set(required)), key=len)
+                if not lists[0]:
+                    continue
+                docs = set(lists[0])
+                for postings in lists[1:]:
+                    docs.intersection_update(postings)
+                    if not docs:
+                        break
+                for term in excluded:
+                    docs.difference_update(self._postings.get(term, ()))
+                matched |= docs
+
+            terms = {t for required, _ in groups for t in required}
+            count = len(self._ids)
+            avg_length = self._total_length / count if count else 0.0
+            weights = []
+            for term in terms:
+                postings = self._postings.get(term)
+                if postings:
+                    df = len(postings)
+                    weights.append((postings, math.log(1 + (count - df + 0.5) / (df + 0.5))))
+
+            lengths = self._lengths
+            norm = BM25_K1 * (1 - BM25_B)
+            scale = BM25_K1 * BM25_B / avg_length if avg_length else 0.0
+
+            def score(doc: int) -> float:
+                k = norm + scale * lengths[doc]
+                total = 0.0
+                for postings, idf in weights:
+                    tf = postings.get(doc)
+                    if tf:
+                        total += idf * tf * (BM25_K1 + 1) / (tf + k)
+                return total
+
+            top = heapq.nlargest(limit, matched, key=score)
+            return len(matched), [(self._ids[d], score(d)) for d in top]
+
+    def similar(self, dream_id: str, limit: int = 10) -> Optional[List[Tuple[str, float]]]:
+        """
+        Dreams whose term sets are most alike (estimated Jaccard), found via
+        LSH buckets; None if the dream isn't indexed.
+        """
+        self.refresh()
+        with self._lock:
+            doc = self._doc.get(dream_id)
+            if doc is None:
+                return None
+            signature = self._signatures[doc]
+            candidates: Set[int] = set()
+            for band in _bands(signature):
+                candidates |= self._buckets.get(band, set())
+            candidates.discard(doc)
+            if not self._terms[doc]:
+                return []
+
+            def jaccard(other: int) -> float:
+                return sum(a == b for a, b in zip(signature, self._signatures[other])) / MINHASH_PERMUTATIONS
+
+            scored = heapq.nlargest(limit, ((jaccard(c), c) for c in candidates))
+            return [(self._ids[c], s) for s, c in scored]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "dreams": len(self._ids),
+                "terms": len(self._postings),
+                "lsh_buckets": len(self._buckets),
+                "seq": self._seq,
+            }
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+dream_search = DreamSearchIndex()
@@ -0,0 +1,420 @@
+# backend/app/dream_store.py
+# Storage behind create_dream / get_dream / list_dreams.
+#
+# Two backends:
+#   - "sqlite" (default): one file in WAL mode, safe to share between
+#     `uvicorn --workers N` processes on a host, survives restarts.
+#   - "memory": the old in-process dict, handy for tests and throwaway runs.
+# Render jobs live next to the dreams, so any worker can answer a poll for a
+# job another worker runs, and renders coalesce across workers.
+# warm_start() loads the raw events in the data lake that the store is
+# missing, once per store: a process claims the load with a lease, and the
+# store is only marked warm once the load has been committed.
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from uuid import uuid4
+
+from .schemas import Dream, RenderJob
+
+DREAM_STORE = os.getenv("DREAM_STORE", "sqlite").lower()
+DREAM_STORE_PATH = os.getenv("DREAM_STORE_PATH", ".data/dreams.sqlite3")
+DREAM_STORE_WARM_START = os.getenv("DREAM_STORE_WARM_START", "true").lower() == "true"
+WARM_START_CONCURRENCY = int(os.getenv("DREAM_STORE_WARM_START_CONCURRENCY", "16"))
+# A claim older than this is taken to belong to a process that died mid-load.
+WARM_START_LEASE_SECONDS = float(os.getenv("DREAM_STORE_WARM_START_LEASE_SECONDS", "900"))
+
+
+class DreamStore(ABC):
+    @abstractmethod
+    def put(self, dream: Dream) -> None:
+        ...
+
+    @abstractmethod
+    def put_many(self, dreams: Iterable[Dream]) -> int:
+        """Insert dreams that are not stored yet; returns how many were new."""
+
+    @abstractmethod
+    def get(self, dream_id: str) -> Optional[Dream]:
+        ...
+
+    @abstractmethod
+    def list(self, limit: Optional[int] = None, offset: int = 0) -> List[Dream]:
+        """Dreams ordered by created_at (oldest first)."""
+
+    @abstractmethod
+    def count(self) -> int:
+        ...
+
+    @abstractmethod
+    def set_video_uri(self, dream_id: str, video_uri: str) -> None:
+        """Remember the s3:// URI of the dream's rendered video."""
+
+    @abstractmethod
+    def get_video_uri(self, dream_id: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def claim_render_job(self, job: RenderJob, shareable: Callable[[RenderJob], bool]) -> Optional[RenderJob]:
+        """
+        Atomically: return the dream's latest render job if shareable(latest),
+        otherwise store `job` as its newest job and return None.
+        """
+
+    @abstractmethod
+    def put_render_job(self, job: RenderJob) -> None:
+        ...
+
+    @abstractmethod
+    def get_render_job(self, job_id: str) -> Optional[RenderJob]:
+        ...
+
+    @abstractmethod
+    def delete_render_jobs(self, updated_before: datetime) -> int:
+        """Drop jobs last updated before `updated_before`; returns how many."""
+
+    @abstractmethod
+    def claim_warm_start(self, owner: str, lease_seconds: float = WARM_START_LEASE_SECONDS) -> bool:
+        """
+        True if `owner` may run the warm start: it hasn't completed yet and no
+        one else holds an unexpired claim.
+        """
+
+    @abstractmethod
+    def release_warm_start(self, owner: str, done: bool) -> None:
+        """Drop `owner`'s claim; with done=True the store never warm-starts again."""
+
+    def close(self) -> None:
+        pass
+
+
+class InMemoryDreamStore(DreamStore):
+    def __init__(self) -> None:
+        self._dreams: Dict[str, Dream] = {}
+        self._video_uris: Dict[str, str] = {}
+        self._render_jobs: Dict[str, RenderJob] = {}
+        self._latest_render_job: Dict[str, str] = {}
+        self._warm_start_done = False
+        self._warm_start_claim: Optional[Tuple[str, float]] = None  # (owner, expires)
+        self._lock = threading.Lock()
+
+    def put(self, dream: Dream) -> None:
+        with self._lock:
+            self._dreams[dream.id] = dream
+
+    def put_many(self, dreams: Iterable[Dream]) -> int:
+        added = 0
+        with self._lock:
+            for dream in dreams:
+                if dream.id not in self._dreams:
+                    self._dreams[dream.id] = dream
+                    added += 1
+        return added
+
+    def get(self, dream_id: str) -> Optional[Dream]:
+        return self._dreams.get(dream_id)
+
+    def list(self, limit: Optional[int] = None, offset: int = 0) -> List[Dream]:
+        with self._lock:
+            dreams = sorted(self._dreams.values(), key=lambda d: d.created_at)
+        end = None if limit is None else offset + limit
+        return dreams[offset:end]
+
+    def count(self) -> int:
+        return len(self._dreams)
+
+    def set_video_uri(self, dream_id: str, video_uri: str) -> None:
+        with self._lock:
+            if dream_id in self._dreams:
+                self._video_uris[dream_id] = video_uri
+
+    def get_video_uri(self, dream_id: str) -> Optional[str]:
+        return self._video_uris.get(dream_id)
+
+    def claim_render_job(self, job: RenderJob, shareable: Callable[[RenderJob], bool]) -> Optional[RenderJob]:
+        with self._lock:
+            latest = self._render_jobs.get(self._latest_render_job.get(job.dream_id, ""))
+            if latest is not None and shareable(latest):
+                return latest.model_copy()
+            self._render_jobs[job.id] = job.model_copy()
+            self._latest_render_job[job.dream_id] = job.id
+            return None
+
+    def put_render_job(self, job: RenderJob) -> None:
+        with self._lock:
+            self._render_jobs[job.id] = job.model_copy()
+
+    def get_render_job(self, job_id: str) -> Optional[RenderJob]:
+        with self._lock:
+            job = self._render_jobs.get(job_id)
+            return job.model_copy() if job else None
+
+    def delete_render_jobs(self, updated_before: datetime) -> int:
+        with self._lock:
+            expired = [job for job in self._render_jobs.values() if job.updated_at < updated_before]
+            for job in expired:
+                del self._render_jobs[job.id]
+                if self._latest_render_job.get(job.dream_id) == job.id:
+                    del self._latest_render_job[job.dream_id]
+        return len(expired)
+
+    def claim_warm_start(self, owner: str, lease_seconds: float = WARM_START_LEASE_SECONDS) -> bool:
+        with self._lock:
+            claim = self._warm_start_claim
+            if self._warm_start_done or (claim and claim[0] != owner and claim[1] > time.time()):
+                return False
+            self._warm_start_claim = (owner, time.time() + lease_seconds)
+            return True
+
+    def release_warm_start(self, owner: str, done: bool) -> None:
+        with self._lock:
+            if self._warm_start_claim and self._warm_start_claim[0] == owner:
+                self._warm_start_claim = None
+            self._warm_start_done = self._warm_start_done or done
+
+
+class SQLiteDreamStore(DreamStore):
+    _SCHEMA = """
+    CREATE TABLE IF NOT EXISTS dreams (
+        id TEXT PRIMARY KEY,
+        created_at TEXT NOT NULL,
+        body TEXT NOT NULL,
+        video_uri TEXT
+    );
+    CREATE INDEX IF NOT EXISTS dreams_created_at ON dreams (created_at);
+    CREATE TABLE IF NOT EXISTS render_jobs (
+        id TEXT PRIMARY KEY,
+        dream_id TEXT NOT NULL,
+        stage TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL,
+        body TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS render_jobs_dream ON render_jobs (dream_id, created_at);
+    CREATE INDEX IF NOT EXISTS render_jobs_updated_at ON render_jobs (updated_at);
+    CREATE TABLE IF NOT EXISTS store_meta (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    );
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(self._SCHEMA)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(dreams)")}
+        if "video_uri" not in columns:
+            # stores created before videos were tracked
+            conn.execute("ALTER TABLE dreams ADD COLUMN video_uri TEXT")
+
+    def _conn(self) -> sqlite3.Connection:
+        # one connection per thread; sqlite3 connections are not thread-safe
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _row(dream: Dream) -> tuple:
+        return (dream.id, dream.created_at.isoformat(), dream.model_dump_json())
+
+    def put(self, dream: Dream) -> None:
+        self._conn().execute(
+            "INSERT INTO dreams (id, created_at, body) VALUES (?, ?, ?) "
+            "ON CONFLICT (id) DO UPDATE SET created_at = excluded.created_at, body = excluded.body",
+            self._row(dream),
+        )
+
+    def put_many(self, dreams: Iterable[Dream]) -> int:
+        conn = self._conn()
+        before = conn.total_changes
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(
+                "INSERT OR IGNORE INTO dreams (id, created_at, body) VALUES (?, ?, ?)",
+                (self._row(d) for d in dreams),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return conn.total_changes - before
+
+    def get(self, dream_id: str) -> Optional[Dream]:
+        row = self._conn().execute(
+            "SELECT body FROM dreams WHERE id = ?", (dream_id,)
+        ).fetchone()
+        return Dream.model_validate_json(row[0]) if row else None
+
+    def list(self, limit: Optional[int] = None, offset: int = 0) -> List[Dream]:
+        rows = self._conn().execute(
+            "SELECT body FROM dreams ORDER BY created_at LIMIT ? OFFSET ?",
+            (-1 if limit is None else limit, offset),
+        ).fetchall()
+        return [Dream.model_validate_json(r[0]) for r in rows]
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM dreams").fetchone()[0]
+
+    def set_video_uri(self, dream_id: str, video_uri: str) -> None:
+        self._conn().execute("UPDATE dreams SET video_uri = ? WHERE id = ?", (video_uri, dream_id))
+
+    def get_video_uri(self, dream_id: str) -> Optional[str]:
+        row = self._conn().execute(
+            "SELECT video_uri FROM dreams WHERE id = ?", (dream_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def _job_row(job: RenderJob) -> tuple:
+        return (
+            job.id, job.dream_id, job.stage.value,
+            job.created_at.isoformat(), job.updated_at.isoformat(), job.model_dump_json(),
+        )
+
+    def claim_render_job(self, job: RenderJob, shareable: Callable[[RenderJob], bool]) -> Optional[RenderJob]:
+        conn = self._conn()
+        # IMMEDIATE takes the write lock up front, so two workers can't both
+        # find no shareable job and start one each
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT body FROM render_jobs WHERE dream_id = ? ORDER BY created_at DESC LIMIT 1",
+                (job.dream_id,),
+            ).fetchone()
+            latest = RenderJob.model_validate_json(row[0]) if row else None
+            if latest is None or not shareable(latest):
+                conn.execute("INSERT INTO render_jobs VALUES (?, ?, ?, ?, ?, ?)", self._job_row(job))
+                latest = None
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return latest
+
+    def put_render_job(self, job: RenderJob) -> None:
+        self._conn().execute(
+            "INSERT OR REPLACE INTO render_jobs VALUES (?, ?, ?, ?, ?, ?)", self._job_row(job)
+        )
+
+    def get_render_job(self, job_id: str) -> Optional[RenderJob]:
+        row = self._conn().execute("SELECT body FROM render_jobs WHERE id = ?", (job_id,)).fetchone()
+        return RenderJob.model_validate_json(row[0]) if row else None
+
+    def delete_render_jobs(self, updated_before: datetime) -> int:
+        cur = self._conn().execute(
+            "DELETE FROM render_jobs WHERE updated_at < ?", (updated_before.isoformat(),)
+        )
+        return cur.rowcount
+
+    # store_meta rows: 'warm_start' once a load has completed, and
+    # 'warm_start_claim' ({"owner", "expires"}) while one is running.
+
+    def claim_warm_start(self, owner: str, lease_seconds: float = WARM_START_LEASE_SECONDS) -> bool:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            done = conn.execute("SELECT 1 FROM store_meta WHERE key = 'warm_start'").fetchone()
+            row = conn.execute("SELECT value FROM store_meta WHERE key = 'warm_start_claim'").fetchone()
+            claim = json.loads(row[0]) if row else None
+            now = time.time()
+            claimed = not done and not (claim and claim["owner"] != owner and claim["expires"] > now)
+            if claimed:
+                conn.execute(
+                    "INSERT OR REPLACE INTO store_meta (key, value) VALUES ('warm_start_claim', ?)",
+                    (json.dumps({"owner": owner, "expires": now + lease_seconds}),),
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return claimed
+
+    def release_warm_start(self, owner: str, done: bool) -> None:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT value FROM store_meta WHERE key = 'warm_start_claim'").fetchone()
+            if row and json.loads(row[0])["owner"] == owner:
+                conn.execute("DELETE FROM store_meta WHERE key = 'warm_start_claim'")
+            if done:
+                conn.execute(
+                    "INSERT OR IGNORE INTO store_meta (key, value) VALUES ('warm_start', datetime('now'))"
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def create_dream_store(backend: str = DREAM_STORE, path: str = DREAM_STORE_PATH) -> DreamStore:
+    if backend == "memory":
+        return InMemoryDreamStore()
+    if backend == "sqlite":
+        return SQLiteDreamStore(path)
+    raise ValueError(f"Unknown DREAM_STORE backend: {backend!r}")
+
+
+# SQLite by default (shared by all workers on the host); DREAM_STORE=memory for tests.
+dream_store = create_dream_store()
+
+
+def warm_start(store: DreamStore, s3_client: Any, bucket: str, prefix: str) -> int:
+    """
+    Load the raw dream events under `prefix` that the store doesn't have yet.
+    Runs until one load succeeds per store; a failed load releases its claim,
+    so the next start tries again. Returns the number of new dreams.
+    """
+    owner = uuid4().hex
+    if not store.claim_warm_start(owner):
+        return 0
+    try:
+        added = _load_raw_events(store, s3_client, bucket, prefix)
+    except BaseException:
+        store.release_warm_start(owner, done=False)
+        raise
+    store.release_warm_start(owner, done=True)
+    return added
+
+
+def _load_raw_events(store: DreamStore, s3_client: Any, bucket: str, prefix: str) -> int:
+    keys: List[str] = []
+    paginator = s3_client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        keys.extend(obj["Key"] for obj in page.get("Contents", []) if obj["Key"].endswith(".json"))
+
+    def fetch(key: str) -> Optional[Dream]:
+        try:
+            body = s3_client.get_object(Bucket=bucket, Key=key)["Body"].read()
+            return Dream.model_validate(json.loads(body))
+        except Exception as e:
+            print(f"[STORE] Skipping {key} during warm start: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=WARM_START_CONCURRENCY) as pool:
+        dreams = [d for d in pool.map(fetch, keys) if d is not None]
+
+    added = store.put_many(dreams)
+    print(f"[STORE] Warm start loaded {added} dreams from s3://{bucket}/{prefix}")
+    return added
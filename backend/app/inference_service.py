@@ -2,20 +2,32 @@
 
 import json
 import os
+import threading
 import time
-from typing import Dict, Any, List, Optional
-
-import boto3
-
-from .schemas import Dream, DreamRenderResponse, PsychoMetadata
-from botocore.exceptions import BotoCoreError, ClientError 
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Any, Iterator, List, Optional, Tuple
+
+from .aws_clients import lazy_client
+from .schemas import Dream, DreamRenderResponse, PsychoMetadata, RenderStage, TokenUsage
+from .json_stream import IncrementalJSONFieldParser
+from .bedrock_limiter import BEDROCK_MAX_CONCURRENCY, bedrock_limiter
+from .luma_scheduler import LUMA_IO_WORKERS, LumaScheduler
+from .render_cache import RENDER_CACHE_ENABLED, RENDER_CACHE_WRITERS, RenderCache, stable_hash
+from .presigned_urls import PresignedURLCache
+from .local_analysis import NarrativeAnalysis, analyze_narrative, analyze_narratives
+from .dream_store import dream_store
+from .dream_search import dream_search
+from .token_usage import merge_usage, token_usage, usage_from_response
+from .metrics import RENDERS_IN_FLIGHT, CallbackGauge, observe_stage, registry, stage_timer
 from urllib.parse import urlparse 
 
 # ---------- Env + clients ----------
 
 BEDROCK_REGION = os.getenv("BEDROCK_REGION", "us-west-2")
-bedrock_client = boto3.client("bedrock-runtime", region_name=BEDROCK_REGION)
-s3_client = boto3.client("s3", region_name=BEDROCK_REGION)
+# Built on first use; pools sized for the Claude calls the limiter admits
+# plus the Luma scheduler's I/O threads, and the render cache writers.
+bedrock_client = lazy_client("bedrock-runtime", BEDROCK_REGION, connections=BEDROCK_MAX_CONCURRENCY + LUMA_IO_WORKERS)
+s3_client = lazy_client("s3", connections=LUMA_IO_WORKERS + RENDER_CACHE_WRITERS)
 USE_BEDROCK = os.getenv("USE_BEDROCK", "false").lower() == "true"
 USE_LUMA = os.getenv("USE_LUMA", "false").lower() == "true"
 
@@ -30,6 +42,24 @@ LUMA_MODEL_ID = os.getenv(
 )
 
 LUMA_OUTPUT_BUCKET = os.getenv("LUMA_OUTPUT_BUCKET", "dream-film-videos-dev-sachi")
+# "single": one Claude call for everything; "split": treatment and
+# psychoanalysis as two concurrent calls, Luma starts on the treatment.
+RENDER_PIPELINE_MODE = os.getenv("RENDER_PIPELINE_MODE", "single").lower()
+DATA_BUCKET = os.getenv("DATA_BUCKET", "dream-film-lake-dev-sachi")
+
+# Generation parameters (also part of the render cache key)
+CLAUDE_MAX_TOKENS = 1200
+CLAUDE_TEMPERATURE = 0.7
+# Mark the static system prompt as a prompt-cache prefix. Bedrock only caches
+# prefixes above the model's minimum (1024 tokens for Sonnet); shorter ones
+# are sent uncached without error, which the usage stats make visible.
+CLAUDE_PROMPT_CACHING = os.getenv("CLAUDE_PROMPT_CACHING", "true").lower() == "true"
+LUMA_GENERATION_PARAMS: Dict[str, Any] = {
+    "aspect_ratio": "16:9",
+    "loop": False,
+    "duration": "5s",
+    "resolution": "720p",
+}
 
 
 # ---------- 1. Build model input payload (for Claude) ----------
@@ -63,12 +93,17 @@ def build_model_input(dream: Dream) -> Dict[str, Any]:
 
 # ---------- 2. Local stub: model behavior (for offline dev) ----------
 
-def _local_style_and_analysis(model_input: Dict[str, Any]) -> Dict[str, Any]:
+def _local_style_and_analysis(
+    model_input: Dict[str, Any],
+    analysis: Optional[NarrativeAnalysis] = None,
+) -> Dict[str, Any]:
     """
     Temporary stand-in for a Bedrock text model.
 
     Takes the same payload we'd send to Claude and returns the same
     kind of structured output that Claude will eventually return.
+    `analysis` is the narrative's signifier analysis when the caller
+    already has it (see local_style_and_analysis_batch).
     """
     dream_part = model_input.get("dream", {})
     ctx = model_input.get("context", {})
@@ -126,37 +161,13 @@ def _local_style_and_analysis(model_input: Dict[str, Any]) -> Dict[str, Any]:
     }
 
     # --- psychoanalytic metadata (placeholder) ---
-    text = narrative.lower()
-
-    imaginary_words = ["mirror", "reflection", "double", "face", "body", "image"]
-    symbolic_words = [
-        "exam",
-        "test",
-        "school",
-        "university",
-        "office",
-        "manager",
-        "contract",
-        "email",
-        "rules",
-    ]
-    real_words = ["blood", "wound", "dead", "scream", "void", "teeth", "falling", "crash"]
-
-    found_signifiers: List[str] = []
-    for w in imaginary_words + symbolic_words + real_words:
-        if w in text:
-            found_signifiers.append(w)
-
-    register: Optional[str] = None
-    if any(w in text for w in imaginary_words):
-        register = "imaginary"
-    if any(w in text for w in symbolic_words):
-        register = "symbolic"
-    if any(w in text for w in real_words):
-        register = "real"
+    if analysis is None:
+        analysis = analyze_narrative(narrative)
+    found_signifiers: List[str] = analysis.key_signifiers or []
+    register: Optional[str] = analysis.register_feel
 
     psycho_metadata: Dict[str, Any] = {
-        "key_signifiers": sorted(set(found_signifiers)) or None,
+        "key_signifiers": found_signifiers or None,
         "register_feel": register,
         "day_residues": None,
         "wish_fulfillment_type": None,
@@ -180,7 +191,7 @@ def _local_style_and_analysis(model_input: Dict[str, Any]) -> Dict[str, Any]:
         )
 
     if found_signifiers:
-        uniq = ", ".join(sorted(set(found_signifiers)))
+        uniq = ", ".join(found_signifiers)
         points.append(
             f"Certain signifiers recur ({uniq}), forming small knots where your attention and anxiety return."
         )
@@ -226,6 +237,18 @@ def _local_style_and_analysis(model_input: Dict[str, Any]) -> Dict[str, Any]:
     }
 
 
+def local_style_and_analysis_batch(model_inputs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    _local_style_and_analysis over many dreams (offline backfills, load
+    tests). A convenience wrapper: it is no faster than calling the stub
+    per dream.
+    """
+    analyses = analyze_narratives(
+        (m.get("dream", {}).get("narrative") or "") for m in model_inputs
+    )
+    return [_local_style_and_analysis(m, a) for m, a in zip(model_inputs, analyses)]
+
+
 # ---------- 3. Claude (text model on Bedrock) ----------
 
 def _strip_markdown_fences(text: str) -> str:
@@ -252,17 +275,10 @@ def _strip_markdown_fences(text: str) -> str:
 
     return stripped
 
-def call_claude_model(model_input: Dict[str, Any]) -> Dict[str, Any]:
-    """
-    Call a Claude model on Bedrock to generate:
-      - movie_script
-      - psychoanalysis
-      - style_profile
-      - psycho_metadata
+# Top-level keys of the JSON object the model is asked to return
+CLAUDE_RESPONSE_FIELDS = ("movie_script", "psychoanalysis", "style_profile", "psycho_metadata")
 
-    The model is instructed to return a single JSON object as text.
-    """
-    system_prompt = """
+CLAUDE_SYSTEM_PROMPT = """
 You are an assistant who acts as both:
 
 1) A dream-film director, designing a short film treatment of a dream.
@@ -297,48 +313,215 @@ Very important:
 - The JSON must be strictly valid and parseable, with double quotes around keys and string values.
 """.strip()
 
+
+# Split pipeline (RENDER_PIPELINE_MODE=split): the treatment is all Luma needs,
+# so it is requested on its own and the psychoanalysis runs alongside it.
+TREATMENT_FIELDS = ("movie_script", "style_profile")
+ANALYSIS_FIELDS = ("psychoanalysis", "psycho_metadata")
+
+CLAUDE_TREATMENT_PROMPT = """
+You are a dream-film director, designing a short film treatment of a dream.
+
+You receive structured JSON containing:
+- a dream report ("dream.narrative", optionally "dream.title"),
+- daily context: mood, sleep quality, MBTI type, media listened to / watched / read,
+- links to media profiles, and a short free-form note about the day.
+
+Your job is to:
+1. Write a "movie_script" string: a short film treatment as if the dream were projected in a small vintage cinema. Include mood, color, shot style, and a clear sense of progression, but not a full screenplay.
+2. Produce a "style_profile" object describing:
+   - "colorPalette": 3–5 color phrases (e.g. "deep indigo", "acid yellow"),
+   - "cameraStyle": 1–2 sentences about how the camera moves,
+   - "mediaInfluence": a list of short sentences about how the user's listening/watching/reading might inflect the film's style,
+   - "mbti": echo the MBTI string if present,
+   - "links": an object with the given spotify / letterboxd / goodreads URLs (these are just echoed back; do not invent URLs).
+
+Very important:
+- Respond ONLY with a single JSON object with the following top-level keys:
+  "movie_script", "style_profile".
+- The JSON must be strictly valid and parseable, with double quotes around keys and string values.
+""".strip()
+
+CLAUDE_ANALYSIS_PROMPT = """
+You are a psychoanalytic reader of dreams, loosely inspired by Freud and Lacan.
+
+You receive structured JSON containing:
+- a dream report ("dream.narrative", optionally "dream.title"),
+- daily context: mood, sleep quality, MBTI type, media listened to / watched / read,
+- links to media profiles, and a short free-form note about the day.
+
+Your job is to:
+1. Write a "psychoanalysis" string: a reflective, non-clinical interpretation of the dream. You may use some vocabulary inspired by Freud or Lacan (day residues, wish-fulfilment, signifiers, Imaginary/Symbolic/Real), but you MUST NOT provide any medical, diagnostic, or therapeutic advice.
+2. Optionally produce "psycho_metadata":
+   - "day_residues": a list of concrete day elements that return in the dream,
+   - "wish_fulfillment_type": a short label (e.g. "reparation", "revenge", "escape", "performance") or null,
+   - "key_signifiers": a list of short phrases that seem to knot together anxiety or desire,
+   - "subject_position": a short phrase about how the dreamer is positioned (e.g. "examined", "abandoned", "performing", "observer"),
+   - "register_feel": one of "imaginary", "symbolic", "real", or null.
+
+Very important:
+- DO NOT mention Freud, Lacan, or psychoanalysis explicitly in the output; let it be a stylistic undercurrent.
+- DO NOT give mental health or medical advice.
+- Respond ONLY with a single JSON object with the following top-level keys:
+  "psychoanalysis", "psycho_metadata".
+- The JSON must be strictly valid and parseable, with double quotes around keys and string values.
+""".strip()
+
+# User turn wrapped around the dream JSON, the same in every pipeline mode.
+CLAUDE_USER_TEMPLATE = (
+    "Here is the dream JSON:\n\n"
+    "{dream_json}\n\n"
+    "Remember: respond ONLY with the JSON object described above."
+)
+
+# part -> (system prompt, max_tokens, fields)
+CLAUDE_PARTS: Dict[str, Tuple[str, int, Tuple[str, ...]]] = {
+    "treatment": (CLAUDE_TREATMENT_PROMPT, 600, TREATMENT_FIELDS),
+    "analysis": (CLAUDE_ANALYSIS_PROMPT, 800, ANALYSIS_FIELDS),
+}
+
+
+def build_claude_request(
+    model_input: Dict[str, Any],
+    system_prompt: str = CLAUDE_SYSTEM_PROMPT,
+    max_tokens: int = CLAUDE_MAX_TOKENS,
+) -> Dict[str, Any]:
+    """
+    Anthropic Messages request body for a dream, shared by the blocking,
+    streaming and batch paths.
+    """
     user_json = json.dumps(model_input, ensure_ascii=False)
 
+    system_block: Dict[str, Any] = {"type": "text", "text": system_prompt}
+    if CLAUDE_PROMPT_CACHING:
+        system_block["cache_control"] = {"type": "ephemeral"}
+
     # ✅ Anthropic Messages format for Bedrock:
     # - top-level "system"
     # - messages[] with only "user"/"assistant" roles
-    request_body = {
+    return {
         "anthropic_version": "bedrock-2023-05-31",
-        "max_tokens": 1200,
-        "temperature": 0.7,
-        "system": [
-            {
-                "type": "text",
-                "text": system_prompt,
-            }
-        ],
+        "max_tokens": max_tokens,
+        "temperature": CLAUDE_TEMPERATURE,
+        "system": [system_block],
         "messages": [
             {
                 "role": "user",
                 "content": [
                     {
                         "type": "text",
-                        "text": (
-                            "Here is the dream JSON:\n\n"
-                            f"{user_json}\n\n"
-                            "Remember: respond ONLY with the JSON object described above."
-                        ),
+                        "text": CLAUDE_USER_TEMPLATE.format(dream_json=user_json),
                     }
                 ],
             }
         ],
     }
 
-    response = bedrock_client.invoke_model(
-        modelId=CLAUDE_MODEL_ID,          # your inference profile ARN/ID
-        body=json.dumps(request_body),
-        contentType="application/json",
-        accept="application/json",
+
+def claude_request_model_input(request: Dict[str, Any]) -> Dict[str, Any]:
+    """The model input a build_claude_request body was built from."""
+    prefix, suffix = CLAUDE_USER_TEMPLATE.split("{dream_json}")
+    text = request["messages"][0]["content"][0]["text"]
+    if not (text.startswith(prefix) and text.endswith(suffix)):
+        raise ValueError("user message does not follow CLAUDE_USER_TEMPLATE")
+    return json.loads(text[len(prefix) : len(text) - len(suffix)])
+
+
+def estimate_request_tokens(body: str, max_tokens: int) -> int:
+    """
+    Rough pre-call token estimate for the TPM bucket (~4 characters per
+    input token, plus the full output budget). Corrected afterwards from
+    the response's usage block where available.
+    """
+    return len(body) // 4 + max_tokens
+
+
+def parse_model_text(model_text: str) -> Dict[str, Any]:
+    """Strip any Markdown fences from the model's text and parse the JSON object."""
+    # Some models still wrap output in ```json fences; strip them defensively
+    cleaned_text = _strip_markdown_fences(model_text)
+
+    # Model is instructed to return a JSON object; parse it
+    try:
+        parsed = json.loads(cleaned_text)
+    except json.JSONDecodeError as e:
+        raise RuntimeError(f"Model did not return valid JSON: {cleaned_text}") from e
+
+    return parsed
+
+
+def call_claude_model(
+    model_input: Dict[str, Any],
+    system_prompt: str = CLAUDE_SYSTEM_PROMPT,
+    max_tokens: int = CLAUDE_MAX_TOKENS,
+    prompt: str = "full",
+) -> Dict[str, Any]:
+    """
+    Call a Claude model on Bedrock to generate:
+      - movie_script
+      - psychoanalysis
+      - style_profile
+      - psycho_metadata
+
+    (or the subset asked for by a split-pipeline system prompt).
+
+    The model is instructed to return a single JSON object as text. The
+    call's token counts are added under "usage" and recorded in token_usage
+    under `prompt`.
+    """
+    request_body = build_claude_request(model_input, system_prompt, max_tokens)
+    body = json.dumps(request_body)
+    estimated_tokens = estimate_request_tokens(body, max_tokens)
+
+    with stage_timer("claude"):
+        # Admission control: RPM/TPM buckets, adaptive concurrency, retries on throttling
+        response = bedrock_limiter.call(
+            lambda: bedrock_client.invoke_model(
+                modelId=CLAUDE_MODEL_ID,          # your inference profile ARN/ID
+                body=body,
+                contentType="application/json",
+                accept="application/json",
+            ),
+            estimated_tokens,
+        )
+
+        raw_body = response["body"].read()
+        response_body = json.loads(raw_body)
+
+    usage = _record_usage(
+        response_body.get("usage"), prompt, max_tokens, estimated_tokens, response_body.get("stop_reason")
     )
 
-    raw_body = response["body"].read()
-    response_body = json.loads(raw_body)
+    parsed = parse_model_text(claude_response_text(response_body))
+    if usage:
+        parsed["usage"] = usage.model_dump()
+    return parsed
+
+
+def _record_usage(
+    raw_usage: Optional[Dict[str, Any]],
+    prompt: str,
+    max_tokens: int,
+    estimated_tokens: int,
+    stop_reason: Optional[str],
+) -> Optional[TokenUsage]:
+    """Account a response's usage block: token stats and the limiter's TPM bucket."""
+    usage = usage_from_response(raw_usage)
+    if usage is None:
+        return None
+    token_usage.record(CLAUDE_MODEL_ID, prompt, usage, max_tokens, stop_reason)
+    bedrock_limiter.reconcile(
+        estimated_tokens,
+        usage.input_tokens
+        + usage.cache_read_input_tokens
+        + usage.cache_creation_input_tokens
+        + usage.output_tokens,
+    )
+    return usage
+
 
+def claude_response_text(response_body: Dict[str, Any]) -> str:
+    """Assistant text of a Messages response body (invoke_model or batch output)."""
     # Anthropic on Bedrock: assistant text is in content[].text
     try:
         content_blocks = response_body.get("content", [])
@@ -351,18 +534,113 @@ Very important:
     if not model_text:
         raise RuntimeError(f"No text content returned from Claude: {response_body}")
 
-    # Some models still wrap output in ```json fences; strip them defensively
-    cleaned_text = _strip_markdown_fences(model_text)
-
-    # Model is instructed to return a JSON object; parse it
-    try:
-        parsed = json.loads(cleaned_text)
-    except json.JSONDecodeError as e:
-        raise RuntimeError(f"Model did not return valid JSON: {cleaned_text}") from e
+    return model_text
 
-    return parsed
 
+def stream_claude_model(model_input: Dict[str, Any]) -> Iterator[Tuple[str, Any]]:
+    """
+    Streaming variant of call_claude_model.
 
+    Uses invoke_model_with_response_stream and yields (field, value) for each
+    top-level field of the model's JSON object as soon as that field is
+    complete, instead of waiting for the whole generation. The call's token
+    counts come last, as ("usage", {...}).
+    """
+    request_body = build_claude_request(model_input)
+    body = json.dumps(request_body)
+    estimated_tokens = estimate_request_tokens(body, CLAUDE_MAX_TOKENS)
+
+    parser = IncrementalJSONFieldParser()
+    parser_ok = True
+    emitted: Dict[str, Any] = {}
+    text_parts: List[str] = []
+    raw_usage: Dict[str, Any] = {}
+    stop_reason: Optional[str] = None
+    recorded = False
+
+    # Claude keeps generating for as long as the stream is open, so the
+    # limiter slot (and the TPM charge) covers the whole stream, not just
+    # opening it; it is released once the stream is drained or closed early.
+    with bedrock_limiter.hold(
+        lambda: bedrock_client.invoke_model_with_response_stream(
+            modelId=CLAUDE_MODEL_ID,
+            body=body,
+            contentType="application/json",
+            accept="application/json",
+        ),
+        estimated_tokens,
+    ) as response:
+        stream = response["body"]
+        try:
+            for event in stream:
+                chunk = event.get("chunk")
+                if not chunk:
+                    continue
+                payload = json.loads(chunk["bytes"])
+                kind = payload.get("type")
+                # input and cache counts arrive up front, output counts at the end
+                if kind == "message_start":
+                    raw_usage.update(payload.get("message", {}).get("usage") or {})
+                    continue
+                if kind == "message_delta":
+                    raw_usage.update(payload.get("usage") or {})
+                    stop_reason = payload.get("delta", {}).get("stop_reason") or stop_reason
+                    continue
+                if kind != "content_block_delta":
+                    continue
+                delta = payload.get("delta", {})
+                if delta.get("type") != "text_delta":
+                    continue
+
+                text = delta.get("text", "")
+                text_parts.append(text)
+                if not parser_ok:
+                    continue
+                try:
+                    for name, value in parser.feed(text):
+                        emitted[name] = value
+                        yield name, value
+                except ValueError as e:
+                    # Fall back to parsing the full text once the stream ends.
+                    print(f"[CLAUDE] Incremental parse failed, buffering the rest: {e}")
+                    parser_ok = False
+
+            usage = _record_usage(raw_usage, "full", CLAUDE_MAX_TOKENS, estimated_tokens, stop_reason)
+            recorded = True
+        finally:
+            if not recorded:
+                # Abandoned or failed mid-stream: settle with what was seen.
+                stream.close()
+                _reconcile_partial_stream(raw_usage, text_parts, estimated_tokens)
+
+    if not (parser_ok and parser.done):
+        model_text = "".join(text_parts)
+        if not model_text:
+            raise RuntimeError("No text content streamed from Claude")
+
+        for name, value in parse_model_text(model_text).items():
+            if name not in emitted:
+                yield name, value
+
+    if usage:
+        yield "usage", usage.model_dump()
+
+
+def _reconcile_partial_stream(raw_usage: Dict[str, Any], text_parts: List[str], estimated_tokens: int) -> None:
+    """
+    Correct the TPM bucket for a stream that ended early. Input counts come
+    with message_start; output is the larger of the reported count and the
+    text received (~4 characters per token). With no usage seen at all the
+    estimate stands.
+    """
+    usage = usage_from_response(raw_usage)
+    if usage is None:
+        return
+    output_tokens = max(usage.output_tokens, len("".join(text_parts)) // 4)
+    bedrock_limiter.reconcile(
+        estimated_tokens,
+        usage.input_tokens + usage.cache_read_input_tokens + usage.cache_creation_input_tokens + output_tokens,
+    )
 
 
 def call_model(model_input: Dict[str, Any]) -> Dict[str, Any]:
@@ -378,6 +656,29 @@ def call_model(model_input: Dict[str, Any]) -> Dict[str, Any]:
     return _local_style_and_analysis(model_input)
 
 
+def call_model_part(model_input: Dict[str, Any], part: str) -> Dict[str, Any]:
+    """
+    One half of the split text stage: "treatment" (movie_script +
+    style_profile) or "analysis" (psychoanalysis + psycho_metadata).
+    """
+    system_prompt, max_tokens, fields = CLAUDE_PARTS[part]
+    if USE_BEDROCK:
+        raw = call_claude_model(model_input, system_prompt, max_tokens, prompt=part)
+    else:
+        raw = _local_style_and_analysis(model_input)
+    return {name: raw.get(name) for name in fields + ("usage",) if name in raw}
+
+
+def stream_model(model_input: Dict[str, Any]) -> Iterator[Tuple[str, Any]]:
+    """Streaming counterpart of call_model: yields (field, value) pairs."""
+    if USE_BEDROCK:
+        with stage_timer("claude"):
+            yield from stream_claude_model(model_input)
+        return
+
+    yield from _local_style_and_analysis(model_input).items()
+
+
 # ---------- 4. Luma Ray 2 (text-to-video via Bedrock Async) ----------
 
 def build_luma_prompt(movie_script: str, style_profile: Dict[str, Any]) -> str:
@@ -401,89 +702,169 @@ def build_luma_prompt(movie_script: str, style_profile: Dict[str, Any]) -> str:
     return prompt
 
 
-def call_luma_model(prompt: str, key_prefix: str) -> Optional[str]:
+LUMA_PRESIGN_EXPIRES_SECONDS = 3600
+# Upper bound on objects scanned by one shared listing in resolve_video_keys.
+LUMA_BULK_LIST_MAX_KEYS = int(os.getenv("LUMA_BULK_LIST_MAX_KEYS", "2000"))
+LUMA_RESOLVED_FOLDERS_MAX = 4096
+
+# Luma output folder URI -> video URI; a finished folder never changes.
+_resolved_folders: Dict[str, str] = {}
+_resolved_folders_lock = threading.Lock()
+
+
+def _pick_video_key(keys: List[str]) -> Optional[str]:
+    """Prefer the first .mp4 under a prefix, otherwise the first object."""
+    if not keys:
+        return None
+    mp4_keys = [k for k in keys if k.endswith(".mp4")]
+    return mp4_keys[0] if mp4_keys else keys[0]
+
+
+def _list_keys(bucket: str, prefix: str, max_keys: Optional[int] = None) -> List[str]:
+    keys: List[str] = []
+    paginator = s3_client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        keys.extend(obj["Key"] for obj in page.get("Contents", []))
+        if max_keys is not None and len(keys) >= max_keys:
+            break
+    return keys
+
+
+@stage_timer("s3_list")
+def resolve_video_keys(s3_folder_uris: List[str]) -> Dict[str, Optional[str]]:
     """
-    Call Luma Ray 2 via Bedrock Async APIs to generate a video.
+    Resolve many Luma output folders to the S3 URI of their video object.
 
-    - prompt: text prompt for the video
-    - key_prefix: S3 prefix to keep outputs organized, e.g. "luma_outputs/<dream-id>"
+    Folders in the same bucket are covered by a single listing of their
+    common prefix where that stays under LUMA_BULK_LIST_MAX_KEYS objects;
+    anything the shared listing did not settle falls back to a listing of
+    its own folder. Folders resolved before are answered without listing.
+    """
+    resolved: Dict[str, Optional[str]] = {}
+    with _resolved_folders_lock:
+        for uri in s3_folder_uris:
+            if uri in _resolved_folders:
+                resolved[uri] = _resolved_folders[uri]
+
+    by_bucket: Dict[str, Dict[str, str]] = {}
+    for uri in set(s3_folder_uris) - set(resolved):
+        parsed = urlparse(uri)
+        by_bucket.setdefault(parsed.netloc, {})[uri] = parsed.path.lstrip("/")
+
+    for bucket, prefixes in by_bucket.items():
+        remaining = dict(prefixes)
+
+        if len(prefixes) > 1:
+            common = os.path.commonprefix(list(prefixes.values()))
+            common = common[: common.rfind("/") + 1]
+            keys = _list_keys(bucket, common, max_keys=LUMA_BULK_LIST_MAX_KEYS)
+            truncated = len(keys) >= LUMA_BULK_LIST_MAX_KEYS
+            for uri, prefix in prefixes.items():
+                key = _pick_video_key([k for k in keys if k.startswith(prefix)])
+                if key or not truncated:
+                    resolved[uri] = f"s3://{bucket}/{key}" if key else None
+                    remaining.pop(uri)
+
+        for uri, prefix in remaining.items():
+            key = _pick_video_key(_list_keys(bucket, prefix))
+            resolved[uri] = f"s3://{bucket}/{key}" if key else None
+
+    for uri, video_uri in resolved.items():
+        if video_uri is None:
+            print("[LUMA] No objects found under prefix", uri)
+        else:
+            print("[LUMA] Using key for playback:", video_uri)
+
+    with _resolved_folders_lock:
+        for uri, video_uri in resolved.items():
+            if video_uri is not None:
+                _resolved_folders[uri] = video_uri
+        while len(_resolved_folders) > LUMA_RESOLVED_FOLDERS_MAX:
+            _resolved_folders.pop(next(iter(_resolved_folders)))
+
+    return resolved
+
+
+def _sign_s3_uri(s3_uri: str, expires_in: int) -> str:
+    parsed = urlparse(s3_uri)
+    return s3_client.generate_presigned_url(
+        "get_object",
+        Params={"Bucket": parsed.netloc, "Key": parsed.path.lstrip("/")},
+        ExpiresIn=expires_in,
+    )
 
-    Returns: S3 URI for the output video (or folder), or None on failure / disabled.
+
+presigned_urls = PresignedURLCache(_sign_s3_uri, LUMA_PRESIGN_EXPIRES_SECONDS)
+
+
+@stage_timer("presign")
+def presign_s3_uri(s3_uri: str) -> str:
+    """
+    Presigned HTTPS GET URL for an s3://bucket/key URI. The same URL is
+    reused until it is close to expiry.
+    """
+    return presigned_urls.get(s3_uri)
+
+
+luma_scheduler = LumaScheduler(bedrock_client, resolve_video_keys)
+registry.register(
+    CallbackGauge(
+        "luma_jobs_in_flight",
+        "Luma jobs held by the scheduler, by state.",
+        ("state",),
+        lambda: {(state,): luma_scheduler.stats()[state] for state in ("pending", "starting", "active")},
+    )
+)
+
+
+def submit_luma_job(
+    prompt: str,
+    key_prefix: str,
+    on_stage: Optional[Callable[[RenderStage], None]] = None,
+    priority: int = 0,
+) -> Future:
+    """
+    Non-blocking Luma call: queue the job on the shared scheduler and return
+    a Future that resolves to the S3 URI of the output video, or None on
+    failure / disabled.
     """
     if not USE_LUMA:
         print("[LUMA] USE_LUMA is false; skipping Luma video generation.")
-        return None
+        done: Future = Future()
+        done.set_result(None)
+        return done
 
     s3_uri = f"s3://{LUMA_OUTPUT_BUCKET}/{key_prefix}"
-    model_input = {
-        "prompt": prompt,
-        "aspect_ratio": "16:9",
-        "loop": False,
-        "duration": "5s",
-        "resolution": "720p",
-    }
+    model_input = {"prompt": prompt, **LUMA_GENERATION_PARAMS}
+
+    return luma_scheduler.submit(
+        LUMA_MODEL_ID,
+        model_input,
+        s3_uri,
+        priority=priority,
+        on_stage=on_stage,
+    )
 
-    try:
-        start_response = bedrock_client.start_async_invoke(
-            modelId=LUMA_MODEL_ID,
-            modelInput=model_input,
-            outputDataConfig={
-                "s3OutputDataConfig": {
-                    "s3Uri": s3_uri,
-                }
-            },
-        )
-    except ClientError as e:
-        code = e.response.get("Error", {}).get("Code")
-        print(f"[LUMA] start_async_invoke failed with {code}: {e}")
-        # If it's throttling or any other issue, just skip video instead of 500.
-        return None
-    except BotoCoreError as e:
-        print(f"[LUMA] start_async_invoke BotoCoreError: {e}")
-        return None
 
-    invocation_arn = start_response.get("invocationArn")
-    if not invocation_arn:
-        print(f"[LUMA] Missing invocationArn in response: {start_response}")
-        return None
+def call_luma_model(
+    prompt: str,
+    key_prefix: str,
+    on_stage: Optional[Callable[[RenderStage], None]] = None,
+) -> Optional[str]:
+    """
+    Call Luma Ray 2 via Bedrock Async APIs to generate a video.
 
-    print(f"[LUMA] Started async job: {invocation_arn}")
+    - prompt: text prompt for the video
+    - key_prefix: S3 prefix to keep outputs organized, e.g. "luma_outputs/<dream-id>"
+    - on_stage: optional callback, told when the job is queued and when it starts running
 
-    # ---- 2) Poll GetAsyncInvoke until completion or timeout ----
-    max_wait_seconds = 300  # 5 minutes
-    poll_interval = 10
-    waited = 0
+    Blocks until the shared scheduler finishes the job; prefer
+    submit_luma_job where the caller can continue without waiting.
+
+    Returns: S3 URI for the output video (or folder), or None on failure / disabled.
+    """
+    return submit_luma_job(prompt, key_prefix, on_stage=on_stage).result()
 
-    while waited < max_wait_seconds:
-        try:
-            job = bedrock_client.get_async_invoke(invocationArn=invocation_arn)
-        except ClientError as e:
-            code = e.response.get("Error", {}).get("Code")
-            print(f"[LUMA] get_async_invoke failed with {code}: {e}")
-            # If throttled during polling, just bail gracefully.
-            return None
-        except BotoCoreError as e:
-            print(f"[LUMA] get_async_invoke BotoCoreError: {e}")
-            return None
-
-        status = job.get("status")
-        print(f"[LUMA] Job status: {status}")
-
-        if status == "Completed":
-            output_cfg = job.get("outputDataConfig", {}).get("s3OutputDataConfig", {})
-            final_uri = output_cfg.get("s3Uri") or s3_uri
-            print(f"[LUMA] Video written to: {final_uri}")
-            return final_uri
-
-        if status == "Failed":
-            print(f"[LUMA] Job failed: {job.get('failureMessage') or job}")
-            return None
-
-        time.sleep(poll_interval)
-        waited += poll_interval
-
-    print("[LUMA] Job timed out.")
-    return None
 
 def get_luma_video_url_from_folder(s3_folder_uri: str) -> Optional[str]:
     """
@@ -495,85 +876,401 @@ def get_luma_video_url_from_folder(s3_folder_uri: str) -> Optional[str]:
     if not s3_folder_uri:
         return None
 
-    parsed = urlparse(s3_folder_uri)
-    bucket = parsed.netloc
-    prefix = parsed.path.lstrip("/")
-
-    # List objects under the prefix
-    resp = s3_client.list_objects_v2(Bucket=bucket, Prefix=prefix)
-    contents = resp.get("Contents", [])
-    if not contents:
-        print("[LUMA] No objects found under prefix", prefix)
+    video_uri = resolve_video_keys([s3_folder_uri]).get(s3_folder_uri)
+    if not video_uri:
         return None
 
-    # Try to find a video file
-    mp4_keys = [obj["Key"] for obj in contents if obj["Key"].endswith(".mp4")]
-    if mp4_keys:
-        key = mp4_keys[0]
-    else:
-        key = contents[0]["Key"]
+    return presign_s3_uri(video_uri)
 
-    print("[LUMA] Using key for playback:", key)
 
-    # Generate a presigned URL (1 hour)
-    url = s3_client.generate_presigned_url(
-        "get_object",
-        Params={"Bucket": bucket, "Key": key},
-        ExpiresIn=3600,
+# ---------- 5. Render cache ----------
+
+render_cache = RenderCache(s3_client, DATA_BUCKET)
+
+
+def render_cache_key(model_input: Dict[str, Any]) -> str:
+    """
+    Content address of a render: the model input minus per-entry identity
+    (id, created_at), plus the models, prompts and generation parameters in
+    effect, so editing a prompt retires the renders made with the old one.
+    """
+    context = {
+        k: v for k, v in model_input.get("context", {}).items()
+        if k not in ("id", "created_at")
+    }
+    return stable_hash(
+        {
+            "dream": model_input.get("dream", {}),
+            "context": context,
+            "text_model": CLAUDE_MODEL_ID if USE_BEDROCK else "local-stub",
+            "text_pipeline": RENDER_PIPELINE_MODE,
+            "text_params": {"max_tokens": CLAUDE_MAX_TOKENS, "temperature": CLAUDE_TEMPERATURE},
+            "text_prompts": _active_prompts() if USE_BEDROCK else None,
+            "video_model": LUMA_MODEL_ID if USE_LUMA else None,
+            "video_params": LUMA_GENERATION_PARAMS,
+        }
     )
-    return url
 
 
-# ---------- 5.  FastAPI ----------
 
-def run_dream_inference(dream: Dream) -> DreamRenderResponse:
+def _active_prompts() -> Dict[str, Any]:
+    """Prompt text (and per-part budgets) the current pipeline mode sends."""
+    if RENDER_PIPELINE_MODE == "split":
+        system = {part: [prompt, max_tokens] for part, (prompt, max_tokens, _) in CLAUDE_PARTS.items()}
+    else:
+        system = {"full": CLAUDE_SYSTEM_PROMPT}
+    return {"system": system, "user": CLAUDE_USER_TEMPLATE}
+
+
+# ---------- 6.  FastAPI ----------
+
+ProgressCallback = Callable[[Optional[RenderStage], Dict[str, Any]], None]
+
+ANALYSIS_STAGE_WORKERS = int(os.getenv("ANALYSIS_STAGE_WORKERS", "8"))
+_analysis_pool = ThreadPoolExecutor(max_workers=ANALYSIS_STAGE_WORKERS, thread_name_prefix="analysis")
+_combine_lock = threading.Lock()
+# Dream store and search index writes happen off the Luma scheduler loop
+# and the request threads.
+_video_index_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="video-index")
+
+
+def run_text_stage(dream: Dream) -> Dict[str, Any]:
     """
-    Main inference pipeline:
+    Text half of the pipeline: build the model input and ask Claude (or the
+    local stub) for the treatment, style profile and psychoanalysis.
 
-      1. Build structured payload (dream + context).
-      2. Use Claude (or local stub) to get:
-         - movie_script
-         - psychoanalysis
-         - style_profile
-         - psycho_metadata
-      3. Build a prompt for Luma from movie_script + style_profile.
-      4. Call Luma via Bedrock Async to generate a video (S3 URI).
-      5. Return everything as DreamRenderResponse.
+    Returns a dict with movie_script, psychoanalysis, style_profile and
+    psycho_metadata (a PsychoMetadata or None). Served from the render
+    cache when an identical dream has been rendered before.
+    """
+    text: Dict[str, Any] = {}
+    with stage_timer("text_stage"):
+        for _ in _text_stage_fields(dream, call_model, text):
+            pass
+    return text
+
+
+def stream_text_stage(dream: Dream, text: Dict[str, Any]) -> Iterator[Tuple[str, Any]]:
+    """
+    Streaming run_text_stage: yields (field, raw JSON value) for each of
+    movie_script, psychoanalysis, style_profile and psycho_metadata as soon
+    as the model has finished writing it. Once exhausted, `text` holds the
+    same result run_text_stage would have returned.
+    """
+    with stage_timer("text_stage"):
+        yield from _text_stage_fields(dream, stream_model, text)
+
+
+def _text_stage_fields(
+    dream: Dream,
+    model_fn: Callable[[Dict[str, Any]], Any],
+    text: Dict[str, Any],
+) -> Iterator[Tuple[str, Any]]:
+    """
+    Shared body of the text stage. model_fn returns either the full result
+    dict or an iterator of (field, value) pairs. Yields raw fields as they
+    arrive and leaves the normalized result in `text`.
     """
-    # 1. Prepare model input for text model
     model_input = build_model_input(dream)
 
-    # 2. Claude (or stub)
-    raw = call_model(model_input)
+    cache_key = render_cache_key(model_input) if RENDER_CACHE_ENABLED else None
+    cached = render_cache.get(cache_key) if cache_key else None
+    if cached is not None:
+        print(f"[CACHE] Text stage hit for dream {dream.id}")
+        result = cached
+    else:
+        result = model_fn(model_input)
+
+    pairs = result.items() if isinstance(result, dict) else result
+    raw: Dict[str, Any] = {}
+    for name, value in pairs:
+        raw[name] = value
+        if name in CLAUDE_RESPONSE_FIELDS:
+            yield name, value
+
+    text.update(_normalize_text(raw))
+    _remember_signifiers(dream, text)
+
+    if cache_key and cached is None:
+        _cache_text(cache_key, text)
+
 
+def _normalize_text(raw: Dict[str, Any]) -> Dict[str, Any]:
     raw_meta = raw.get("psycho_metadata")
     psycho_meta_obj: Optional[PsychoMetadata] = None
     if isinstance(raw_meta, dict):
         psycho_meta_obj = PsychoMetadata(**raw_meta)
+    raw_usage = raw.get("usage")
+
+    return {
+        "movie_script": raw.get("movie_script", ""),
+        "psychoanalysis": raw.get("psychoanalysis", ""),
+        "style_profile": raw.get("style_profile", {}),
+        "psycho_metadata": psycho_meta_obj,
+        "usage": TokenUsage(**raw_usage) if isinstance(raw_usage, dict) else None,
+    }
+
+
+def _cache_text(cache_key: str, text: Dict[str, Any]) -> None:
+    meta = text.get("psycho_metadata")
+    # usage is per call; a cache hit costs no tokens
+    entry = {k: v for k, v in text.items() if k != "usage"}
+    render_cache.put(cache_key, dict(entry, psycho_metadata=meta.model_dump() if meta else None))
+
+
+def run_video_stage(
+    dream: Dream,
+    movie_script: str,
+    style_profile: Dict[str, Any],
+    on_stage: Optional[Callable[[RenderStage], None]] = None,
+) -> Optional[str]:
+    """
+    Video half of the pipeline: build the Luma prompt, run the async job and
+    return a presigned URL for the result (or None if no video was produced).
+    """
+    return start_video_stage(dream, movie_script, style_profile, on_stage=on_stage).result()
 
-    movie_script: str = raw.get("movie_script", "")
-    style_profile: Dict[str, Any] = raw.get("style_profile", {})
-    psychoanalysis: str = raw.get("psychoanalysis", "")
 
-    # 3. Build Luma prompt
+def start_video_stage(
+    dream: Dream,
+    movie_script: str,
+    style_profile: Dict[str, Any],
+    on_stage: Optional[Callable[[RenderStage], None]] = None,
+    priority: int = 0,
+) -> Future:
+    """
+    Non-blocking run_video_stage: returns a Future for the presigned URL.
+    The Luma job is owned by the shared scheduler, so no thread waits on it.
+    """
+    url_future: Future = Future()
+    started = time.monotonic()
+    url_future.add_done_callback(
+        lambda f: observe_stage("video_stage", time.monotonic() - started, f.exception() is not None)
+    )
+
+    cache_key = render_cache_key(build_model_input(dream)) if RENDER_CACHE_ENABLED else None
+    cached = render_cache.get(cache_key, record_stats=False) if cache_key else None
+    if cached and cached.get("video_uri"):
+        print(f"[CACHE] Video stage hit for dream {dream.id}")
+        _remember_video(dream.id, cached["video_uri"])
+        url_future.set_result(presign_s3_uri(cached["video_uri"]))
+        return url_future
+
     luma_prompt = build_luma_prompt(movie_script, style_profile)
 
     key_prefix = f"luma_outputs/{dream.id}"
-    s3_folder_uri = call_luma_model(luma_prompt, key_prefix)
+    luma_future = submit_luma_job(luma_prompt, key_prefix, on_stage=on_stage, priority=priority)
+
+    def on_done(f: Future) -> None:
+        try:
+            video_uri = f.result()
+            if video_uri:
+                _remember_video(dream.id, video_uri)
+                if cache_key:
+                    render_cache.update(cache_key, video_uri=video_uri)
+            # presigning is a local signature computation, safe on the scheduler thread
+            presigned_video_url = presign_s3_uri(video_uri) if video_uri else None
+        except BaseException as e:
+            url_future.set_exception(e)
+            return
+        print("[LUMA] Returning video URL to client:", presigned_video_url)
+        url_future.set_result(presigned_video_url)
+
+    luma_future.add_done_callback(on_done)
+    return url_future
+
+
+def _remember_video(dream_id: str, video_uri: str) -> None:
+    def write() -> None:
+        try:
+            dream_store.set_video_uri(dream_id, video_uri)
+        except Exception as e:
+            print(f"[STORE] Could not record video for dream {dream_id}: {e}")
+
+    _video_index_pool.submit(write)
+
+
+def _remember_signifiers(dream: Dream, text: Dict[str, Any]) -> None:
+    meta = text.get("psycho_metadata")
+    if not meta or not meta.key_signifiers:
+        return
+
+    def write() -> None:
+        try:
+            dream_search.set_signifiers(dream, meta.key_signifiers)
+        except Exception as e:
+            print(f"[SEARCH] Could not index signifiers for dream {dream.id}: {e}")
+
+    _video_index_pool.submit(write)
+
+
+def get_dream_video_url(dream: Dream) -> Optional[str]:
+    """
+    Presigned URL for the dream's last rendered video, or None if it has
+    not been rendered. Served from the dream store and the presigned-URL
+    cache, so playback never lists S3.
+    """
+    video_uri = dream_store.get_video_uri(dream.id)
+    if not video_uri and RENDER_CACHE_ENABLED:
+        # rendered before videos were recorded with the dream
+        cached = render_cache.get(render_cache_key(build_model_input(dream)), record_stats=False)
+        video_uri = cached.get("video_uri") if cached else None
+        if video_uri:
+            dream_store.set_video_uri(dream.id, video_uri)
+    return presign_s3_uri(video_uri) if video_uri else None
+
+
+def start_dream_render(
+    dream: Dream,
+    on_progress: Optional[ProgressCallback] = None,
+) -> Future:
+    """
+    Run the text stage on the calling thread, then hand the video stage to
+    the Luma scheduler. Returns a Future for the DreamRenderResponse.
+
+    In split mode the psychoanalysis is generated on the analysis pool
+    while the treatment is generated here; Luma starts as soon as the
+    treatment is in, and the Future resolves once both the psychoanalysis
+    and the video are done.
+
+    on_progress, if given, is called with (stage, partial_results) as the
+    render advances; stage is None for results that arrive mid-stage.
+    """
+    RENDERS_IN_FLIGHT.inc()
+    started = time.monotonic()
+
+    def on_done(f: Future) -> None:
+        RENDERS_IN_FLIGHT.dec()
+        observe_stage("render", time.monotonic() - started, f.cancelled() or f.exception() is not None)
+
+    try:
+        future = _start_dream_render(dream, on_progress)
+    except BaseException:
+        RENDERS_IN_FLIGHT.dec()
+        observe_stage("render", time.monotonic() - started, failed=True)
+        raise
+    future.add_done_callback(on_done)
+    return future
+
 
-    presigned_video_url: Optional[str] = None
-    if s3_folder_uri:
-        presigned_video_url = get_luma_video_url_from_folder(s3_folder_uri)
+def _start_dream_render(dream: Dream, on_progress: Optional[ProgressCallback]) -> Future:
+    def report(stage: Optional[RenderStage], partial: Dict[str, Any]) -> None:
+        if on_progress:
+            on_progress(stage, partial)
 
-    print("[LUMA] Returning video URL to client:", presigned_video_url)
+    report(RenderStage.TEXT_MODEL, {})
 
-    return DreamRenderResponse(
-        dream=dream,
-        style_profile=style_profile,
-        movie_script=movie_script,
-        psychoanalysis=psychoanalysis,
-        psycho_metadata=psycho_meta_obj,
-        video_url=presigned_video_url,
+    model_input = build_model_input(dream)
+    cache_key = render_cache_key(model_input) if RENDER_CACHE_ENABLED else None
+
+    if RENDER_PIPELINE_MODE == "split":
+        cached = render_cache.get(cache_key) if cache_key else None
+        if cached is None:
+            return _start_split_render(dream, model_input, cache_key, report)
+        print(f"[CACHE] Text stage hit for dream {dream.id}")
+        text = _normalize_text(cached)
+        _remember_signifiers(dream, text)
+    else:
+        text = run_text_stage(dream)
+
+    report(RenderStage.VIDEO_QUEUED, text)
+
+    video_future = start_video_stage(
+        dream,
+        text["movie_script"],
+        text["style_profile"],
+        on_stage=lambda stage: report(stage, {}),
+    )
+    return _combine(
+        [video_future],
+        lambda video_url: DreamRenderResponse(dream=dream, video_url=video_url, **text),
     )
 
 
+def _start_split_render(
+    dream: Dream,
+    model_input: Dict[str, Any],
+    cache_key: Optional[str],
+    report: ProgressCallback,
+) -> Future:
+    analysis_future = _analysis_pool.submit(call_model_part, model_input, "analysis")
+
+    def on_analysis(f: Future) -> None:
+        if not f.cancelled() and f.exception() is None:
+            analysis = _normalize_text(f.result())
+            report(None, {k: analysis[k] for k in ANALYSIS_FIELDS})
+
+    analysis_future.add_done_callback(on_analysis)
+
+    try:
+        treatment = call_model_part(model_input, "treatment")
+    except BaseException:
+        analysis_future.cancel()
+        raise
+
+    treatment_text = _normalize_text(treatment)
+    report(RenderStage.VIDEO_QUEUED, {k: treatment_text[k] for k in TREATMENT_FIELDS})
+
+    video_future = start_video_stage(
+        dream,
+        treatment_text["movie_script"],
+        treatment_text["style_profile"],
+        on_stage=lambda stage: report(stage, {}),
+    )
+
+    def merge(analysis: Dict[str, Any], video_url: Optional[str]) -> DreamRenderResponse:
+        raw = dict(treatment, **analysis)
+        raw["usage"] = merge_usage(treatment.get("usage"), analysis.get("usage"))
+        text = _normalize_text(raw)
+        _remember_signifiers(dream, text)
+        if cache_key:
+            _cache_text(cache_key, text)
+        return DreamRenderResponse(dream=dream, video_url=video_url, **text)
+
+    return _combine([analysis_future, video_future], merge)
+
+
+def _combine(futures: List[Future], fn: Callable[..., Any]) -> Future:
+    """
+    Future for fn(*results) once every future in `futures` is done; fails
+    with the first error. fn runs on whichever thread finishes last.
+    """
+    combined: Future = Future()
+    remaining = [len(futures)]
+
+    def on_done(_: Future) -> None:
+        # done callbacks may fire concurrently from different threads
+        with _combine_lock:
+            remaining[0] -= 1
+            if remaining[0]:
+                return
+        try:
+            combined.set_result(fn(*(f.result() for f in futures)))
+        except BaseException as e:
+            combined.set_exception(e)
+
+    for f in futures:
+        f.add_done_callback(on_done)
+    return combined
+
+
+def run_dream_inference(
+    dream: Dream,
+    on_progress: Optional[ProgressCallback] = None,
+) -> DreamRenderResponse:
+    """
+    Main inference pipeline:
+
+      1. Build structured payload (dream + context).
+      2. Use Claude (or local stub) to get:
+         - movie_script
+         - psychoanalysis
+         - style_profile
+         - psycho_metadata
+      3. Build a prompt for Luma from movie_script + style_profile.
+      4. Call Luma via Bedrock Async to generate a video (S3 URI).
+      5. Return everything as DreamRenderResponse.
+
+    Blocking wrapper around start_dream_render; see there for on_progress.
+    """
+    return start_dream_render(dream, on_progress=on_progress).result()
@@ -0,0 +1,125 @@
+# backend/app/json_stream.py
+# Incremental parser for the single JSON object Claude is asked to return.
+#
+# Text arrives in small deltas while the model is still generating. The parser
+# scans it once, character by character, and hands back each top-level member
+# of the object as soon as that member's value is complete, so callers can act
+# on "movie_script" long before "psycho_metadata" has been written.
+
+import json
+from typing import Any, List, Tuple
+
+_WHITESPACE = " \t\r\n"
+
+
+class IncrementalJSONFieldParser:
+    """
+    Feed chunks of model text; get back (key, value) pairs for every
+    top-level field of the object that completed within the chunk.
+
+    Anything before the first "{" (a ```json fence, a stray sentence) and
+    anything after the matching "}" (a closing fence) is ignored.
+    """
+
+    def __init__(self) -> None:
+        self._text = ""
+        self._pos = 0
+        self._state = "seek_object"
+        self._key_start = 0
+        self._key = ""
+        self._value_start = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self.done = False
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        self._text += chunk
+        fields: List[Tuple[str, Any]] = []
+        text = self._text
+        i = self._pos
+
+        while i < len(text) and not self.done:
+            c = text[i]
+            state = self._state
+
+            if state == "seek_object":
+                if c == "{":
+                    self._state = "seek_key"
+
+            elif state == "seek_key":
+                if c == '"':
+                    self._key_start = i
+                    self._in_string = True
+                    self._state = "key"
+                elif c == "}":
+                    self.done = True
+                elif c not in _WHITESPACE and c != ",":
+                    raise ValueError(f"Unexpected {c!r} while looking for a key at offset {i}")
+
+            elif state == "key":
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    self._key = json.loads(text[self._key_start : i + 1])
+                    self._state = "seek_colon"
+
+            elif state == "seek_colon":
+                if c == ":":
+                    self._state = "seek_value"
+                elif c not in _WHITESPACE:
+                    raise ValueError(f"Expected ':' after key {self._key!r}, got {c!r}")
+
+            elif state == "seek_value":
+                if c not in _WHITESPACE:
+                    self._value_start = i
+                    self._depth = 0
+                    self._state = "value"
+                    continue  # re-read this char in the value state
+
+            elif state == "value":
+                end = self._scan_value_char(c, i)
+                if end is not None:
+                    fields.append((self._key, json.loads(text[self._value_start : end])))
+                    self._state = "seek_key"
+                    if c == "}" and end == i:
+                        # a bare literal/number was closed by the object's brace
+                        self.done = True
+
+            i += 1
+
+        self._pos = i
+        return fields
+
+    def _scan_value_char(self, c: str, i: int):
+        """
+        Advance the value scanner by one char; return the end offset of the
+        value (exclusive) once it is complete, otherwise None.
+        """
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif c == "\\":
+                self._escape = True
+            elif c == '"':
+                self._in_string = False
+                if self._depth == 0:
+                    return i + 1
+            return None
+
+        if c == '"':
+            self._in_string = True
+        elif c in "{[":
+            self._depth += 1
+        elif c in "}]":
+            if self._depth == 0:
+                return i
+            self._depth -= 1
+            if self._depth == 0:
+                return i + 1
+        elif c == "," and self._depth == 0:
+            return i
+        return None
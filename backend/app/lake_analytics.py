@@ -0,0 +1,294 @@
+# backend/app/lake_analytics.py
+# Read-only aggregate queries over the structured Parquet table.
+#
+# The materializer writes structured/dreams_parquet/v1/event_date=<date>/
+# files and commits each partition through a small manifest under
+# _manifest/partitions/ (see analytics/lake_manifest.py). Queries go through
+# those manifests: one LIST gives the partitions in the requested date range
+# (so out-of-range partitions are never opened) together with their ETags,
+# which version the data a query sees. pyarrow.dataset then reads only the
+# projected columns of the committed files, with the filter pushed down to
+# the Hive partition expressions and row-group statistics.
+#
+# Results are cached per (query, date range, partition-set version), so a
+# dashboard refresh costs one LIST until the materializer commits a
+# partition inside the range.
+
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+from botocore.exceptions import ClientError
+
+from .render_cache import stable_hash
+
+LAKE_TABLE_PREFIX = os.getenv("LAKE_TABLE_PREFIX", "structured/dreams_parquet/v1/")
+LAKE_REGION = os.getenv("LAKE_REGION", "us-west-2")
+LAKE_ANALYTICS_CACHE_MAX_ENTRIES = int(os.getenv("LAKE_ANALYTICS_CACHE_MAX_ENTRIES", "256"))
+LAKE_MANIFEST_FETCH_CONCURRENCY = int(os.getenv("LAKE_MANIFEST_FETCH_CONCURRENCY", "16"))
+
+# Same layout as analytics/lake_manifest.py.
+MANIFEST_DIR = "_manifest/partitions/"
+# Partition of rows without a created_at; only in results without a date bound.
+UNKNOWN_DATE = "unknown_date"
+
+# The columns queries may touch. Declaring them instead of inferring from the
+# first file means a file written before a column existed reads it as null.
+ANALYTICS_SCHEMA = pa.schema(
+    [
+        ("event_date", pa.string()),
+        ("dream_id", pa.string()),
+        ("mood", pa.int64()),
+        ("sleep_quality", pa.int64()),
+        ("register_feel", pa.string()),
+        ("wish_fulfillment_type", pa.string()),
+        ("has_video", pa.bool_()),
+    ]
+)
+
+_PARTITIONING = ds.partitioning(pa.schema([("event_date", pa.string())]), flavor="hive")
+_COUNT_ALL = pc.CountOptions(mode="all")
+
+
+# --- queries: (dataset, filter) -> JSON-ready result ---
+
+def _mood_by_register(dataset: ds.Dataset, where: Optional[ds.Expression]) -> Dict[str, Any]:
+    table = dataset.to_table(columns=["register_feel", "mood", "sleep_quality"], filter=where)
+    grouped = table.group_by("register_feel", use_threads=False).aggregate(
+        [
+            ("register_feel", "count", _COUNT_ALL),
+            ("mood", "mean"),
+            ("sleep_quality", "mean"),
+        ]
+    )
+    groups = [
+        {
+            "register_feel": r["register_feel"],
+            "dreams": r["register_feel_count"],
+            "mood_mean": r["mood_mean"],
+            "sleep_quality_mean": r["sleep_quality_mean"],
+        }
+        for r in grouped.to_pylist()
+    ]
+    groups.sort(key=lambda g: -g["dreams"])
+    return {"dreams": table.num_rows, "groups": groups}
+
+
+def _wish_fulfillment(dataset: ds.Dataset, where: Optional[ds.Expression]) -> Dict[str, Any]:
+    table = dataset.to_table(columns=["wish_fulfillment_type"], filter=where)
+    grouped = table.group_by("wish_fulfillment_type", use_threads=False).aggregate(
+        [("wish_fulfillment_type", "count", _COUNT_ALL)]
+    )
+    total = table.num_rows
+    groups = [
+        {
+            "wish_fulfillment_type": r["wish_fulfillment_type"],
+            "dreams": r["wish_fulfillment_type_count"],
+            "share": r["wish_fulfillment_type_count"] / total,
+        }
+        for r in grouped.to_pylist()
+    ]
+    groups.sort(key=lambda g: -g["dreams"])
+    return {"dreams": total, "groups": groups}
+
+
+def _video_rate(dataset: ds.Dataset, where: Optional[ds.Expression]) -> Dict[str, Any]:
+    table = dataset.to_table(columns=["event_date", "has_video"], filter=where)
+    table = table.set_column(1, "has_video", pc.fill_null(table.column("has_video"), False).cast(pa.int64()))
+    grouped = table.group_by("event_date", use_threads=False).aggregate(
+        [("event_date", "count", _COUNT_ALL), ("has_video", "sum")]
+    )
+    days = sorted(
+        (
+            {
+                "event_date": r["event_date"],
+                "dreams": r["event_date_count"],
+                "with_video": r["has_video_sum"],
+                "video_rate": r["has_video_sum"] / r["event_date_count"],
+            }
+            for r in grouped.to_pylist()
+        ),
+        key=lambda d: d["event_date"] or "",
+    )
+    total = table.num_rows
+    with_video = sum(d["with_video"] for d in days)
+    return {
+        "dreams": total,
+        "with_video": with_video,
+        "video_rate": with_video / total if total else None,
+        "days": days,
+    }
+
+
+QUERIES: Dict[str, Callable[[ds.Dataset, Optional[ds.Expression]], Dict[str, Any]]] = {
+    "mood_by_register": _mood_by_register,
+    "wish_fulfillment": _wish_fulfillment,
+    "video_rate": _video_rate,
+}
+
+
+class LakeAnalytics:
+    def __init__(
+        self,
+        s3_client: Any,
+        bucket: str,
+        table_prefix: str = LAKE_TABLE_PREFIX,
+        filesystem: Optional[pafs.FileSystem] = None,
+        max_entries: int = LAKE_ANALYTICS_CACHE_MAX_ENTRIES,
+        fetch_concurrency: int = LAKE_MANIFEST_FETCH_CONCURRENCY,
+    ):
+        self._s3 = s3_client
+        self._bucket = bucket
+        self._table_prefix = table_prefix
+        self._manifest_prefix = f"{table_prefix}{MANIFEST_DIR}event_date="
+        # created on first query so importing the app never touches AWS
+        self._filesystem = filesystem
+        self._max_entries = max_entries
+        self._fetch_concurrency = fetch_concurrency
+
+        # (query, start, end, version) -> result
+        self._results: "OrderedDict[Tuple[str, Optional[str], Optional[str], str], Dict[str, Any]]" = OrderedDict()
+        # event_date -> (manifest ETag, data file keys); an ETag changes on every commit
+        self._files: Dict[str, Tuple[str, List[str]]] = {}
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "manifest_reads": 0, "files_scanned": 0}
+
+    def query(self, name: str, start: Optional[str] = None, end: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Run a named query over event_date partitions in [start, end]
+        (YYYY-MM-DD, both inclusive, either open). Raises KeyError for an
+        unknown query name.
+        """
+        fn = QUERIES[name]
+        partitions = self._partitions(start, end)
+        version = stable_hash(sorted(partitions.items()))
+        cache_key = (name, start, end, version)
+        with self._lock:
+            cached = self._results.get(cache_key)
+            if cached is not None:
+                self._results.move_to_end(cache_key)
+                self._counters["hits"] += 1
+                return cached
+            self._counters["misses"] += 1
+
+        try:
+            result = self._scan(fn, partitions, start, end)
+        except FileNotFoundError:
+            # A compaction swapped a partition between our manifest read and
+            # the scan; its new manifest has a new ETag, so re-plan once.
+            partitions = self._partitions(start, end)
+            version = stable_hash(sorted(partitions.items()))
+            cache_key = (name, start, end, version)
+            result = self._scan(fn, partitions, start, end)
+
+        result = {
+            "query": name,
+            "start": start,
+            "end": end,
+            "partitions": len(partitions),
+            "version": version[:16],
+            **result,
+        }
+        with self._lock:
+            self._results[cache_key] = result
+            self._results.move_to_end(cache_key)
+            while len(self._results) > self._max_entries:
+                self._results.popitem(last=False)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._counters,
+                "cached_results": len(self._results),
+                "known_partitions": len(self._files),
+            }
+
+    # --- internals ---
+
+    def _partitions(self, start: Optional[str], end: Optional[str]) -> Dict[str, str]:
+        """event_date -> manifest ETag for committed partitions in range, from LIST alone."""
+        kwargs: Dict[str, Any] = {"Bucket": self._bucket, "Prefix": self._manifest_prefix}
+        if start:
+            # "...event_date=2024-01-01" sorts just before "...event_date=2024-01-01.json"
+            kwargs["StartAfter"] = f"{self._manifest_prefix}{start}"
+        partitions: Dict[str, str] = {}
+        paginator = self._s3.get_paginator("list_objects_v2")
+        for page in paginator.paginate(**kwargs):
+            for obj in page.get("Contents", []):
+                name = obj["Key"][len(self._manifest_prefix):]
+                if not name.endswith(".json"):
+                    continue
+                event_date = name[: -len(".json")]
+                if event_date == UNKNOWN_DATE:
+                    # sorts after every date, so StartAfter alone lets it in
+                    if start or end:
+                        continue
+                elif end and event_date > end:
+                    return partitions
+                partitions[event_date] = obj.get("ETag", "")
+        return partitions
+
+    def _read_manifest_files(self, event_date: str) -> List[str]:
+        key = f"{self._manifest_prefix}{event_date}.json"
+        try:
+            body = self._s3.get_object(Bucket=self._bucket, Key=key)["Body"].read()
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                return []  # dropped by a full refresh since we listed it
+            raise
+        with self._lock:
+            self._counters["manifest_reads"] += 1
+        return list(json.loads(body).get("files", []))
+
+    def _data_files(self, partitions: Dict[str, str]) -> List[str]:
+        with self._lock:
+            stale = [d for d, etag in partitions.items() if not etag or self._files.get(d, ("",))[0] != etag]
+        if stale:
+            workers = max(1, min(self._fetch_concurrency, len(stale)))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                fresh = dict(zip(stale, pool.map(self._read_manifest_files, stale)))
+            with self._lock:
+                for event_date in stale:
+                    self._files[event_date] = (partitions[event_date], fresh[event_date])
+        with self._lock:
+            return [f for d in sorted(partitions) for f in self._files[d][1]]
+
+    def _scan(
+        self,
+        fn: Callable[[ds.Dataset, Optional[ds.Expression]], Dict[str, Any]],
+        partitions: Dict[str, str],
+        start: Optional[str],
+        end: Optional[str],
+    ) -> Dict[str, Any]:
+        files = self._data_files(partitions)
+        with self._lock:
+            self._counters["files_scanned"] += len(files)
+        if self._filesystem is None:
+            self._filesystem = pafs.S3FileSystem(region=LAKE_REGION)
+        dataset = ds.dataset(
+            [f"{self._bucket}/{key}" for key in files],
+            schema=ANALYTICS_SCHEMA,
+            format="parquet",
+            filesystem=self._filesystem,
+            partitioning=_PARTITIONING,
+            partition_base_dir=f"{self._bucket}/{self._table_prefix}",
+        )
+        return fn(dataset, _date_filter(start, end))
+
+
+def _date_filter(start: Optional[str], end: Optional[str]) -> Optional[ds.Expression]:
+    where = None
+    if start:
+        where = ds.field("event_date") >= start
+    if end:
+        upper = ds.field("event_date") <= end
+        where = upper if where is None else where & upper
+    return where
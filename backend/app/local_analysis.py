@@ -0,0 +1,90 @@
+# backend/app/local_analysis.py
+# Signifier and register detection for the local text-model stub.
+#
+# Signifiers match as whole words, optionally pluralised: "exams" counts as
+# "exam", but "contestant" no longer counts as "test". Each narrative is
+# lowercased once and scanned with str.find, a C-level substring search that
+# beats any regex alternation over the word list in CPython; only the hits
+# are checked for word boundaries, with patterns compiled once at import.
+# The register is derived from the words found, so the text is never
+# rescanned per register.
+
+import re
+from typing import Any, List, NamedTuple, Optional, Tuple
+
+IMAGINARY_WORDS = ("mirror", "reflection", "double", "face", "body", "image")
+SYMBOLIC_WORDS = (
+    "exam",
+    "test",
+    "school",
+    "university",
+    "office",
+    "manager",
+    "contract",
+    "email",
+    "rules",
+)
+REAL_WORDS = ("blood", "wound", "dead", "scream", "void", "teeth", "falling", "crash")
+
+# When several registers are present the later one wins (real > symbolic > imaginary).
+REGISTERS = (("imaginary", IMAGINARY_WORDS), ("symbolic", SYMBOLIC_WORDS), ("real", REAL_WORDS))
+
+
+class _Signifier(NamedTuple):
+    word: str
+    rank: int
+    # matched at the hit position: the word, an optional plural, then a boundary
+    tail: "re.Pattern[str]"
+
+
+_SIGNIFIERS: Tuple[_Signifier, ...] = tuple(
+    _Signifier(word, rank, re.compile(re.escape(word) + r"(?:e?s)?\b"))
+    for rank, (_, words) in enumerate(REGISTERS, start=1)
+    for word in words
+)
+_REGISTER_NAMES = (None,) + tuple(name for name, _ in REGISTERS)
+
+
+class NarrativeAnalysis(NamedTuple):
+    key_signifiers: Optional[List[str]]
+    register_feel: Optional[str]
+
+
+def _starts_word(text: str, i: int) -> bool:
+    if i == 0:
+        return True
+    prev = text[i - 1]
+    return not (prev.isalnum() or prev == "_")
+
+
+def analyze_narrative(narrative: Optional[str]) -> NarrativeAnalysis:
+    """Key signifiers (sorted, or None) and register for one narrative."""
+    if not narrative:
+        return NarrativeAnalysis(None, None)
+    text = narrative.lower()
+    find = text.find
+    found: List[str] = []
+    rank = 0
+    for signifier in _SIGNIFIERS:
+        i = find(signifier.word)
+        while i != -1:
+            if _starts_word(text, i) and signifier.tail.match(text, i):
+                found.append(signifier.word)
+                if signifier.rank > rank:
+                    rank = signifier.rank
+                break
+            i = find(signifier.word, i + 1)
+    return NarrativeAnalysis(sorted(found) or None, _REGISTER_NAMES[rank])
+
+
+def analyze_narratives(narratives: Any) -> List[NarrativeAnalysis]:
+    """
+    Convenience wrapper: analyze_narrative over any iterable of strings
+    (None allowed) or a pyarrow string Array / ChunkedArray, e.g. the
+    narrative column of the structured dreams table. Each narrative is
+    still analyzed on its own; the cost is the scan of the text, which a
+    joined-batch or Arrow regex pass did not make cheaper.
+    """
+    if hasattr(narratives, "to_pylist"):
+        narratives = narratives.to_pylist()
+    return [analyze_narrative(n) for n in narratives]
@@ -0,0 +1,447 @@
+# backend/app/luma_scheduler.py
+# One scheduler that owns every in-flight Luma async invocation.
+#
+# Instead of each render thread calling start_async_invoke and then sleeping in
+# its own get_async_invoke loop, renders submit a job here and get a Future
+# back. A single asyncio loop (on one background thread) admits jobs against a
+# max-concurrent-jobs quota, polls all active jobs with adaptive backoff, and
+# resolves completed jobs to their .mp4 keys in bulk.
+
+import asyncio
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from .metrics import observe_stage
+from .schemas import RenderStage
+
+LUMA_MAX_CONCURRENT_JOBS = int(os.getenv("LUMA_MAX_CONCURRENT_JOBS", "4"))
+# Threads making the scheduler's Bedrock / S3 calls.
+LUMA_IO_WORKERS = 4
+# Typical wall-clock time of a 5s/720p Luma job; polling is sparse before
+# this and tight around it.
+LUMA_EXPECTED_DURATION_SECONDS = float(os.getenv("LUMA_EXPECTED_DURATION_SECONDS", "90"))
+LUMA_JOB_TIMEOUT_SECONDS = float(os.getenv("LUMA_JOB_TIMEOUT_SECONDS", "300"))
+LUMA_MIN_POLL_INTERVAL = float(os.getenv("LUMA_MIN_POLL_INTERVAL", "3"))
+LUMA_MAX_POLL_INTERVAL = float(os.getenv("LUMA_MAX_POLL_INTERVAL", "30"))
+# When at least this many jobs are due in one tick, use one paginated
+# list_async_invokes call instead of a get_async_invoke per job.
+LUMA_BULK_POLL_THRESHOLD = int(os.getenv("LUMA_BULK_POLL_THRESHOLD", "4"))
+LUMA_START_MAX_ATTEMPTS = int(os.getenv("LUMA_START_MAX_ATTEMPTS", "5"))
+
+_THROTTLE_CODES = {
+    "ThrottlingException",
+    "ServiceQuotaExceededException",
+    "TooManyRequestsException",
+}
+
+StageCallback = Callable[[RenderStage], None]
+# folder URIs -> {folder URI: s3 URI of the video object, or None}
+KeyResolver = Callable[[List[str]], Dict[str, Optional[str]]]
+
+
+@dataclass
+class _LumaJob:
+    model_id: str
+    model_input: Dict[str, Any]
+    s3_uri: str
+    priority: int
+    future: Future
+    on_stage: Optional[StageCallback] = None
+
+    queued_at: float = 0.0
+    attempts: int = 0
+    not_before: float = 0.0
+    invocation_arn: Optional[str] = None
+    started_at: float = 0.0
+    submit_time: Optional[datetime] = None
+    next_poll_at: float = 0.0
+    overdue_polls: int = 0
+    running: bool = False
+    output_uri: Optional[str] = None
+
+
+def next_poll_delay(age: float, overdue_polls: int) -> float:
+    """
+    Adaptive poll interval for a job that has been running for `age` seconds.
+
+    Before the expected duration we halve the remaining time each poll; once
+    overdue we back off geometrically. Always clamped to the min/max interval.
+    """
+    remaining = LUMA_EXPECTED_DURATION_SECONDS - age
+    if remaining > 0:
+        delay = remaining / 2
+    else:
+        delay = LUMA_MIN_POLL_INTERVAL * (1.5 ** overdue_polls)
+    return max(LUMA_MIN_POLL_INTERVAL, min(delay, LUMA_MAX_POLL_INTERVAL))
+
+
+class LumaScheduler:
+    def __init__(
+        self,
+        client: Any,
+        resolve_keys: KeyResolver,
+        max_concurrent: int = LUMA_MAX_CONCURRENT_JOBS,
+        io_workers: int = LUMA_IO_WORKERS,
+    ):
+        self._client = client
+        self._resolve_keys = resolve_keys
+        self.max_concurrent = max_concurrent
+
+        self._pending: List[Any] = []  # heap of (priority, seq, job)
+        self._seq = itertools.count()
+        self._active: Dict[str, _LumaJob] = {}
+        self._starting = 0
+
+        self._io = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="luma-io")
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stopping = False
+
+        self._counters = {
+            "submitted": 0,
+            "started": 0,
+            "start_throttled": 0,
+            "completed": 0,
+            "failed": 0,
+            "timed_out": 0,
+            "poll_calls": 0,
+            "bulk_poll_calls": 0,
+            "key_resolutions": 0,
+        }
+
+    # --- public API (any thread) ---
+
+    def submit(
+        self,
+        model_id: str,
+        model_input: Dict[str, Any],
+        s3_uri: str,
+        priority: int = 0,
+        on_stage: Optional[StageCallback] = None,
+    ) -> Future:
+        """
+        Queue a Luma job. Lower priority values are admitted first.
+
+        The returned Future resolves to the S3 URI of the output video
+        (or the output folder if no .mp4 was found), or None on failure.
+        """
+        future: Future = Future()
+        job = _LumaJob(
+            model_id=model_id,
+            model_input=model_input,
+            s3_uri=s3_uri,
+            priority=priority,
+            future=future,
+            on_stage=on_stage,
+            queued_at=time.monotonic(),
+        )
+        loop = self._ensure_loop()
+        loop.call_soon_threadsafe(self._enqueue, job)
+        return future
+
+    def stats(self) -> Dict[str, int]:
+        out = dict(self._counters)
+        out.update(
+            pending=len(self._pending),
+            active=len(self._active),
+            starting=self._starting,
+            max_concurrent=self.max_concurrent,
+        )
+        return out
+
+    def shutdown(self) -> None:
+        self._stopping = True
+        loop = self._loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self._wake)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._io.shutdown(wait=False, cancel_futures=True)
+
+    # --- loop plumbing ---
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._start_lock:
+            if self._loop is None:
+                ready = threading.Event()
+
+                def run() -> None:
+                    loop = asyncio.new_event_loop()
+                    asyncio.set_event_loop(loop)
+                    self._loop = loop
+                    self._wakeup = asyncio.Event()
+                    ready.set()
+                    loop.run_until_complete(self._main())
+                    loop.close()
+
+                self._thread = threading.Thread(target=run, name="luma-scheduler", daemon=True)
+                self._thread.start()
+                ready.wait()
+            return self._loop
+
+    def _wake(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _enqueue(self, job: _LumaJob) -> None:
+        self._counters["submitted"] += 1
+        heapq.heappush(self._pending, (job.priority, next(self._seq), job))
+        self._wake()
+
+    async def _io_call(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        return await self._loop.run_in_executor(self._io, lambda: fn(*args, **kwargs))
+
+    async def _main(self) -> None:
+        while not self._stopping:
+            self._wakeup.clear()
+            try:
+                self._admit()
+                await self._poll_due()
+            except Exception as e:
+                # One bad tick (e.g. an unexpected response shape) must not
+                # end the loop: every later submit would hang.
+                print(f"[LUMA] Scheduler tick failed: {e!r}")
+                await asyncio.sleep(1.0)
+
+            now = time.monotonic()
+            deadlines = [j.next_poll_at for j in self._active.values()]
+            deadlines += [j.not_before for _, _, j in self._pending if j.not_before > now]
+            timeout = max(0.0, min(deadlines) - now) if deadlines else None
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+        for _, _, job in self._pending:
+            job.future.cancel()
+        for job in self._active.values():
+            job.future.cancel()
+
+    # --- admission ---
+
+    def _admit(self) -> None:
+        now = time.monotonic()
+        deferred = []
+        while self._pending and len(self._active) + self._starting < self.max_concurrent:
+            item = heapq.heappop(self._pending)
+            job = item[2]
+            if job.future.cancelled():
+                continue
+            if job.not_before > now:
+                deferred.append(item)
+                continue
+            self._starting += 1
+            asyncio.ensure_future(self._start(job)).add_done_callback(self._log_task_error)
+        for item in deferred:
+            heapq.heappush(self._pending, item)
+
+    @staticmethod
+    def _log_task_error(task: "asyncio.Future[Any]") -> None:
+        if not task.cancelled() and task.exception() is not None:
+            print(f"[LUMA] Scheduler task failed: {task.exception()!r}")
+
+    async def _start(self, job: _LumaJob) -> None:
+        try:
+            await self._start_job(job)
+        except Exception as e:
+            print(f"[LUMA] Starting job failed unexpectedly: {e!r}")
+            if job.invocation_arn:
+                self._active.pop(job.invocation_arn, None)
+            self._finish(job, None, failed=True)
+
+    async def _start_job(self, job: _LumaJob) -> None:
+        job.attempts += 1
+        try:
+            resp = await self._io_call(
+                self._client.start_async_invoke,
+                modelId=job.model_id,
+                modelInput=job.model_input,
+                outputDataConfig={"s3OutputDataConfig": {"s3Uri": job.s3_uri}},
+            )
+        except ClientError as e:
+            code = e.response.get("Error", {}).get("Code")
+            if code in _THROTTLE_CODES and job.attempts < LUMA_START_MAX_ATTEMPTS:
+                # Put it back in line instead of dropping the video.
+                self._counters["start_throttled"] += 1
+                backoff = min(60.0, 2.0 ** job.attempts) * random.uniform(0.5, 1.0)
+                print(f"[LUMA] start_async_invoke throttled ({code}); retrying in {backoff:.1f}s")
+                job.not_before = time.monotonic() + backoff
+                heapq.heappush(self._pending, (job.priority, next(self._seq), job))
+            else:
+                print(f"[LUMA] start_async_invoke failed with {code}: {e}")
+                self._finish(job, None, failed=True)
+            return
+        except BotoCoreError as e:
+            print(f"[LUMA] start_async_invoke BotoCoreError: {e}")
+            self._finish(job, None, failed=True)
+            return
+        finally:
+            self._starting -= 1
+            self._wake()
+
+        invocation_arn = resp.get("invocationArn")
+        if not invocation_arn:
+            print(f"[LUMA] Missing invocationArn in response: {resp}")
+            self._finish(job, None, failed=True)
+            return
+
+        print(f"[LUMA] Started async job: {invocation_arn}")
+        self._counters["started"] += 1
+        job.invocation_arn = invocation_arn
+        job.started_at = time.monotonic()
+        observe_stage("luma_queue", job.started_at - job.queued_at)
+        job.submit_time = datetime.now(timezone.utc)
+        job.next_poll_at = job.started_at + next_poll_delay(0.0, 0)
+        self._active[invocation_arn] = job
+        self._notify(job, RenderStage.VIDEO_QUEUED)
+
+    # --- polling ---
+
+    async def _poll_due(self) -> None:
+        now = time.monotonic()
+        due = [j for j in self._active.values() if j.next_poll_at <= now]
+        if not due:
+            return
+
+        statuses = await self._fetch_statuses(due)
+
+        completed: List[_LumaJob] = []
+        now = time.monotonic()
+        for job in due:
+            try:
+                self._apply_status(job, statuses.get(job.invocation_arn), now, completed)
+            except Exception as e:
+                print(f"[LUMA] Bad status for {job.invocation_arn}: {e!r}")
+                self._active.pop(job.invocation_arn, None)
+                self._finish(job, None, failed=True)
+
+        if completed:
+            await self._resolve_completed(completed)
+
+    def _apply_status(
+        self, job: _LumaJob, info: Optional[Dict[str, Any]], now: float, completed: List[_LumaJob]
+    ) -> None:
+        age = now - job.started_at
+        status = info.get("status") if info else None
+
+        if status == "Completed":
+            output_cfg = info.get("outputDataConfig", {}).get("s3OutputDataConfig", {})
+            job.output_uri = output_cfg.get("s3Uri") or job.s3_uri
+            completed.append(job)
+            return
+
+        if status == "Failed":
+            print(f"[LUMA] Job failed: {info.get('failureMessage') or info}")
+            self._active.pop(job.invocation_arn, None)
+            self._finish(job, None, failed=True)
+            return
+
+        if age >= LUMA_JOB_TIMEOUT_SECONDS:
+            print(f"[LUMA] Job timed out: {job.invocation_arn}")
+            self._counters["timed_out"] += 1
+            self._active.pop(job.invocation_arn, None)
+            self._finish(job, None, failed=True)
+            return
+
+        if status == "InProgress" and not job.running:
+            job.running = True
+            self._notify(job, RenderStage.VIDEO_RUNNING)
+
+        if age > LUMA_EXPECTED_DURATION_SECONDS:
+            job.overdue_polls += 1
+        job.next_poll_at = now + next_poll_delay(age, job.overdue_polls)
+
+    async def _fetch_statuses(self, due: List[_LumaJob]) -> Dict[str, Dict[str, Any]]:
+        statuses: Dict[str, Dict[str, Any]] = {}
+
+        if len(due) >= LUMA_BULK_POLL_THRESHOLD:
+            oldest = min(j.submit_time for j in due) - timedelta(minutes=1)
+            try:
+                statuses = await self._io_call(self._list_since, oldest)
+            except Exception as e:
+                print(f"[LUMA] list_async_invokes failed, falling back to per-job polls: {e}")
+
+        missing = [j for j in due if j.invocation_arn not in statuses]
+        results = await asyncio.gather(
+            *(self._get_one(j.invocation_arn) for j in missing)
+        )
+        for job, info in zip(missing, results):
+            if info is not None:
+                statuses[job.invocation_arn] = info
+        return statuses
+
+    def _list_since(self, submit_time_after: datetime) -> Dict[str, Dict[str, Any]]:
+        out: Dict[str, Dict[str, Any]] = {}
+        kwargs: Dict[str, Any] = {"submitTimeAfter": submit_time_after, "maxResults": 1000}
+        while True:
+            self._counters["bulk_poll_calls"] += 1
+            resp = self._client.list_async_invokes(**kwargs)
+            for summary in resp.get("asyncInvokeSummaries", []):
+                out[summary["invocationArn"]] = summary
+            token = resp.get("nextToken")
+            if not token:
+                return out
+            kwargs["nextToken"] = token
+
+    async def _get_one(self, invocation_arn: str) -> Optional[Dict[str, Any]]:
+        self._counters["poll_calls"] += 1
+        try:
+            return await self._io_call(self._client.get_async_invoke, invocationArn=invocation_arn)
+        except ClientError as e:
+            # Throttled or transient: skip this tick, the job will be polled again.
+            code = e.response.get("Error", {}).get("Code")
+            print(f"[LUMA] get_async_invoke failed with {code}: {e}")
+        except BotoCoreError as e:
+            print(f"[LUMA] get_async_invoke BotoCoreError: {e}")
+        except Exception as e:
+            print(f"[LUMA] get_async_invoke failed: {e!r}")
+        return None
+
+    async def _resolve_completed(self, completed: List[_LumaJob]) -> None:
+        for job in completed:
+            self._active.pop(job.invocation_arn, None)
+
+        self._counters["key_resolutions"] += 1
+        uris = [job.output_uri for job in completed]
+        try:
+            resolved = await self._io_call(self._resolve_keys, uris)
+        except Exception as e:
+            print(f"[LUMA] Failed to resolve video keys, returning folders: {e}")
+            resolved = {}
+
+        for job in completed:
+            video_uri = resolved.get(job.output_uri) or job.output_uri
+            print(f"[LUMA] Video written to: {video_uri}")
+            self._finish(job, video_uri)
+
+    # --- completion ---
+
+    def _notify(self, job: _LumaJob, stage: RenderStage) -> None:
+        if job.on_stage is None:
+            return
+        try:
+            job.on_stage(stage)
+        except Exception as e:
+            print(f"[LUMA] on_stage callback raised: {e}")
+
+    def _finish(self, job: _LumaJob, result: Optional[str], failed: bool = False) -> None:
+        self._counters["failed" if failed else "completed"] += 1
+        if job.invocation_arn:
+            observe_stage("luma_execution", time.monotonic() - job.started_at, failed)
+        else:
+            observe_stage("luma_queue", time.monotonic() - job.queued_at, failed)
+        if not job.future.done():
+            job.future.set_result(result)
@@ -1,20 +1,46 @@
 # backend/app/main.py
 import os
 import json
+import threading
+from contextlib import asynccontextmanager
 from uuid import uuid4
 from datetime import datetime
-from typing import Dict
+from typing import Optional
 
-import boto3
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 
-from .schemas import DreamCreate, Dream, DreamRenderResponse
-from .inference_service import run_dream_inference
+from . import aws_clients
+from .schemas import DreamCreate, Dream, DreamSearchHit, DreamSearchResponse, RenderJob
+from .render_jobs import render_jobs
+from .render_stream import render_event_stream
+from .inference_service import USE_BEDROCK, get_dream_video_url, luma_scheduler, render_cache
+from .bedrock_limiter import BedrockOverloaded, bedrock_limiter
+from .token_usage import token_usage
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, HTTPMetricsMiddleware, registry as metrics_registry, stage_timer
+from .dream_event_wal import DREAM_WAL_DIR, DREAM_WAL_UPLOAD_CONCURRENCY, DreamEventWAL
+from .dream_store import DREAM_STORE_WARM_START, WARM_START_CONCURRENCY, dream_store, warm_start
+from .dream_search import QueryError, dream_search
+from .lake_analytics import LAKE_MANIFEST_FETCH_CONCURRENCY, LakeAnalytics
 
 # --- FastAPI + CORS setup ---
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    dream_wal.start()
+    # Build the AWS clients, rehydrate from the lake and load the search index
+    # in the background so startup stays fast.
+    threading.Thread(target=_prepare_dream_store, name="dream-store-warm-start", daemon=True).start()
+    yield
+    dream_wal.close()
+    render_jobs.shutdown()
+    luma_scheduler.shutdown()
+    dream_store.close()
+    dream_search.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -26,22 +52,68 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Outermost, so the timings include CORS handling.
+app.add_middleware(HTTPMetricsMiddleware)
+
+@app.exception_handler(BedrockOverloaded)
+def bedrock_overloaded_handler(request: Request, exc: BedrockOverloaded):
+    # Tell clients when to come back instead of failing with a bare 500.
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(int(exc.retry_after + 0.999))},
+    )
+
+
+def _reject_if_bedrock_saturated() -> None:
+    if USE_BEDROCK and bedrock_limiter.saturated():
+        raise BedrockOverloaded(
+            "Too many renders queued for Bedrock; try again shortly",
+            retry_after=bedrock_limiter.retry_after(),
+        )
+
 
 # --- S3 data lake setup ---
 
 DATA_BUCKET = os.getenv("DATA_BUCKET", "dream-film-lake-dev-sachi")
-s3_client = boto3.client("s3", region_name="us-west-2")
+# The same client (and pool) as the inference service's, built on first use.
+s3_client = aws_clients.lazy_client(
+    "s3", connections=DREAM_WAL_UPLOAD_CONCURRENCY + WARM_START_CONCURRENCY + LAKE_MANIFEST_FETCH_CONCURRENCY
+)
+
+RAW_DREAM_EVENTS_PREFIX = "raw/dream_journal_events/"
 
-# in-memory store for now
-dreams_db: Dict[str, Dream] = {}
+def _warm_start_dream_store() -> None:
+    try:
+        warm_start(dream_store, s3_client, DATA_BUCKET, RAW_DREAM_EVENTS_PREFIX)
+    except Exception as e:
+        print(f"[STORE] Warm start failed: {e}")
 
 
-def write_dream_to_s3(dream: Dream) -> None:
+def _prepare_dream_store() -> None:
+    aws_clients.warm()
+    if DREAM_STORE_WARM_START:
+        _warm_start_dream_store()
+    try:
+        # persisted entries first, then any stored dream not indexed yet
+        added = dream_search.backfill(dream_store)
+        if added:
+            print(f"[SEARCH] Indexed {added} dreams missing from the search index")
+    except Exception as e:
+        print(f"[SEARCH] Search index backfill failed: {e}")
+
+
+def dream_event_key(dream: Dream) -> str:
     created = dream.created_at
-    key = f"raw/dream_journal_events/{created:%Y/%m/%d}/{dream.id}.json"
+    return f"{RAW_DREAM_EVENTS_PREFIX}{created:%Y/%m/%d}/{dream.id}.json"
+
+
+def dream_event_body(dream: Dream) -> str:
+    return json.dumps(dream.model_dump(), default=str)
 
-    body = json.dumps(dream.model_dump(), default=str)
 
+@stage_timer("dream_event_put")
+def put_raw_event(key: str, body: str) -> None:
     s3_client.put_object(
         Bucket=DATA_BUCKET,
         Key=key,
@@ -50,11 +122,28 @@ def write_dream_to_s3(dream: Dream) -> None:
     )
 
 
+def write_dream_to_s3(dream: Dream) -> None:
+    put_raw_event(dream_event_key(dream), dream_event_body(dream))
+
+
+# Raw events go through a local write-ahead log and are uploaded in the
+# background, so POST /dreams never waits on S3.
+dream_wal = DreamEventWAL(DREAM_WAL_DIR, put_raw_event)
+
+# Read-only queries over the Parquet table the analytics materializer builds.
+lake_analytics = LakeAnalytics(s3_client, DATA_BUCKET)
+
+
 @app.get("/health")
 def health():
     return {"status": "ok"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+
 @app.post("/dreams", response_model=Dream)
 def create_dream(payload: DreamCreate):
     dream_id = str(uuid4())
@@ -63,34 +152,167 @@ def create_dream(payload: DreamCreate):
         created_at=datetime.utcnow(),
         **payload.model_dump(),
     )
-    dreams_db[dream_id] = dream
 
-    try:
-        write_dream_to_s3(dream)
-    except Exception as e:
-        print(f"Failed to write dream {dream_id} to S3: {e}")
+    # Durable locally before we acknowledge; the lake copy is written behind.
+    dream_wal.append(dream_event_key(dream), dream_event_body(dream))
+    dream_store.put(dream)
+    dream_search.add(dream)
 
     return dream
 
 
 @app.get("/dreams", response_model=list[Dream])
-def list_dreams():
-    # simple list for now
-    return list(dreams_db.values())
+def list_dreams(limit: Optional[int] = None, offset: int = 0):
+    return dream_store.list(limit=limit, offset=offset)
+
+
+# Declared before /dreams/{dream_id} so "search" isn't taken for an id.
+@app.get("/dreams/search", response_model=DreamSearchResponse)
+def search_dreams(q: Optional[str] = None, similar_to: Optional[str] = None, limit: int = 20):
+    limit = max(1, min(limit, 100))
+    if similar_to:
+        matches = dream_search.similar(similar_to, limit)
+        if matches is None:
+            raise HTTPException(status_code=404, detail="Dream not indexed")
+        total = len(matches)
+    elif q:
+        try:
+            total, matches = dream_search.search(q, limit)
+        except QueryError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    else:
+        raise HTTPException(status_code=400, detail="Pass q or similar_to")
+
+    results = []
+    for dream_id, score in matches:
+        dream = dream_store.get(dream_id)
+        if dream:
+            results.append(DreamSearchHit(dream=dream, score=score))
+    return DreamSearchResponse(query=q if not similar_to else None, similar_to=similar_to, total=total, results=results)
+
+
+@app.get("/dreams/search/stats")
+def dream_search_stats():
+    return dream_search.stats()
 
 
 @app.get("/dreams/{dream_id}", response_model=Dream)
 def get_dream(dream_id: str):
-    dream = dreams_db.get(dream_id)
+    dream = dream_store.get(dream_id)
     if not dream:
         raise HTTPException(status_code=404, detail="Dream not found")
     return dream
 
 
-@app.post("/dreams/{dream_id}/render", response_model=DreamRenderResponse)
-def render_dream(dream_id: str):
-    dream = dreams_db.get(dream_id)
+@app.get("/dreams/{dream_id}/video")
+def get_dream_video(dream_id: str):
+    dream = dream_store.get(dream_id)
+    if not dream:
+        raise HTTPException(status_code=404, detail="Dream not found")
+
+    # Replay without re-rendering: the video key is stored with the dream
+    # and the presigned URL is reused until it nears expiry.
+    video_url = get_dream_video_url(dream)
+    if not video_url:
+        raise HTTPException(status_code=404, detail="Dream has no rendered video")
+    return {"dream_id": dream_id, "video_url": video_url}
+
+
+@app.post("/dreams/{dream_id}/render", response_model=RenderJob, status_code=202)
+def render_dream(dream_id: str, response: Response):
+    dream = dream_store.get(dream_id)
     if not dream:
         raise HTTPException(status_code=404, detail="Dream not found")
 
-    return run_dream_inference(dream)
+    # Rendering can take minutes (Luma); hand it to the job pool and let the
+    # client poll for progress.
+    _reject_if_bedrock_saturated()
+    job = render_jobs.submit(dream)
+    response.headers["Location"] = f"/render-jobs/{job.id}"
+    return job
+
+
+@app.get("/dreams/{dream_id}/render/stream")
+def render_dream_stream(dream_id: str):
+    dream = dream_store.get(dream_id)
+    if not dream:
+        raise HTTPException(status_code=404, detail="Dream not found")
+
+    # Server-Sent Events: text fields arrive as Claude writes them.
+    _reject_if_bedrock_saturated()
+    return StreamingResponse(
+        render_event_stream(dream),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/render-jobs/{job_id}", response_model=RenderJob)
+def get_render_job(job_id: str):
+    job = render_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Render job not found")
+    return job
+
+
+@app.get("/render-cache/stats")
+def render_cache_stats():
+    return render_cache.stats()
+
+
+@app.get("/bedrock/limiter/stats")
+def bedrock_limiter_stats():
+    return bedrock_limiter.stats()
+
+
+@app.get("/bedrock/usage/stats")
+def bedrock_usage_stats():
+    return token_usage.stats()
+
+
+@app.get("/aws/clients/stats")
+def aws_client_stats():
+    return aws_clients.stats()
+
+
+@app.get("/dream-events/wal/stats")
+def dream_event_wal_stats():
+    return dream_wal.stats()
+
+
+# --- Analytics over the structured lake (read-only) ---
+
+def _date_param(name: str, value: Optional[str]) -> Optional[str]:
+    if value is None:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").strftime("%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be a YYYY-MM-DD date")
+
+
+def _run_lake_query(name: str, start: Optional[str], end: Optional[str]):
+    start, end = _date_param("start", start), _date_param("end", end)
+    if start and end and start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    return lake_analytics.query(name, start, end)
+
+
+@app.get("/analytics/mood-by-register")
+def analytics_mood_by_register(start: Optional[str] = None, end: Optional[str] = None):
+    return _run_lake_query("mood_by_register", start, end)
+
+
+@app.get("/analytics/wish-fulfillment")
+def analytics_wish_fulfillment(start: Optional[str] = None, end: Optional[str] = None):
+    return _run_lake_query("wish_fulfillment", start, end)
+
+
+@app.get("/analytics/video-rate")
+def analytics_video_rate(start: Optional[str] = None, end: Optional[str] = None):
+    return _run_lake_query("video_rate", start, end)
+
+
+@app.get("/analytics/stats")
+def analytics_stats():
+    return lake_analytics.stats()
@@ -0,0 +1,301 @@
+# backend/app/metrics.py
+# Prometheus metrics for the render pipeline and the HTTP API, served as
+# text exposition format at GET /metrics.
+#
+# Hand-rolled rather than prometheus_client to keep the hot path to a lock,
+# a bisect and two additions per observation. Label values come from fixed
+# stage names and route templates (never raw paths or ids), and each metric
+# caps its series at METRICS_MAX_SERIES; anything past that is folded into
+# a single "other" series, so cardinality stays bounded whatever the input.
+# Gauges that mirror state owned elsewhere (e.g. the Luma scheduler) are
+# callbacks evaluated at scrape time and cost nothing in between.
+
+import bisect
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Sequence, Tuple, TypeVar
+
+METRICS_MAX_SERIES = int(os.getenv("METRICS_MAX_SERIES", "200"))
+OVERFLOW_LABEL = "other"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; spans a presign (sub-millisecond) to a slow Luma job (minutes).
+LATENCY_BUCKETS = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0,
+)
+
+Labels = Tuple[str, ...]
+M = TypeVar("M", bound="_Metric")
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: Sequence[str], values: Labels) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), max_series: int = METRICS_MAX_SERIES):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._max_series = max_series
+        self._lock = threading.Lock()
+        self._series: Dict[Labels, Any] = {}
+
+    def _slot(self, labels: Labels) -> Labels:
+        # caller holds self._lock
+        if labels in self._series or len(self._series) < self._max_series:
+            return labels
+        return (OVERFLOW_LABEL,) * len(self.labelnames)
+
+    def samples(self) -> List[Tuple[str, Labels, float]]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, labels, value in self.samples():
+            names = self.labelnames + (("le",) if suffix == "_bucket" else ())
+            lines.append(f"{self.name}{suffix}{_label_text(names, labels)} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            slot = self._slot(labels)
+            self._series[slot] = self._series.get(slot, 0.0) + amount
+
+    def samples(self) -> List[Tuple[str, Labels, float]]:
+        with self._lock:
+            return [("", labels, value) for labels, value in sorted(self._series.items())]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            slot = self._slot(labels)
+            self._series[slot] = self._series.get(slot, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels: str) -> None:
+        with self._lock:
+            self._series[self._slot(labels)] = value
+
+    def samples(self) -> List[Tuple[str, Labels, float]]:
+        with self._lock:
+            return [("", labels, value) for labels, value in sorted(self._series.items())]
+
+
+class CallbackGauge(_Metric):
+    """Gauge read at scrape time from fn() -> {label values: value}."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str], fn: Callable[[], Dict[Labels, float]]):
+        super().__init__(name, help, labelnames)
+        self._fn = fn
+
+    def samples(self) -> List[Tuple[str, Labels, float]]:
+        try:
+            values = self._fn()
+        except Exception as e:
+            print(f"[METRICS] Gauge {self.name} failed: {e}")
+            return []
+        return [("", labels, value) for labels, value in sorted(values.items())[: self._max_series]]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+        max_series: int = METRICS_MAX_SERIES,
+    ):
+        super().__init__(name, help, labelnames, max_series)
+        self._buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str) -> None:
+        i = bisect.bisect_left(self._buckets, value)
+        with self._lock:
+            slot = self._slot(labels)
+            series = self._series.get(slot)
+            if series is None:
+                # per-bucket counts (not cumulative), then sum
+                series = self._series[slot] = [0] * (len(self._buckets) + 1) + [0.0]
+            series[i] += 1
+            series[-1] += value
+
+    def samples(self) -> List[Tuple[str, Labels, float]]:
+        with self._lock:
+            snapshot = {labels: list(series) for labels, series in self._series.items()}
+        out: List[Tuple[str, Labels, float]] = []
+        for labels, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self._buckets + (math.inf,), series):
+                cumulative += count
+                out.append(("_bucket", labels + (_format_value(bound),), cumulative))
+            out.append(("_sum", labels, series[-1]))
+            out.append(("_count", labels, cumulative))
+        return out
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: M) -> M:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(m.render() for m in metrics) + "\n"
+
+
+registry = Registry()
+
+
+# ---------- render pipeline ----------
+
+# Stage names, fixed so the stage label stays bounded:
+#   render            whole render, text stage start to video URL
+#   text_stage        Claude / stub / render-cache for one render
+#   claude            one Bedrock Claude call (including limiter wait)
+#   video_stage       Luma submit to presigned URL
+#   luma_queue        Luma job queued until start_async_invoke succeeded
+#   luma_execution    Luma job started until seen Completed / Failed
+#   s3_list           resolving Luma output folders to video keys
+#   presign           presigning a video URL (mostly cache hits)
+#   dream_event_put   raw dream event PUT to the lake
+RENDER_STAGES = (
+    "render",
+    "text_stage",
+    "claude",
+    "video_stage",
+    "luma_queue",
+    "luma_execution",
+    "s3_list",
+    "presign",
+    "dream_event_put",
+)
+
+RENDER_STAGE_SECONDS = registry.register(
+    Histogram("dream_render_stage_seconds", "Latency of each render pipeline stage.", ("stage",))
+)
+RENDER_STAGE_ERRORS = registry.register(
+    Counter("dream_render_stage_errors_total", "Failures of each render pipeline stage.", ("stage",))
+)
+RENDERS_IN_FLIGHT = registry.register(
+    Gauge("dream_renders_in_flight", "Renders started and not yet finished.")
+)
+
+
+@contextmanager
+def stage_timer(stage: str) -> Iterator[None]:
+    """Time a block as `stage`; exceptions count as stage errors and propagate."""
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        RENDER_STAGE_ERRORS.inc(stage)
+        raise
+    finally:
+        RENDER_STAGE_SECONDS.observe(time.perf_counter() - started, stage)
+
+
+def observe_stage(stage: str, seconds: float, failed: bool = False) -> None:
+    """Record a stage timed by the caller, e.g. one that ends in a callback."""
+    RENDER_STAGE_SECONDS.observe(seconds, stage)
+    if failed:
+        RENDER_STAGE_ERRORS.inc(stage)
+
+
+# ---------- HTTP ----------
+
+HTTP_REQUEST_SECONDS = registry.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "Time to the response start, by route template.",
+        ("method", "route", "status"),
+    )
+)
+HTTP_REQUESTS_IN_FLIGHT = registry.register(
+    Gauge("http_requests_in_flight", "Requests being handled.")
+)
+
+
+class HTTPMetricsMiddleware:
+    """
+    ASGI middleware timing each request up to its response start. Routes are
+    labelled by their template ("/dreams/{dream_id}"), unmatched paths as
+    "unmatched", and status by class ("2xx"), so ids never become labels.
+    """
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = [500]
+        observed = [False]
+
+        def observe() -> None:
+            if observed[0]:
+                return
+            observed[0] = True
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                f"{status[0] // 100}xx",
+            )
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                observe()
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            observe()
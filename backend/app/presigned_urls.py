@@ -0,0 +1,65 @@
+# backend/app/presigned_urls.py
+# Reuse presigned GET URLs instead of signing a new one per request.
+#
+# A presigned URL is valid for ExpiresIn seconds; handing out the same URL
+# until it gets close to expiry lets browsers and CDNs cache the video and
+# keeps repeated playback of a dream free of S3 calls entirely.
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Tuple
+
+PRESIGNED_URL_CACHE_MAX_ENTRIES = int(os.getenv("PRESIGNED_URL_CACHE_MAX_ENTRIES", "4096"))
+# Re-sign once less than this much validity is left, so a client never gets
+# a URL that expires mid-playback.
+PRESIGNED_URL_REFRESH_MARGIN_SECONDS = int(os.getenv("PRESIGNED_URL_REFRESH_MARGIN_SECONDS", "600"))
+
+# (s3_uri, expires_in) -> presigned HTTPS URL
+PresignFn = Callable[[str, int], str]
+
+
+class PresignedURLCache:
+    def __init__(
+        self,
+        presign: PresignFn,
+        expires_in: int,
+        refresh_margin: int = PRESIGNED_URL_REFRESH_MARGIN_SECONDS,
+        max_entries: int = PRESIGNED_URL_CACHE_MAX_ENTRIES,
+    ):
+        self._presign = presign
+        self._expires_in = expires_in
+        # never refresh so early that a URL is only used for a moment
+        self._refresh_margin = min(refresh_margin, expires_in // 2)
+        self._max_entries = max_entries
+
+        # s3_uri -> (expires_at monotonic, url)
+        self._urls: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "signed": 0}
+
+    def get(self, s3_uri: str) -> str:
+        now = time.monotonic()
+        with self._lock:
+            item = self._urls.get(s3_uri)
+            if item is not None and item[0] - now > self._refresh_margin:
+                self._urls.move_to_end(s3_uri)
+                self._counters["hits"] += 1
+                return item[1]
+
+        # Signing is a local computation; no need to hold the lock for it.
+        url = self._presign(s3_uri, self._expires_in)
+        with self._lock:
+            self._urls[s3_uri] = (now + self._expires_in, url)
+            self._urls.move_to_end(s3_uri)
+            while len(self._urls) > self._max_entries:
+                self._urls.popitem(last=False)
+            self._counters["signed"] += 1
+        return url
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            out = dict(self._counters)
+            out["entries"] = len(self._urls)
+        return out
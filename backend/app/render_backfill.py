@@ -0,0 +1,520 @@
+# backend/app/render_backfill.py
+# Re-render stored dreams through Bedrock batch inference.
+#
+# After a system-prompt or CLAUDE_MODEL_ID change, pushing the whole journal
+# through invoke_model one dream at a time is slow, costs on-demand prices
+# and eats the live RPM/TPM quota. This command instead:
+#
+#   1. plans a run: picks the dreams and splits them into chunks,
+#   2. writes one JSONL input file per chunk (recordId = dream id,
+#      modelInput = build_claude_request(build_model_input(dream))),
+#   3. submits chunks as model invocation jobs, a few at a time,
+#   4. ingests each finished chunk: the text goes through parse_model_text
+#      exactly like a live render and lands in the lake as a
+#      {"dream", "render"} event under raw/dream_render_events/.
+#
+# Inputs, outputs and a state.json live under batch/render_backfill/<run_id>/.
+# The state is rewritten after every step, so rerunning with the same
+# --run-id carries on where the last invocation stopped. Only the text stage
+# is re-rendered; no Luma videos are produced.
+#
+#   python -m app.render_backfill --run-id prompt-v3 --role-arn arn:aws:iam::123456789012:role/bedrock-batch
+#   python -m app.render_backfill --run-id dry --local .data/backfill    # local fake runner, no AWS
+
+import argparse
+import json
+import os
+import re
+import time
+from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from botocore.exceptions import ClientError
+
+from .aws_clients import get_client
+from .dream_search import dream_search
+from .dream_store import DreamStore, dream_store
+from .inference_service import (
+    BEDROCK_REGION,
+    CLAUDE_MODEL_ID,
+    DATA_BUCKET,
+    _local_style_and_analysis,
+    _normalize_text,
+    build_claude_request,
+    build_model_input,
+    claude_request_model_input,
+    claude_response_text,
+    parse_model_text,
+)
+from .schemas import Dream
+
+RENDER_BACKFILL_PREFIX = os.getenv("RENDER_BACKFILL_PREFIX", "batch/render_backfill/")
+RENDER_EVENTS_PREFIX = "raw/dream_render_events/"
+RENDER_BACKFILL_ROLE_ARN = os.getenv("RENDER_BACKFILL_ROLE_ARN", "")
+RENDER_BACKFILL_CHUNK_SIZE = int(os.getenv("RENDER_BACKFILL_CHUNK_SIZE", "1000"))
+RENDER_BACKFILL_MAX_JOBS = int(os.getenv("RENDER_BACKFILL_MAX_JOBS", "4"))
+RENDER_BACKFILL_POLL_SECONDS = float(os.getenv("RENDER_BACKFILL_POLL_SECONDS", "60"))
+# Bedrock rejects batch jobs with fewer records than this.
+BEDROCK_BATCH_MIN_RECORDS = 100
+
+# Bedrock job statuses
+DONE_STATUSES = ("Completed", "PartiallyCompleted")
+FAILED_STATUSES = ("Failed", "Stopped", "Expired")
+
+
+# ---------- storage: S3, or a local directory for the fake runner ----------
+
+class ObjectStorage(ABC):
+    @abstractmethod
+    def uri(self, key: str) -> str:
+        ...
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    def put(self, key: str, body: bytes, content_type: str = "application/json") -> None:
+        ...
+
+    @abstractmethod
+    def list(self, prefix: str) -> List[str]:
+        ...
+
+
+class S3Storage(ObjectStorage):
+    def __init__(self, s3_client: Any, bucket: str):
+        self._s3 = s3_client
+        self._bucket = bucket
+
+    def uri(self, key: str) -> str:
+        return f"s3://{self._bucket}/{key}"
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            return self._s3.get_object(Bucket=self._bucket, Key=key)["Body"].read()
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                return None
+            raise
+
+    def put(self, key: str, body: bytes, content_type: str = "application/json") -> None:
+        self._s3.put_object(Bucket=self._bucket, Key=key, Body=body, ContentType=content_type)
+
+    def list(self, prefix: str) -> List[str]:
+        keys: List[str] = []
+        paginator = self._s3.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self._bucket, Prefix=prefix):
+            keys.extend(obj["Key"] for obj in page.get("Contents", []))
+        return keys
+
+
+class LocalStorage(ObjectStorage):
+    def __init__(self, root: str):
+        self._root = root
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self._root, *key.split("/"))
+
+    def uri(self, key: str) -> str:
+        return self._path(key)
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, body: bytes, content_type: str = "application/json") -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(body)
+        os.replace(tmp, path)
+
+    def list(self, prefix: str) -> List[str]:
+        keys: List[str] = []
+        for dirpath, _, filenames in os.walk(self._root):
+            for name in filenames:
+                rel = os.path.relpath(os.path.join(dirpath, name), self._root).replace(os.sep, "/")
+                if rel.startswith(prefix) and not rel.endswith(".tmp"):
+                    keys.append(rel)
+        return sorted(keys)
+
+
+# ---------- runners ----------
+
+class BatchRunner(ABC):
+    @abstractmethod
+    def submit(self, job_name: str, input_key: str, output_prefix: str, model_id: str) -> str:
+        """Start a job over one JSONL input file; returns its id."""
+
+    @abstractmethod
+    def status(self, job_id: str) -> str:
+        """A Bedrock job status (InProgress, Completed, Failed, ...)."""
+
+
+class BedrockBatchRunner(BatchRunner):
+    def __init__(self, bedrock_client: Any, storage: ObjectStorage, role_arn: str):
+        self._bedrock = bedrock_client
+        self._storage = storage
+        self._role_arn = role_arn
+
+    def submit(self, job_name: str, input_key: str, output_prefix: str, model_id: str) -> str:
+        resp = self._bedrock.create_model_invocation_job(
+            jobName=job_name,
+            roleArn=self._role_arn,
+            modelId=model_id,
+            inputDataConfig={"s3InputDataConfig": {"s3Uri": self._storage.uri(input_key), "s3InputFormat": "JSONL"}},
+            outputDataConfig={"s3OutputDataConfig": {"s3Uri": self._storage.uri(output_prefix)}},
+        )
+        return resp["jobArn"]
+
+    def status(self, job_id: str) -> str:
+        return self._bedrock.get_model_invocation_job(jobIdentifier=job_id)["status"]
+
+
+def _stub_response(request: Dict[str, Any]) -> Dict[str, Any]:
+    """The local stub as a Messages response body, given the request body."""
+    text = request["messages"][0]["content"][0]["text"]
+    result = _local_style_and_analysis(claude_request_model_input(request))
+    return {
+        "type": "message",
+        "role": "assistant",
+        "content": [{"type": "text", "text": json.dumps(result)}],
+        "usage": {"input_tokens": len(text) // 4, "output_tokens": 0},
+    }
+
+
+class LocalBatchRunner(BatchRunner):
+    """
+    Fake of Bedrock batch inference for tests and dry runs: reads the JSONL
+    input and writes <output prefix><job id>/<input file>.out in the same
+    record format Bedrock produces, answering with `respond` (the local
+    stub by default). Jobs finish as soon as they are submitted.
+    """
+
+    def __init__(self, storage: ObjectStorage, respond: Callable[[Dict[str, Any]], Dict[str, Any]] = _stub_response):
+        self._storage = storage
+        self._respond = respond
+        self._jobs = 0
+
+    def submit(self, job_name: str, input_key: str, output_prefix: str, model_id: str) -> str:
+        self._jobs += 1
+        job_id = f"local-{self._jobs:05d}-{int(time.time())}"
+        lines = []
+        for line in (self._storage.get(input_key) or b"").decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            out: Dict[str, Any] = {"recordId": record["recordId"], "modelInput": record["modelInput"]}
+            try:
+                out["modelOutput"] = self._respond(record["modelInput"])
+            except Exception as e:
+                out["error"] = {"errorCode": 400, "errorMessage": str(e)}
+            lines.append(json.dumps(out))
+        name = input_key.rsplit("/", 1)[-1]
+        self._storage.put(f"{output_prefix}{job_id}/{name}.out", ("\n".join(lines) + "\n").encode("utf-8"))
+        return job_id
+
+    def status(self, job_id: str) -> str:
+        return "Completed"
+
+
+# ---------- run state ----------
+
+@dataclass
+class ChunkState:
+    name: str
+    dream_ids: List[str]
+    status: str = "planned"  # planned -> submitted -> ingested, or failed
+    job_id: Optional[str] = None
+    ingested: int = 0
+    failed_ids: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+
+
+@dataclass
+class RunState:
+    run_id: str
+    model_id: str
+    created_at: str
+    chunks: List[ChunkState] = field(default_factory=list)
+
+    @classmethod
+    def from_json(cls, body: bytes) -> "RunState":
+        data = json.loads(body)
+        return cls(
+            run_id=data["run_id"],
+            model_id=data["model_id"],
+            created_at=data["created_at"],
+            chunks=[ChunkState(**c) for c in data.get("chunks", [])],
+        )
+
+    def to_json(self) -> bytes:
+        return json.dumps(asdict(self), indent=1).encode("utf-8")
+
+    def counts(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for chunk in self.chunks:
+            counts[chunk.status] = counts.get(chunk.status, 0) + 1
+        return counts
+
+
+def render_event_key(dream: Dream, run_id: str) -> str:
+    return f"{RENDER_EVENTS_PREFIX}{dream.created_at:%Y/%m/%d}/{dream.id}/{run_id}.json"
+
+
+class RenderBackfill:
+    def __init__(
+        self,
+        store: DreamStore,
+        storage: ObjectStorage,
+        runner: BatchRunner,
+        run_id: str,
+        model_id: str = CLAUDE_MODEL_ID,
+        prefix: str = RENDER_BACKFILL_PREFIX,
+    ):
+        self._store = store
+        self._storage = storage
+        self._runner = runner
+        self._run_id = run_id
+        self._model_id = model_id
+        self._prefix = f"{prefix}{run_id}/"
+        self.state: Optional[RunState] = None
+
+    # --- planning ---
+
+    def load(self) -> Optional[RunState]:
+        body = self._storage.get(f"{self._prefix}state.json")
+        self.state = RunState.from_json(body) if body else None
+        return self.state
+
+    def save(self) -> None:
+        assert self.state is not None
+        self._storage.put(f"{self._prefix}state.json", self.state.to_json())
+
+    def plan(self, dream_ids: List[str], chunk_size: int) -> RunState:
+        self.state = RunState(
+            run_id=self._run_id,
+            model_id=self._model_id,
+            created_at=datetime.now(timezone.utc).isoformat(),
+        )
+        self._add_chunks(dream_ids, chunk_size)
+        self.save()
+        return self.state
+
+    def _add_chunks(self, dream_ids: List[str], chunk_size: int) -> None:
+        assert self.state is not None
+        start = len(self.state.chunks)
+        for i in range(0, len(dream_ids), chunk_size):
+            name = f"chunk-{start + i // chunk_size:05d}"
+            self.state.chunks.append(ChunkState(name=name, dream_ids=dream_ids[i : i + chunk_size]))
+
+    def retry_failed(self, chunk_size: int) -> int:
+        """Re-queue failed chunks, and failed records of ingested chunks as new chunks."""
+        assert self.state is not None
+        retried = 0
+        stragglers: List[str] = []
+        for chunk in self.state.chunks:
+            if chunk.status == "failed":
+                chunk.status, chunk.job_id, chunk.error = "planned", None, None
+                retried += len(chunk.dream_ids)
+            elif chunk.failed_ids:
+                stragglers.extend(chunk.failed_ids)
+                chunk.failed_ids = []
+        self._add_chunks(stragglers, chunk_size)
+        self.save()
+        return retried + len(stragglers)
+
+    # --- the loop ---
+
+    def step(self, max_jobs: int) -> bool:
+        """Submit, poll and ingest what can be; returns True while work remains."""
+        assert self.state is not None
+        active = sum(1 for c in self.state.chunks if c.status == "submitted")
+        for chunk in self.state.chunks:
+            if chunk.status == "planned" and active < max_jobs:
+                self._submit(chunk)
+                active += 1
+
+        for chunk in self.state.chunks:
+            if chunk.status != "submitted":
+                continue
+            status = self._runner.status(chunk.job_id)
+            if status in DONE_STATUSES:
+                self._ingest(chunk)
+            elif status in FAILED_STATUSES:
+                chunk.status, chunk.error = "failed", f"job {status}"
+                self.save()
+                print(f"[BACKFILL] {chunk.name}: job {chunk.job_id} {status}")
+
+        return any(c.status in ("planned", "submitted") for c in self.state.chunks)
+
+    def run(self, max_jobs: int, poll_seconds: float, wait: bool = True) -> RunState:
+        assert self.state is not None
+        while self.step(max_jobs) and wait:
+            time.sleep(poll_seconds)
+        return self.state
+
+    def _submit(self, chunk: ChunkState) -> None:
+        input_key = f"{self._prefix}input/{chunk.name}.jsonl"
+        lines = []
+        for dream_id in chunk.dream_ids:
+            dream = self._store.get(dream_id)
+            if dream is None:
+                continue
+            request = build_claude_request(build_model_input(dream))
+            lines.append(json.dumps({"recordId": dream_id, "modelInput": request}, ensure_ascii=False))
+        self._storage.put(input_key, ("\n".join(lines) + "\n").encode("utf-8"), "application/jsonl")
+
+        job_name = re.sub(r"[^a-zA-Z0-9-]+", "-", f"dream-render-{self._run_id}-{chunk.name}")[:63]
+        chunk.job_id = self._runner.submit(job_name, input_key, f"{self._prefix}output/", self._model_id)
+        chunk.status = "submitted"
+        self.save()
+        print(f"[BACKFILL] {chunk.name}: submitted {len(lines)} dreams as {chunk.job_id}")
+
+    def _output_records(self, chunk: ChunkState) -> Iterator[Dict[str, Any]]:
+        # Bedrock writes <output prefix><job id>/<input file>.out
+        job = (chunk.job_id or "").rsplit("/", 1)[-1]
+        suffix = f"/{chunk.name}.jsonl.out"
+        for key in self._storage.list(f"{self._prefix}output/{job}/"):
+            if key.endswith(suffix):
+                for line in (self._storage.get(key) or b"").decode("utf-8").splitlines():
+                    if line.strip():
+                        yield json.loads(line)
+
+    def _ingest(self, chunk: ChunkState) -> None:
+        ingested = 0
+        seen = set()
+        failed: List[str] = []
+        rendered_at = datetime.now(timezone.utc).isoformat()
+        for record in self._output_records(chunk):
+            dream_id = record.get("recordId")
+            seen.add(dream_id)
+            dream = self._store.get(dream_id) if dream_id else None
+            if dream is None:
+                continue
+            try:
+                if record.get("error"):
+                    raise RuntimeError(record["error"].get("errorMessage", "record failed"))
+                output = record["modelOutput"]
+                text = _normalize_text(dict(parse_model_text(claude_response_text(output)), usage=output.get("usage")))
+            except Exception as e:
+                print(f"[BACKFILL] {chunk.name}: dream {dream_id} failed: {e}")
+                failed.append(dream_id)
+                continue
+
+            meta, usage = text["psycho_metadata"], text["usage"]
+            event = {
+                "dream": dream.model_dump(mode="json"),
+                "render": dict(
+                    text,
+                    psycho_metadata=meta.model_dump() if meta else None,
+                    usage=usage.model_dump() if usage else None,
+                ),
+                "model_id": self._model_id,
+                "run_id": self._run_id,
+                "batch_job_id": chunk.job_id,
+                "rendered_at": rendered_at,
+            }
+            self._storage.put(render_event_key(dream, self._run_id), json.dumps(event).encode("utf-8"))
+            if meta and meta.key_signifiers:
+                dream_search.set_signifiers(dream, meta.key_signifiers)
+            ingested += 1
+
+        # records Bedrock never wrote out (e.g. a partially completed job)
+        failed.extend(d for d in chunk.dream_ids if d not in seen and self._store.get(d) is not None)
+        chunk.status, chunk.ingested, chunk.failed_ids = "ingested", ingested, failed
+        self.save()
+        print(f"[BACKFILL] {chunk.name}: ingested {ingested} renders, {len(failed)} failed")
+
+
+def select_dreams(
+    store: DreamStore,
+    dream_ids: Optional[List[str]] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    limit: Optional[int] = None,
+    page_size: int = 1000,
+) -> List[str]:
+    """Ids of the dreams to re-render, oldest first; since/until are inclusive YYYY-MM-DD."""
+    if dream_ids:
+        return [d for d in dream_ids if store.get(d) is not None]
+    selected: List[str] = []
+    offset = 0
+    while limit is None or len(selected) < limit:
+        page = store.list(limit=page_size, offset=offset)
+        if not page:
+            break
+        offset += len(page)
+        for dream in page:
+            day = dream.created_at.strftime("%Y-%m-%d")
+            if (since and day < since) or (until and day > until):
+                continue
+            selected.append(dream.id)
+    return selected[:limit] if limit is not None else selected
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Re-render stored dreams with Bedrock batch inference.")
+    parser.add_argument("--run-id", required=True, help="names the run; reuse it to resume")
+    parser.add_argument("--model-id", default=CLAUDE_MODEL_ID)
+    parser.add_argument("--role-arn", default=RENDER_BACKFILL_ROLE_ARN,
+                        help="IAM role Bedrock assumes to read inputs and write outputs")
+    parser.add_argument("--dream-id", action="append", dest="dream_ids", help="only this dream (repeatable)")
+    parser.add_argument("--since", help="first created_at day (YYYY-MM-DD)")
+    parser.add_argument("--until", help="last created_at day (YYYY-MM-DD)")
+    parser.add_argument("--limit", type=int)
+    parser.add_argument("--chunk-size", type=int, default=RENDER_BACKFILL_CHUNK_SIZE,
+                        help="dreams per batch job")
+    parser.add_argument("--max-jobs", type=int, default=RENDER_BACKFILL_MAX_JOBS,
+                        help="batch jobs in flight at once")
+    parser.add_argument("--poll-seconds", type=float, default=RENDER_BACKFILL_POLL_SECONDS)
+    parser.add_argument("--no-wait", action="store_true",
+                        help="submit what can be submitted and exit; rerun later to ingest")
+    parser.add_argument("--retry-failed", action="store_true",
+                        help="re-queue failed jobs and failed records of a resumed run")
+    parser.add_argument("--local", metavar="DIR",
+                        help="use the local fake runner with files under DIR instead of S3 + Bedrock")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    if args.local:
+        storage: ObjectStorage = LocalStorage(args.local)
+        runner: BatchRunner = LocalBatchRunner(storage)
+    else:
+        if not args.role_arn:
+            raise SystemExit("--role-arn (or RENDER_BACKFILL_ROLE_ARN) is required for Bedrock batch jobs")
+        storage = S3Storage(get_client("s3"), DATA_BUCKET)
+        runner = BedrockBatchRunner(get_client("bedrock", BEDROCK_REGION), storage, args.role_arn)
+
+    backfill = RenderBackfill(dream_store, storage, runner, args.run_id, args.model_id)
+    if backfill.load() is None:
+        dream_ids = select_dreams(dream_store, args.dream_ids, args.since, args.until, args.limit)
+        backfill.plan(dream_ids, args.chunk_size)
+        print(f"[BACKFILL] Planned {len(dream_ids)} dreams in {len(backfill.state.chunks)} chunks")
+        small = [c.name for c in backfill.state.chunks if len(c.dream_ids) < BEDROCK_BATCH_MIN_RECORDS]
+        if small and not args.local:
+            print(f"[BACKFILL] Warning: {', '.join(small)} below Bedrock's {BEDROCK_BATCH_MIN_RECORDS}-record minimum")
+    else:
+        print(f"[BACKFILL] Resuming {args.run_id}: {backfill.state.counts()}")
+        if backfill.state.model_id != args.model_id:
+            raise SystemExit(f"run {args.run_id} was planned for {backfill.state.model_id}; use a new --run-id")
+        if args.retry_failed:
+            print(f"[BACKFILL] Re-queued {backfill.retry_failed(args.chunk_size)} dreams")
+
+    state = backfill.run(args.max_jobs, args.poll_seconds, wait=not args.no_wait)
+    ingested = sum(c.ingested for c in state.chunks)
+    failed = sum(len(c.failed_ids) + (len(c.dream_ids) if c.status == "failed" else 0) for c in state.chunks)
+    print(f"[BACKFILL] {args.run_id}: {state.counts()}; {ingested} renders ingested, {failed} failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+# backend/app/render_cache.py
+# Content-addressed cache of render results.
+#
+# Two tiers: an in-process LRU (bounded by entry count and TTL) in front of a
+# persistent tier of small JSON objects under cache/renders/ in the data
+# bucket. Keys are computed by the caller from the model input and model
+# settings, so identical dreams map to the same entry.
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+RENDER_CACHE_ENABLED = os.getenv("RENDER_CACHE_ENABLED", "true").lower() == "true"
+RENDER_CACHE_PERSISTENT = os.getenv("RENDER_CACHE_PERSISTENT", "true").lower() == "true"
+RENDER_CACHE_MAX_ENTRIES = int(os.getenv("RENDER_CACHE_MAX_ENTRIES", "1024"))
+RENDER_CACHE_TTL_SECONDS = int(os.getenv("RENDER_CACHE_TTL_SECONDS", str(24 * 3600)))
+RENDER_CACHE_PREFIX = "cache/renders/"
+RENDER_CACHE_WRITERS = 2
+
+
+def stable_hash(payload: Any) -> str:
+    """sha256 of a canonical JSON encoding (sorted keys, no whitespace)."""
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class RenderCache:
+    def __init__(
+        self,
+        s3_client: Any,
+        bucket: str,
+        max_entries: int = RENDER_CACHE_MAX_ENTRIES,
+        ttl_seconds: int = RENDER_CACHE_TTL_SECONDS,
+        persistent: bool = RENDER_CACHE_PERSISTENT,
+    ):
+        self._s3 = s3_client
+        self._bucket = bucket
+        self._max_entries = max_entries
+        self._ttl_seconds = ttl_seconds
+        self._persistent = persistent
+
+        # key -> (stored_at monotonic, entry)
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._early_updates: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        # Persistent writes happen off the caller's thread; callers may be on
+        # the Luma scheduler loop.
+        self._writer = ThreadPoolExecutor(max_workers=RENDER_CACHE_WRITERS, thread_name_prefix="render-cache")
+
+        self._counters = {
+            "memory_hits": 0,
+            "persistent_hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "evictions": 0,
+            "persistent_errors": 0,
+        }
+
+    def get(self, key: str, record_stats: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Look up an entry, memory tier first. record_stats=False keeps
+        follow-up lookups within one render out of the hit/miss counters.
+        """
+        count = 1 if record_stats else 0
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None:
+                stored_at, entry = item
+                if time.monotonic() - stored_at <= self._ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self._counters["memory_hits"] += count
+                    return dict(entry)
+                del self._entries[key]
+                self._counters["evictions"] += 1
+
+        entry = self._read_persistent(key) if self._persistent else None
+        with self._lock:
+            if entry is None:
+                self._counters["misses"] += count
+                return None
+            self._counters["persistent_hits"] += count
+            self._store_locked(key, entry)
+        return dict(entry)
+
+    def put(self, key: str, entry: Dict[str, Any]) -> None:
+        entry = dict(entry, cached_at=time.time())
+        with self._lock:
+            entry.update(self._early_updates.pop(key, {}))
+            self._counters["writes"] += 1
+            self._store_locked(key, entry)
+        if self._persistent:
+            self._writer.submit(self._write_persistent, key, entry)
+
+    def update(self, key: str, **fields: Any) -> None:
+        """
+        Merge fields into an existing entry (e.g. the video once Luma
+        finishes). Never blocks on S3, so it is safe on the scheduler loop.
+
+        If the entry has not been put yet (split pipeline: the video can
+        finish before the psychoanalysis), the fields are held and merged
+        into the next put() for that key.
+        """
+        with self._lock:
+            item = self._entries.get(key)
+            entry = dict(item[1]) if item is not None else None
+            if entry is None:
+                self._early_updates.setdefault(key, {}).update(fields)
+                while len(self._early_updates) > self._max_entries:
+                    self._early_updates.pop(next(iter(self._early_updates)))
+        if entry is not None:
+            entry.update(fields)
+            self.put(key, entry)
+        elif self._persistent:
+            self._writer.submit(self._update_persistent, key, fields)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._counters)
+            out["entries"] = len(self._entries)
+        hits = out["memory_hits"] + out["persistent_hits"]
+        lookups = hits + out["misses"]
+        out["hit_rate"] = round(hits / lookups, 4) if lookups else None
+        return out
+
+    # --- internals ---
+
+    def _store_locked(self, key: str, entry: Dict[str, Any]) -> None:
+        self._entries[key] = (time.monotonic(), entry)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def _object_key(self, key: str) -> str:
+        return f"{RENDER_CACHE_PREFIX}{key}.json"
+
+    def _read_persistent(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            resp = self._s3.get_object(Bucket=self._bucket, Key=self._object_key(key))
+            return json.loads(resp["Body"].read())
+        except ClientError as e:
+            code = e.response.get("Error", {}).get("Code")
+            if code not in ("NoSuchKey", "404"):
+                self._count_persistent_error(f"get {key} failed with {code}: {e}")
+        except (BotoCoreError, ValueError) as e:
+            self._count_persistent_error(f"get {key} failed: {e}")
+        return None
+
+    def _write_persistent(self, key: str, entry: Dict[str, Any]) -> None:
+        try:
+            self._s3.put_object(
+                Bucket=self._bucket,
+                Key=self._object_key(key),
+                Body=json.dumps(entry, default=str).encode("utf-8"),
+                ContentType="application/json",
+            )
+        except (ClientError, BotoCoreError) as e:
+            self._count_persistent_error(f"put {key} failed: {e}")
+
+    def _update_persistent(self, key: str, fields: Dict[str, Any]) -> None:
+        entry = self._read_persistent(key)
+        if entry is not None:
+            entry.update(fields)
+            self._write_persistent(key, entry)
+
+    def _count_persistent_error(self, message: str) -> None:
+        print(f"[CACHE] {message}")
+        with self._lock:
+            self._counters["persistent_errors"] += 1
@@ -0,0 +1,208 @@
+# backend/app/render_jobs.py
+# Background render jobs: the render endpoint hands work to this module and
+# returns immediately; clients poll GET /render-jobs/{id} for progress.
+#
+# Job rows are kept in the dream store (SQLite by default), so a poll can be
+# answered by any `uvicorn --workers N` process, and the per-dream
+# single-flight check holds across processes. The process that started a
+# job runs it and writes each stage change through to the store.
+
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+from uuid import uuid4
+
+from .schemas import Dream, RenderJob, RenderStage
+from .dream_store import DreamStore, dream_store
+from .inference_service import start_dream_render
+
+RENDER_JOB_WORKERS = int(os.getenv("RENDER_JOB_WORKERS", "8"))
+# How long finished jobs stay queryable before they are dropped from memory.
+RENDER_JOB_TTL_SECONDS = int(os.getenv("RENDER_JOB_TTL_SECONDS", "3600"))
+# After a render for a dream completes, further render requests for the same
+# dream within this window get the finished job instead of a new render.
+RENDER_COALESCE_WINDOW_SECONDS = float(os.getenv("RENDER_COALESCE_WINDOW_SECONDS", "60"))
+# An unfinished job not updated for this long belongs to a worker that went
+# away mid-render: it reads as failed and no longer blocks new renders.
+RENDER_JOB_STALE_SECONDS = float(os.getenv("RENDER_JOB_STALE_SECONDS", "1800"))
+
+_FINISHED_STAGES = (RenderStage.DONE, RenderStage.FAILED)
+
+
+class RenderJobManager:
+    """
+    Owns the render worker pool and the jobs this process runs; every job is
+    also written through to the store, which is what get() reads.
+
+    The text stage runs on a dedicated pool so renders never occupy the
+    FastAPI request threadpool; the video stage is owned by the Luma
+    scheduler and finishes the job from a callback.
+
+    Renders are single-flight per dream: while a job for a dream is in
+    flight (or finished successfully within the coalesce window), submit()
+    hands back that job instead of starting another Claude call and Luma job.
+    """
+
+    def __init__(
+        self,
+        store: DreamStore = dream_store,
+        max_workers: int = RENDER_JOB_WORKERS,
+        ttl_seconds: int = RENDER_JOB_TTL_SECONDS,
+        coalesce_window_seconds: float = RENDER_COALESCE_WINDOW_SECONDS,
+    ):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="render-job"
+        )
+        # Store writes go through one thread, in order, so update() never
+        # blocks its caller (often the Luma scheduler loop) on SQLite.
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="render-job-store")
+        self._store = store
+        self._ttl_seconds = ttl_seconds
+        self._coalesce_window_seconds = coalesce_window_seconds
+        # jobs run by this process
+        self._jobs: Dict[str, RenderJob] = {}
+        self._finished_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._counters = {"submitted": 0, "coalesced": 0}
+
+    def submit(self, dream: Dream) -> RenderJob:
+        job, owned = self.claim(dream)
+        if owned:
+            self._executor.submit(self._run, job.id, dream)
+        return job
+
+    def claim(self, dream: Dream) -> Tuple[RenderJob, bool]:
+        """
+        The dream's shareable job and False, or a new job and True. A new
+        job is not started: the caller runs the render and reports through
+        update() / fail() (see render_stream.py), or calls submit() instead.
+        """
+        with self._lock:
+            self._evict_expired()
+
+        now = datetime.utcnow()
+        job = RenderJob(
+            id=str(uuid4()),
+            dream_id=dream.id,
+            stage=RenderStage.TEXT_MODEL,
+            created_at=now,
+            updated_at=now,
+        )
+        shared = self._store.claim_render_job(job, self._shareable)
+        with self._lock:
+            if shared is not None:
+                self._counters["coalesced"] += 1
+                return shared, False
+            self._jobs[job.id] = job
+            self._counters["submitted"] += 1
+            return job.model_copy(), True
+
+    def get(self, job_id: str) -> Optional[RenderJob]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return job.model_copy()
+        job = self._store.get_render_job(job_id)
+        if job is not None and self._is_stale(job):
+            job.stage = RenderStage.FAILED
+            job.error = "Render abandoned: the worker running it stopped"
+        return job
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            out = dict(self._counters)
+            out["in_flight"] = sum(
+                1 for job in self._jobs.values() if job.stage not in _FINISHED_STAGES
+            )
+        return out
+
+    def shutdown(self, wait: bool = False) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+        # queued job writes are cheap; let them land
+        self._writer.shutdown(wait=True)
+
+    # --- progress, from whoever runs the job ---
+
+    def update(self, job_id: str, stage: Optional[RenderStage] = None, **fields: Any) -> None:
+        """Record progress of a job this process runs."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job or job.stage in _FINISHED_STAGES:
+                return
+            if stage is not None:
+                job.stage = stage
+            for name, value in fields.items():
+                setattr(job, name, value)
+            job.updated_at = datetime.utcnow()
+            if job.stage in _FINISHED_STAGES:
+                self._finished_at[job_id] = time.monotonic()
+            snapshot = job.model_copy()
+
+        self._writer.submit(self._save, snapshot)
+
+    def fail(self, job_id: str, dream: Dream, error: BaseException) -> None:
+        print(f"[RENDER] Job {job_id} for dream {dream.id} failed: {error}")
+        self.update(job_id, RenderStage.FAILED, error=str(error) or type(error).__name__)
+
+    # --- internals ---
+
+    def _save(self, job: RenderJob) -> None:
+        try:
+            self._store.put_render_job(job)
+        except Exception as e:
+            # the job still runs and this process still serves it
+            print(f"[RENDER] Couldn't save job {job.id}: {e}")
+
+    def _run(self, job_id: str, dream: Dream) -> None:
+        # Text stage on this worker; the video stage is handed to the Luma
+        # scheduler so the worker is free again as soon as Claude returns.
+        def on_progress(stage: Optional[RenderStage], partial: Dict[str, Any]) -> None:
+            self.update(job_id, stage, **partial)
+
+        try:
+            render_future = start_dream_render(dream, on_progress=on_progress)
+        except Exception as e:
+            self.fail(job_id, dream, e)
+            return
+
+        def on_render_done(f: Future) -> None:
+            try:
+                result = f.result()
+            except BaseException as e:
+                self.fail(job_id, dream, e)
+                return
+            self.update(job_id, RenderStage.DONE, video_url=result.video_url, result=result)
+
+        render_future.add_done_callback(on_render_done)
+
+    @staticmethod
+    def _is_stale(job: RenderJob) -> bool:
+        age = (datetime.utcnow() - job.updated_at).total_seconds()
+        return job.stage not in _FINISHED_STAGES and age > RENDER_JOB_STALE_SECONDS
+
+    def _shareable(self, job: RenderJob) -> bool:
+        # the dream's latest job, read inside the store's claim transaction
+        if job.stage == RenderStage.FAILED or self._is_stale(job):
+            return False
+        if job.stage != RenderStage.DONE:
+            return True
+        age = (datetime.utcnow() - job.updated_at).total_seconds()
+        return age <= self._coalesce_window_seconds
+
+    def _evict_expired(self) -> None:
+        # caller holds self._lock
+        cutoff = time.monotonic() - self._ttl_seconds
+        expired = [jid for jid, t in self._finished_at.items() if t < cutoff]
+        for jid in expired:
+            self._finished_at.pop(jid, None)
+            self._jobs.pop(jid, None)
+        if expired:
+            # finished jobs past the TTL, and unfinished ones long stale
+            keep = max(self._ttl_seconds, RENDER_JOB_STALE_SECONDS)
+            self._store.delete_render_jobs(datetime.utcnow() - timedelta(seconds=keep))
+
+
+render_jobs = RenderJobManager()
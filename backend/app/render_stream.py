@@ -0,0 +1,159 @@
+# backend/app/render_stream.py
+# Server-Sent Events render: streams each text field as soon as Claude has
+# written it, then the video URL once Luma finishes.
+#
+# Event types:
+#   stage  {"stage": "<RenderStage>"}
+#   field  {"name": "<movie_script|psychoanalysis|style_profile|psycho_metadata>", "value": ...}
+#   video  {"video_url": "<presigned url or null>"}
+#   done   <DreamRenderResponse>
+#   error  {"detail": "..."}
+#
+# The stream takes part in the per-dream single-flight of render_jobs: if the
+# dream already has a job (from POST /render or another stream, on any
+# worker) the stream follows that job's progress. Otherwise it registers a
+# job, and in the single-call pipeline runs the render itself so fields can
+# stream as Claude writes them; the render finishes and the job is updated
+# even if the client goes away. In split mode it submits a normal job and
+# follows it.
+
+import asyncio
+import json
+import time
+from typing import Any, AsyncIterator, Dict, Optional
+
+from .metrics import RENDERS_IN_FLIGHT, observe_stage
+from .schemas import Dream, DreamRenderResponse, RenderJob, RenderStage
+from .inference_service import RENDER_PIPELINE_MODE, start_video_stage, stream_text_stage
+from .render_jobs import render_jobs
+
+SSE_KEEPALIVE_SECONDS = 15
+# How often a stream following another render's job re-reads it.
+SSE_FOLLOW_POLL_SECONDS = 0.5
+
+_JOB_FIELDS = ("movie_script", "psychoanalysis", "style_profile", "psycho_metadata")
+
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def render_event_stream(dream: Dream) -> AsyncIterator[str]:
+    loop = asyncio.get_running_loop()
+    queue: "asyncio.Queue[tuple]" = asyncio.Queue()
+
+    def emit(*item: Any) -> None:
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            pass  # the loop is gone with the client; the render carries on
+
+    if RENDER_PIPELINE_MODE == "split":
+        job, owned = await loop.run_in_executor(None, render_jobs.submit, dream), False
+    else:
+        job, owned = await loop.run_in_executor(None, render_jobs.claim, dream)
+
+    follower: Optional["asyncio.Future[None]"] = None
+    if owned:
+        loop.run_in_executor(None, _run_render, job.id, dream, emit)
+    else:
+        follower = asyncio.ensure_future(_follow(job.id, emit))
+
+    last_stage = None
+    try:
+        while True:
+            try:
+                kind, name, value = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+
+            if kind == "stage":
+                if name != last_stage:
+                    last_stage = name
+                    yield _sse("stage", {"stage": name})
+            elif kind == "field":
+                yield _sse("field", {"name": name, "value": value})
+            elif kind == "error":
+                yield _sse("error", {"detail": value})
+                return
+            else:  # done
+                yield _sse("video", {"video_url": value.video_url})
+                yield _sse("stage", {"stage": RenderStage.DONE.value})
+                yield _sse("done", value.model_dump(mode="json"))
+                return
+    finally:
+        if follower is not None:
+            follower.cancel()
+
+
+def _run_render(job_id: str, dream: Dream, emit: Any) -> None:
+    """
+    Streaming render of a job this stream owns, on a worker thread. Progress
+    goes to the job and to the stream; the video stage finishes from a Luma
+    scheduler callback.
+    """
+    RENDERS_IN_FLIGHT.inc()
+    started = time.monotonic()
+
+    def finish(response: Optional[DreamRenderResponse], error: Optional[BaseException] = None) -> None:
+        RENDERS_IN_FLIGHT.dec()
+        observe_stage("render", time.monotonic() - started, failed=response is None)
+        if response is None:
+            render_jobs.fail(job_id, dream, error)
+            emit("error", None, str(error) or type(error).__name__)
+        else:
+            render_jobs.update(job_id, RenderStage.DONE, video_url=response.video_url, result=response)
+            emit("done", None, response)
+
+    def on_stage(stage: RenderStage) -> None:
+        render_jobs.update(job_id, stage)
+        emit("stage", stage.value, None)
+
+    text: Dict[str, Any] = {}
+    emit("stage", RenderStage.TEXT_MODEL.value, None)
+    try:
+        # Bedrock's event stream is a blocking iterator, hence the thread.
+        for name, value in stream_text_stage(dream, text):
+            emit("field", name, value)
+        render_jobs.update(job_id, RenderStage.VIDEO_QUEUED, **text)
+        emit("stage", RenderStage.VIDEO_QUEUED.value, None)
+        video_future = start_video_stage(dream, text["movie_script"], text["style_profile"], on_stage=on_stage)
+    except Exception as e:
+        print(f"[RENDER] Streaming render for dream {dream.id} failed: {e}")
+        finish(None, e)
+        return
+
+    def on_video(f: Any) -> None:
+        try:
+            video_url = f.result()
+        except BaseException as e:
+            finish(None, e)
+            return
+        finish(DreamRenderResponse(dream=dream, video_url=video_url, **text))
+
+    video_future.add_done_callback(on_video)
+
+
+async def _follow(job_id: str, emit: Any) -> None:
+    """Replay a job run elsewhere (another request or worker) as stream events."""
+    loop = asyncio.get_running_loop()
+    sent = set()
+    while True:
+        job: Optional[RenderJob] = await loop.run_in_executor(None, render_jobs.get, job_id)
+        if job is None:
+            emit("error", None, "Render job not found")
+            return
+        for name in _JOB_FIELDS:
+            value = getattr(job, name)
+            if value is not None and name not in sent:
+                sent.add(name)
+                emit("field", name, value.model_dump(mode="json") if name == "psycho_metadata" else value)
+        if job.stage == RenderStage.DONE:
+            emit("done", None, job.result)
+            return
+        if job.stage == RenderStage.FAILED:
+            emit("error", None, job.error or "Render failed")
+            return
+        emit("stage", job.stage.value, None)
+        await asyncio.sleep(SSE_FOLLOW_POLL_SECONDS)
@@ -1,6 +1,7 @@
 # backend/app/schemas.py
 # schemas for Dream entries and related data structures separated from Bedrock integration logic
 from datetime import datetime
+from enum import Enum
 from typing import List, Optional, Dict, Any
 
 from pydantic import BaseModel
@@ -38,6 +39,26 @@ class Dream(DreamCreate):
     created_at: datetime
 
 
+class DreamSearchHit(BaseModel):
+    dream: Dream
+    score: float
+
+
+class DreamSearchResponse(BaseModel):
+    query: Optional[str] = None
+    similar_to: Optional[str] = None
+    total: int
+    results: List[DreamSearchHit]
+
+
+class TokenUsage(BaseModel):
+    """Claude token counts for one render (summed over both calls in split mode)."""
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_read_input_tokens: int = 0
+    cache_creation_input_tokens: int = 0
+
+
 class DreamRenderResponse(BaseModel):
     dream: Dream
     style_profile: Dict[str, Any]
@@ -45,4 +66,32 @@ class DreamRenderResponse(BaseModel):
     psychoanalysis: str
     psycho_metadata: Optional[PsychoMetadata] = None
     video_url: Optional[str] = None 
+    # None when the text came from the render cache or the local stub
+    usage: Optional[TokenUsage] = None
+
+
+class RenderStage(str, Enum):
+    TEXT_MODEL = "text_model"
+    VIDEO_QUEUED = "video_queued"
+    VIDEO_RUNNING = "video_running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class RenderJob(BaseModel):
+    id: str
+    dream_id: str
+    stage: RenderStage
+    created_at: datetime
+    updated_at: datetime
+
+    # partial results, filled in as each stage finishes
+    style_profile: Optional[Dict[str, Any]] = None
+    movie_script: Optional[str] = None
+    psychoanalysis: Optional[str] = None
+    psycho_metadata: Optional[PsychoMetadata] = None
+    video_url: Optional[str] = None
+    usage: Optional[TokenUsage] = None
 
+    result: Optional[DreamRenderResponse] = None
+    error: Optional[str] = None
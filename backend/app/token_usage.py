@@ -0,0 +1,111 @@
+# backend/app/token_usage.py
+# Token accounting for Claude calls.
+#
+# Every Messages response carries a usage block: input and output tokens,
+# plus cache read / cache write tokens once prompt caching is in play. The
+# tracker keeps the calls of the last TOKEN_USAGE_WINDOW_SECONDS per
+# (model, prompt) next to lifetime totals, and reports per-call averages,
+# output-token percentiles against the configured max_tokens, how often
+# that budget was hit, and the share of prompt tokens served from cache.
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from .schemas import TokenUsage
+
+TOKEN_USAGE_WINDOW_SECONDS = float(os.getenv("TOKEN_USAGE_WINDOW_SECONDS", "3600"))
+TOKEN_USAGE_WINDOW_MAX_CALLS = int(os.getenv("TOKEN_USAGE_WINDOW_MAX_CALLS", "10000"))
+
+USAGE_FIELDS = tuple(TokenUsage.model_fields)
+
+
+def usage_from_response(usage: Optional[Dict[str, Any]]) -> Optional[TokenUsage]:
+    """TokenUsage from a response's usage block (None if there is none)."""
+    if not usage:
+        return None
+    return TokenUsage(**{name: usage.get(name) or 0 for name in USAGE_FIELDS})
+
+
+def merge_usage(*usages: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Sum of several usage dicts (e.g. the two calls of a split render)."""
+    present = [u for u in usages if u]
+    if not present:
+        return None
+    return {name: sum(u.get(name) or 0 for u in present) for name in USAGE_FIELDS}
+
+
+def _percentile(sorted_values: list, q: float) -> int:
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+class TokenUsageTracker:
+    def __init__(
+        self,
+        window_seconds: float = TOKEN_USAGE_WINDOW_SECONDS,
+        window_max_calls: int = TOKEN_USAGE_WINDOW_MAX_CALLS,
+    ):
+        self._window_seconds = window_seconds
+        self._lock = threading.Lock()
+        # (monotonic time, (model, prompt), usage, hit max_tokens)
+        self._calls: Deque[Tuple[float, Tuple[str, str], TokenUsage, bool]] = deque(maxlen=window_max_calls)
+        self._totals: Dict[Tuple[str, str], Dict[str, int]] = {}
+        self._max_tokens: Dict[Tuple[str, str], int] = {}
+
+    def record(
+        self,
+        model_id: str,
+        prompt: str,
+        usage: TokenUsage,
+        max_tokens: int,
+        stop_reason: Optional[str] = None,
+    ) -> None:
+        key = (model_id, prompt)
+        truncated = stop_reason == "max_tokens"
+        with self._lock:
+            self._calls.append((time.monotonic(), key, usage, truncated))
+            totals = self._totals.setdefault(key, dict.fromkeys(USAGE_FIELDS + ("calls", "truncated"), 0))
+            for name in USAGE_FIELDS:
+                totals[name] += getattr(usage, name)
+            totals["calls"] += 1
+            totals["truncated"] += truncated
+            self._max_tokens[key] = max_tokens
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            cutoff = time.monotonic() - self._window_seconds
+            while self._calls and self._calls[0][0] < cutoff:
+                self._calls.popleft()
+            recent = list(self._calls)
+            totals = {key: dict(t) for key, t in self._totals.items()}
+            max_tokens = dict(self._max_tokens)
+
+        models: Dict[str, Dict[str, Any]] = {}
+        for key, total in totals.items():
+            model_id, prompt = key
+            calls = [(u, t) for _, k, u, t in recent if k == key]
+            entry: Dict[str, Any] = {"max_tokens": max_tokens[key], "total": total}
+            window: Dict[str, Any] = {"calls": len(calls)}
+            if calls:
+                sums = {name: sum(getattr(u, name) for u, _ in calls) for name in USAGE_FIELDS}
+                outputs = sorted(u.output_tokens for u, _ in calls)
+                prompt_tokens = sums["input_tokens"] + sums["cache_read_input_tokens"] + sums["cache_creation_input_tokens"]
+                window.update(sums)
+                window.update(
+                    prompt_tokens_avg=round(prompt_tokens / len(calls), 1),
+                    output_tokens_avg=round(sums["output_tokens"] / len(calls), 1),
+                    output_tokens_p50=_percentile(outputs, 0.5),
+                    output_tokens_p95=_percentile(outputs, 0.95),
+                    output_tokens_max=outputs[-1],
+                    truncated=sum(1 for _, t in calls if t),
+                    cache_hit_ratio=round(sums["cache_read_input_tokens"] / prompt_tokens, 4) if prompt_tokens else 0.0,
+                )
+            entry["window"] = window
+            models.setdefault(model_id, {})[prompt] = entry
+
+        return {"window_seconds": self._window_seconds, "models": models}
+
+
+token_usage = TokenUsageTracker()
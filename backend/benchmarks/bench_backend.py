@@ -0,0 +1,338 @@
+"""
+Load test: the API and the materializer against fake AWS.
+
+Runs the real FastAPI app (in process, over ASGI) with fake bedrock-runtime
+and S3 clients from benchmarks.fakes whose latency, throttle rate and Luma
+job duration are set from the command line, then drives:
+
+  create        POST /dreams
+  render        POST /dreams/{id}/render, polling the job until it is done
+  materialize   materialize_dreams_parquet.main() over synthetic raw events
+
+at the given concurrency, and prints p50/p95/p99 latency and throughput as
+JSON (also written to --output). With --baseline it compares against an
+earlier result file and exits 1 when p95 latency rose or throughput fell by
+more than --tolerance.
+
+    cd backend && python -m benchmarks.bench_backend --requests 200 --concurrency 16 \\
+        --claude-latency 2.0 --luma-seconds 3 --output bench.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .fakes import FakeBedrockRuntime, FakeS3, Latency
+
+ANALYTICS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "analytics")
+SCENARIOS = ("create", "render", "materialize")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS,
+                        help="scenario to run (repeatable; default: all)")
+    parser.add_argument("--requests", type=int, default=200, help="requests (or renders) per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--output", help="also write the JSON results here")
+    parser.add_argument("--baseline", help="earlier results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed relative regression before --baseline fails")
+    parser.add_argument("--seed", type=int, default=0)
+
+    fake = parser.add_argument_group("fake AWS")
+    fake.add_argument("--s3-latency", type=float, default=0.02, help="median seconds per S3 call")
+    fake.add_argument("--s3-sigma", type=float, default=0.5, help="lognormal spread of S3 latency")
+    fake.add_argument("--s3-throttle-rate", type=float, default=0.0)
+    fake.add_argument("--claude-latency", type=float, default=1.0, help="median seconds per Claude call")
+    fake.add_argument("--claude-sigma", type=float, default=0.3)
+    fake.add_argument("--claude-throttle-rate", type=float, default=0.0)
+    fake.add_argument("--luma-start-latency", type=float, default=0.1)
+    fake.add_argument("--luma-throttle-rate", type=float, default=0.0)
+    fake.add_argument("--luma-seconds", type=float, default=2.0, help="median Luma job duration")
+    fake.add_argument("--luma-sigma", type=float, default=0.2)
+    fake.add_argument("--luma-failure-rate", type=float, default=0.0)
+
+    app = parser.add_argument_group("backend settings")
+    app.add_argument("--pipeline", choices=("single", "split"), default="single")
+    app.add_argument("--render-workers", type=int, default=8)
+    app.add_argument("--luma-max-jobs", type=int, default=4)
+    app.add_argument("--rpm-limit", type=int, default=100000,
+                     help="Bedrock RPM given to the limiter (the benchmark default does not bind)")
+    app.add_argument("--tpm-limit", type=int, default=100000000)
+    app.add_argument("--poll-interval", type=float, default=0.05, help="seconds between render job polls")
+    app.add_argument("--events", type=int, default=20000, help="raw events for the materialize scenario")
+    app.add_argument("--days", type=int, default=30, help="days the raw events are spread over")
+    app.add_argument("--materialize-runs", type=int, default=3)
+    return parser.parse_args(argv)
+
+
+def configure_environment(args: argparse.Namespace, workdir: str) -> None:
+    """Backend settings are read at import, so this runs before app is imported."""
+    os.environ.update(
+        USE_BEDROCK="true",
+        USE_LUMA="true",
+        DREAM_STORE="memory",
+        DREAM_STORE_WARM_START="false",
+        DREAM_SEARCH_PATH="",
+        DREAM_WAL_DIR=os.path.join(workdir, "wal"),
+        RENDER_CACHE_PERSISTENT="false",
+        RENDER_PIPELINE_MODE=args.pipeline,
+        RENDER_JOB_WORKERS=str(args.render_workers),
+        BEDROCK_RPM_LIMIT=str(args.rpm_limit),
+        BEDROCK_TPM_LIMIT=str(args.tpm_limit),
+        LUMA_MAX_CONCURRENT_JOBS=str(args.luma_max_jobs),
+        # poll the fake jobs on their own time scale
+        LUMA_EXPECTED_DURATION_SECONDS=str(args.luma_seconds),
+        LUMA_MIN_POLL_INTERVAL=str(max(0.02, args.luma_seconds / 20)),
+        LUMA_MAX_POLL_INTERVAL=str(max(0.2, args.luma_seconds / 2)),
+        LUMA_JOB_TIMEOUT_SECONDS=str(max(60.0, args.luma_seconds * 20)),
+        AWS_DEFAULT_REGION=os.environ.get("AWS_DEFAULT_REGION", "us-west-2"),
+    )
+
+
+# ---------- results ----------
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float, unit: str = "requests") -> Dict[str, Any]:
+    values = sorted(latencies)
+    ms = lambda s: round(s * 1000, 2)  # noqa: E731
+    return {
+        unit: len(values) + errors,
+        "errors": errors,
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_per_second": round(len(values) / elapsed, 2) if elapsed > 0 else 0.0,
+        "latency_ms": {
+            "p50": ms(percentile(values, 0.50)),
+            "p95": ms(percentile(values, 0.95)),
+            "p99": ms(percentile(values, 0.99)),
+            "max": ms(values[-1]) if values else 0.0,
+            "mean": ms(sum(values) / len(values)) if values else 0.0,
+        },
+    }
+
+
+async def drive(
+    count: int,
+    concurrency: int,
+    request: Callable[[int], Awaitable[bool]],
+) -> Tuple[List[float], int, float]:
+    """Run request(i) for i in range(count), `concurrency` at a time; (latencies, errors, seconds)."""
+    latencies: List[float] = []
+    errors = 0
+    indexes = iter(range(count))
+
+    async def worker() -> None:
+        nonlocal errors
+        for i in indexes:
+            started = time.perf_counter()
+            try:
+                ok = await request(i)
+            except Exception as e:
+                print(f"[BENCH] request {i} failed: {e}")
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+
+def dream_payload(i: int) -> Dict[str, Any]:
+    # unique narratives, so renders never hit the render cache
+    return {
+        "title": f"Benchmark dream {i}",
+        "narrative": f"Dream {i}: I was late for an exam in my old school and the mirror showed someone else.",
+        "mood": i % 5 + 1,
+        "sleep_quality": (i * 7) % 5 + 1,
+    }
+
+
+# ---------- API scenarios ----------
+
+async def api_scenarios(args: argparse.Namespace, scenarios: List[str], fakes: Dict[str, Any]) -> Dict[str, Any]:
+    import httpx
+
+    from app import inference_service, main
+
+    inference_service.bedrock_client = fakes["bedrock"]
+    inference_service.s3_client = fakes["s3"]
+    inference_service.luma_scheduler._client = fakes["bedrock"]
+    main.s3_client = fakes["s3"]
+
+    results: Dict[str, Any] = {}
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            if "create" in scenarios:
+                async def create(i: int) -> bool:
+                    resp = await client.post("/dreams", json=dream_payload(i))
+                    return resp.status_code == 200
+
+                results["create"] = summarize(*await drive(args.requests, args.concurrency, create))
+
+            if "render" in scenarios:
+                dream_ids = []
+                for i in range(args.requests):
+                    resp = await client.post("/dreams", json=dream_payload(args.requests + i))
+                    dream_ids.append(resp.json()["id"])
+                submit_latencies: List[float] = []
+
+                async def render(i: int) -> bool:
+                    started = time.perf_counter()
+                    resp = await client.post(f"/dreams/{dream_ids[i]}/render")
+                    submit_latencies.append(time.perf_counter() - started)
+                    if resp.status_code != 202:
+                        return False
+                    job_url = resp.headers["Location"]
+                    while True:
+                        await asyncio.sleep(args.poll_interval)
+                        job = (await client.get(job_url)).json()
+                        if job["stage"] in ("done", "failed"):
+                            return job["stage"] == "done" and bool(job.get("video_url"))
+
+                latencies, errors, elapsed = await drive(args.requests, args.concurrency, render)
+                results["render"] = summarize(latencies, errors, elapsed, unit="renders")
+                results["render"]["submit"] = summarize(submit_latencies, 0, elapsed)
+                results["render"]["stages_ms"] = stage_means()
+    return results
+
+
+def stage_means() -> Dict[str, float]:
+    """Mean latency per render stage from the app's own /metrics histograms."""
+    from app.metrics import RENDER_STAGE_SECONDS
+
+    sums: Dict[str, float] = {}
+    counts: Dict[str, float] = {}
+    for suffix, labels, value in RENDER_STAGE_SECONDS.samples():
+        if suffix == "_sum":
+            sums[labels[0]] = value
+        elif suffix == "_count":
+            counts[labels[0]] = value
+    return {stage: round(sums[stage] / counts[stage] * 1000, 2) for stage in sorted(sums) if counts.get(stage)}
+
+
+# ---------- materializer ----------
+
+def raw_events(count: int, days: int) -> Dict[str, bytes]:
+    start = datetime(2024, 1, 1)
+    objects: Dict[str, bytes] = {}
+    for i in range(count):
+        created = start + timedelta(days=i % days, seconds=i)
+        body = dict(dream_payload(i), id=f"bench-{i:07d}", created_at=created.isoformat())
+        objects[f"raw/dream_journal_events/{created:%Y/%m/%d}/bench-{i:07d}.json"] = json.dumps(body).encode("utf-8")
+    return objects
+
+
+def materialize_scenario(args: argparse.Namespace, s3: FakeS3) -> Dict[str, Any]:
+    if ANALYTICS_DIR not in sys.path:
+        sys.path.insert(0, ANALYTICS_DIR)
+    import materialize_dreams_parquet as materializer
+
+    materializer.make_s3_client = lambda max_pool_connections: s3
+    s3.preload(materializer.BUCKET, raw_events(args.events, args.days))
+    argv = [
+        "--full-refresh",
+        "--processes", "1",
+        "--fetch-concurrency", str(args.concurrency * 4),
+    ]
+
+    latencies: List[float] = []
+    started = time.perf_counter()
+    for _ in range(args.materialize_runs):
+        run_started = time.perf_counter()
+        materializer.main(argv)
+        latencies.append(time.perf_counter() - run_started)
+    elapsed = time.perf_counter() - started
+
+    result = summarize(latencies, 0, elapsed, unit="runs")
+    result["events"] = args.events
+    result["events_per_second"] = round(args.events * len(latencies) / elapsed, 1)
+    return result
+
+
+# ---------- baseline comparison ----------
+
+def regressions(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    found = []
+    for name, result in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        p95, p95_before = result["latency_ms"]["p95"], before["latency_ms"]["p95"]
+        if p95_before and p95 > p95_before * (1 + tolerance):
+            found.append(f"{name}: p95 {p95_before} ms -> {p95} ms")
+        rate, rate_before = result["throughput_per_second"], before["throughput_per_second"]
+        if rate_before and rate < rate_before * (1 - tolerance):
+            found.append(f"{name}: throughput {rate_before}/s -> {rate}/s")
+    return found
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    scenarios = args.scenario or list(SCENARIOS)
+    workdir = tempfile.mkdtemp(prefix="dream-bench-")
+    configure_environment(args, workdir)
+
+    s3 = FakeS3(Latency(args.s3_latency, args.s3_sigma, args.s3_throttle_rate, "SlowDown"), seed=args.seed)
+    bedrock = FakeBedrockRuntime(
+        s3=s3,
+        invoke=Latency(args.claude_latency, args.claude_sigma, args.claude_throttle_rate),
+        async_start=Latency(args.luma_start_latency, 0.3, args.luma_throttle_rate),
+        job_seconds=args.luma_seconds,
+        job_sigma=args.luma_sigma,
+        job_failure_rate=args.luma_failure_rate,
+        seed=args.seed,
+    )
+
+    # the app and the materializer log every step; keep stdout for the results
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        results = {}
+        api = [s for s in scenarios if s != "materialize"]
+        if api:
+            results.update(asyncio.run(api_scenarios(args, api, {"s3": s3, "bedrock": bedrock})))
+        if "materialize" in scenarios:
+            results["materialize"] = materialize_scenario(args, s3)
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "environment": {"python": platform.python_version(), "cpus": os.cpu_count()},
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+        "scenarios": results,
+        "fake_calls": {"s3": dict(s3.calls.counts), "bedrock": dict(bedrock.calls.counts)},
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(report, json.load(f), args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if found:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
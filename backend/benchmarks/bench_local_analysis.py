@@ -0,0 +1,108 @@
+"""
+Micro-benchmark: the local stub's signifier matching, old vs new.
+
+Generates synthetic narratives (filler prose with a few signifiers, some
+pluralised, none embedded inside other words), checks that the compiled
+matcher agrees with the original substring loop on them, and reports
+narratives/s for the old loop, analyze_narrative per call, the
+analyze_narratives batch call and the whole stub. It also counts how often
+the old loop fires on words like "contestant" that the new one rejects.
+
+    cd backend && python -m benchmarks.bench_local_analysis --narratives 100000
+"""
+
+import argparse
+import random
+import time
+from typing import Callable, List, Optional
+
+from app.local_analysis import REGISTERS, NarrativeAnalysis, analyze_narrative, analyze_narratives
+
+FILLER = (
+    "i was walking through an old house with my mother and the stairs kept going down "
+    "into a dark room where the ocean came in under the door and a train passed outside "
+    "the window at night while someone called my name from far away"
+).split()
+SIGNIFIERS = [w for _, words in REGISTERS for w in words]
+# substring false positives of the original loop
+TRAPS = ["contestant", "testament", "deadline", "preface", "emailed", "voidable", "bloodhound", "schoolbag"]
+
+
+def legacy_analysis(narrative: Optional[str]) -> NarrativeAnalysis:
+    """The stub's original matcher, verbatim apart from the return type."""
+    text = (narrative or "").lower()
+    imaginary_words, symbolic_words, real_words = (list(words) for _, words in REGISTERS)
+    found_signifiers: List[str] = []
+    for w in imaginary_words + symbolic_words + real_words:
+        if w in text:
+            found_signifiers.append(w)
+    register: Optional[str] = None
+    if any(w in text for w in imaginary_words):
+        register = "imaginary"
+    if any(w in text for w in symbolic_words):
+        register = "symbolic"
+    if any(w in text for w in real_words):
+        register = "real"
+    return NarrativeAnalysis(sorted(set(found_signifiers)) or None, register)
+
+
+def synthetic_narratives(count: int, words: int, traps: bool, seed: int = 0) -> List[str]:
+    rnd = random.Random(seed)
+    narratives = []
+    for _ in range(count):
+        body = [rnd.choice(FILLER) for _ in range(words)]
+        for _ in range(rnd.randint(0, 3)):
+            word = rnd.choice(SIGNIFIERS) + rnd.choice(["", "", "s", ",", "."])
+            body.insert(rnd.randrange(len(body) + 1), word)
+        if traps and rnd.random() < 0.2:
+            body.insert(rnd.randrange(len(body) + 1), rnd.choice(TRAPS))
+        narratives.append(" ".join(body).capitalize() + ".")
+    return narratives
+
+
+def best_of(fn: Callable[[List[str]], object], narratives: List[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(narratives)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--narratives", type=int, default=50000)
+    parser.add_argument("--words", type=int, default=150, help="filler words per narrative")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    narratives = synthetic_narratives(args.narratives, args.words, traps=False)
+    legacy = [legacy_analysis(n) for n in narratives]
+    if analyze_narratives(narratives) != legacy:
+        raise SystemExit("compiled matcher differs from the substring loop on clean input")
+
+    from app.inference_service import _local_style_and_analysis, local_style_and_analysis_batch
+
+    inputs = [{"dream": {"title": None, "narrative": n}, "context": {}} for n in narratives]
+    runs = [
+        ("substring loop", lambda ns: [legacy_analysis(n) for n in ns]),
+        ("analyze_narrative", lambda ns: [analyze_narrative(n) for n in ns]),
+        ("analyze_narratives", analyze_narratives),
+        ("stub per call", lambda _: [_local_style_and_analysis(m) for m in inputs]),
+        ("stub batch", lambda _: local_style_and_analysis_batch(inputs)),
+    ]
+    mb = sum(len(n) for n in narratives) / 1e6
+    print(f"{args.narratives} narratives, {mb:.1f} MB, best of {args.repeat}")
+    baseline = None
+    for name, fn in runs:
+        seconds = best_of(fn, narratives, args.repeat)
+        baseline = baseline or seconds
+        print(f"{name:<20}{args.narratives / seconds:>12,.0f} narratives/s  ({seconds:.3f}s, {baseline / seconds:.2f}x)")
+
+    trapped = synthetic_narratives(args.narratives, args.words, traps=True, seed=1)
+    differ = sum(legacy_analysis(n) != analyze_narrative(n) for n in trapped)
+    print(f"with embedded words: substring loop and compiled matcher disagree on {differ} narratives")
+
+
+if __name__ == "__main__":
+    main()
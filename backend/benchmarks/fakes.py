@@ -0,0 +1,448 @@
+"""
+In-memory stand-ins for the boto3 clients the backend and the materializer
+use, with injected latency, throttling and (for Luma) job durations, so the
+benchmarks can exercise the real code paths without AWS.
+
+Latency per call is `mean * lognormvariate(0, sigma)`: a median of `mean`
+and a right tail that grows with `sigma`, which is roughly what S3 and
+Bedrock look like from a client. Throttled calls raise the same
+ClientError codes the real services use, after paying the latency.
+"""
+
+import io
+import itertools
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
+from urllib.parse import urlparse
+
+from botocore.exceptions import ClientError
+
+
+@dataclass
+class Latency:
+    mean: float = 0.0
+    sigma: float = 0.0
+    throttle_rate: float = 0.0
+    throttle_code: str = "ThrottlingException"
+
+    def pause(self, rnd: random.Random, operation: str) -> None:
+        """Sleep for one call's latency, then maybe throttle it."""
+        if self.mean > 0:
+            time.sleep(self.mean * (rnd.lognormvariate(0.0, self.sigma) if self.sigma else 1.0))
+        if self.throttle_rate and rnd.random() < self.throttle_rate:
+            raise ClientError({"Error": {"Code": self.throttle_code, "Message": "Rate exceeded"}}, operation)
+
+
+class _Calls:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.counts: Dict[str, int] = {}
+
+    def add(self, operation: str) -> None:
+        with self._lock:
+            self.counts[operation] = self.counts.get(operation, 0) + 1
+
+
+# ---------- S3 ----------
+
+class _Paginator:
+    def __init__(self, s3: "FakeS3"):
+        self._s3 = s3
+
+    def paginate(self, **kwargs: Any) -> Iterator[Dict[str, Any]]:
+        kwargs.pop("PaginationConfig", None)
+        while True:
+            page = self._s3.list_objects_v2(**kwargs)
+            yield page
+            if not page.get("IsTruncated"):
+                return
+            kwargs["ContinuationToken"] = page["NextContinuationToken"]
+
+
+class FakeS3:
+    """Single-bucket-agnostic object store keyed by (bucket, key)."""
+
+    def __init__(self, latency: Optional[Latency] = None, seed: int = 0):
+        self.latency = latency or Latency(throttle_code="SlowDown")
+        self.calls = _Calls()
+        self._rnd = random.Random(seed)
+        self._lock = threading.Lock()
+        self._objects: Dict[tuple, bytes] = {}
+        self._etags = itertools.count(1)
+        self._meta: Dict[tuple, Dict[str, Any]] = {}
+        self._uploads: Dict[str, Dict[int, bytes]] = {}
+
+    def _call(self, operation: str) -> None:
+        self.calls.add(operation)
+        with self._lock:
+            rnd = random.Random(self._rnd.random())
+        self.latency.pause(rnd, operation)
+
+    def _store(self, bucket: str, key: str, body: bytes) -> None:
+        with self._lock:
+            self._store_locked(bucket, key, body)
+
+    def _store_locked(self, bucket: str, key: str, body: bytes) -> None:
+        self._objects[(bucket, key)] = body
+        self._meta[(bucket, key)] = {
+            "ETag": f'"{next(self._etags):032x}"',
+            "LastModified": datetime.now(timezone.utc),
+        }
+
+    def preload(self, bucket: str, objects: Dict[str, bytes]) -> None:
+        """Add objects without paying any latency."""
+        for key, body in objects.items():
+            self._store(bucket, key, body)
+
+    def keys(self, bucket: str, prefix: str = "") -> List[str]:
+        with self._lock:
+            return sorted(k for b, k in self._objects if b == bucket and k.startswith(prefix))
+
+    # --- objects ---
+
+    def put_object(self, Bucket: str, Key: str, Body: Any = b"", **kwargs: Any) -> Dict[str, Any]:
+        self._call("PutObject")
+        if hasattr(Body, "read"):
+            Body = Body.read()
+        if isinstance(Body, str):
+            Body = Body.encode("utf-8")
+        with self._lock:
+            # conditional writes (If-Match / If-None-Match: *), as S3 checks them
+            meta = self._meta.get((Bucket, Key))
+            if_match, if_none_match = kwargs.get("IfMatch"), kwargs.get("IfNoneMatch")
+            if (if_match is not None and (meta is None or meta["ETag"] != if_match)) or (
+                if_none_match == "*" and meta is not None
+            ):
+                raise ClientError({"Error": {"Code": "PreconditionFailed", "Message": Key}}, "PutObject")
+            self._store_locked(Bucket, Key, bytes(Body))
+            return {"ETag": self._meta[(Bucket, Key)]["ETag"]}
+
+    def get_object(self, Bucket: str, Key: str, **kwargs: Any) -> Dict[str, Any]:
+        self._call("GetObject")
+        with self._lock:
+            body = self._objects.get((Bucket, Key))
+            meta = self._meta.get((Bucket, Key))
+        if body is None:
+            raise ClientError({"Error": {"Code": "NoSuchKey", "Message": Key}}, "GetObject")
+        return {"Body": io.BytesIO(body), "ContentLength": len(body), **meta}
+
+    def head_object(self, Bucket: str, Key: str, **kwargs: Any) -> Dict[str, Any]:
+        self._call("HeadObject")
+        with self._lock:
+            body = self._objects.get((Bucket, Key))
+            meta = self._meta.get((Bucket, Key))
+        if body is None:
+            raise ClientError({"Error": {"Code": "404", "Message": "Not Found"}}, "HeadObject")
+        return {"ContentLength": len(body), **meta}
+
+    def delete_object(self, Bucket: str, Key: str, **kwargs: Any) -> Dict[str, Any]:
+        self._call("DeleteObject")
+        with self._lock:
+            self._objects.pop((Bucket, Key), None)
+            self._meta.pop((Bucket, Key), None)
+        return {}
+
+    def delete_objects(self, Bucket: str, Delete: Dict[str, Any], **kwargs: Any) -> Dict[str, Any]:
+        self._call("DeleteObjects")
+        with self._lock:
+            for obj in Delete.get("Objects", []):
+                self._objects.pop((Bucket, obj["Key"]), None)
+                self._meta.pop((Bucket, obj["Key"]), None)
+        return {}
+
+    def upload_file(self, Filename: str, Bucket: str, Key: str, **kwargs: Any) -> None:
+        self._call("PutObject")
+        with open(Filename, "rb") as f:
+            self._store(Bucket, Key, f.read())
+
+    def generate_presigned_url(self, ClientMethod: str, Params: Dict[str, Any], ExpiresIn: int = 3600) -> str:
+        # local signature computation in boto3 too: no latency
+        return f"https://{Params['Bucket']}.s3.fake/{Params['Key']}?X-Amz-Expires={ExpiresIn}"
+
+    # --- listing ---
+
+    def list_objects_v2(
+        self,
+        Bucket: str,
+        Prefix: str = "",
+        Delimiter: Optional[str] = None,
+        StartAfter: Optional[str] = None,
+        ContinuationToken: Optional[str] = None,
+        MaxKeys: int = 1000,
+        **kwargs: Any,
+    ) -> Dict[str, Any]:
+        self._call("ListObjectsV2")
+        after = ContinuationToken or StartAfter or ""
+        contents: List[Dict[str, Any]] = []
+        prefixes: List[str] = []
+        last = None
+        truncated = False
+        with self._lock:
+            keys = sorted(k for b, k in self._objects if b == Bucket and k.startswith(Prefix) and k > after)
+            for key in keys:
+                if Delimiter:
+                    cut = key.find(Delimiter, len(Prefix))
+                    if cut != -1:
+                        common = key[: cut + len(Delimiter)]
+                        if prefixes and prefixes[-1] == common:
+                            continue
+                        if len(contents) + len(prefixes) >= MaxKeys:
+                            truncated = True
+                            break
+                        prefixes.append(common)
+                        # the next page resumes after everything under it
+                        last = common + "\U0010ffff"
+                        continue
+                if len(contents) + len(prefixes) >= MaxKeys:
+                    truncated = True
+                    break
+                meta = self._meta[(Bucket, key)]
+                contents.append({"Key": key, "Size": len(self._objects[(Bucket, key)]), **meta})
+                last = key
+        page: Dict[str, Any] = {"IsTruncated": truncated, "KeyCount": len(contents) + len(prefixes)}
+        if contents:
+            page["Contents"] = contents
+        if prefixes:
+            page["CommonPrefixes"] = [{"Prefix": p} for p in prefixes]
+        if truncated:
+            page["NextContinuationToken"] = last
+        return page
+
+    def get_paginator(self, operation: str) -> _Paginator:
+        assert operation == "list_objects_v2", operation
+        return _Paginator(self)
+
+    # --- multipart ---
+
+    def create_multipart_upload(self, Bucket: str, Key: str, **kwargs: Any) -> Dict[str, Any]:
+        self._call("CreateMultipartUpload")
+        upload_id = f"upload-{next(self._etags)}"
+        with self._lock:
+            self._uploads[upload_id] = {}
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket: str, Key: str, UploadId: str, PartNumber: int, Body: Any, **kwargs: Any) -> Dict[str, Any]:
+        self._call("UploadPart")
+        with self._lock:
+            self._uploads[UploadId][PartNumber] = bytes(Body)
+        return {"ETag": f'"part-{PartNumber}"'}
+
+    def complete_multipart_upload(
+        self, Bucket: str, Key: str, UploadId: str, MultipartUpload: Dict[str, Any], **kwargs: Any
+    ) -> Dict[str, Any]:
+        self._call("CompleteMultipartUpload")
+        with self._lock:
+            parts = self._uploads.pop(UploadId)
+        self._store(Bucket, Key, b"".join(parts[p["PartNumber"]] for p in MultipartUpload["Parts"]))
+        return {}
+
+    def abort_multipart_upload(self, Bucket: str, Key: str, UploadId: str, **kwargs: Any) -> Dict[str, Any]:
+        self._call("AbortMultipartUpload")
+        with self._lock:
+            self._uploads.pop(UploadId, None)
+        return {}
+
+
+# ---------- bedrock-runtime ----------
+
+# A render-sized answer: about 400 output tokens of JSON.
+CANNED_RENDER = {
+    "movie_script": (
+        "A long corridor of lockers dissolves into a flooded lecture hall; the dreamer "
+        "wades toward an exam paper that keeps rewriting itself while a mirror at the "
+        "front of the room shows a stranger wearing their coat. "
+    ) * 4,
+    "psychoanalysis": (
+        "The exam stages the demand of the Other; the mirror returns an image the "
+        "subject cannot quite assume. "
+    ) * 6,
+    "style_profile": {
+        "colorPalette": ["deep purple", "tarnished gold", "sodium orange"],
+        "cameraStyle": "slow dolly, shallow focus",
+        "mediaInfluence": ["Lynch", "Tarkovsky"],
+    },
+    "psycho_metadata": {
+        "day_residues": ["deadline"],
+        "wish_fulfillment_type": "anxiety",
+        "key_signifiers": ["exam", "mirror"],
+        "subject_position": "examinee",
+        "register_feel": "symbolic",
+    },
+}
+
+
+@dataclass
+class _AsyncJob:
+    arn: str
+    model_id: str
+    output_uri: str
+    submitted: datetime
+    done_at: float
+    fails: bool
+    written: bool = False
+
+
+class FakeBedrockRuntime:
+    """
+    invoke_model / invoke_model_with_response_stream answer with CANNED_RENDER
+    (or `respond(request_body)`), streaming it in `stream_chunks` pieces.
+    Async (Luma) jobs finish after `job_seconds * lognormvariate(0, job_sigma)`
+    and then write output.mp4 under their output URI into `s3`.
+    """
+
+    def __init__(
+        self,
+        s3: Optional[FakeS3] = None,
+        invoke: Optional[Latency] = None,
+        async_start: Optional[Latency] = None,
+        job_seconds: float = 1.0,
+        job_sigma: float = 0.0,
+        job_failure_rate: float = 0.0,
+        stream_chunks: int = 40,
+        respond: Any = None,
+        seed: int = 0,
+    ):
+        self.s3 = s3
+        self.invoke = invoke or Latency()
+        self.async_start = async_start or Latency()
+        self.job_seconds = job_seconds
+        self.job_sigma = job_sigma
+        self.job_failure_rate = job_failure_rate
+        self.stream_chunks = stream_chunks
+        self.respond = respond
+        self.calls = _Calls()
+        self._rnd = random.Random(seed)
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, _AsyncJob] = {}
+        self._ids = itertools.count(1)
+
+    def _rng(self) -> random.Random:
+        with self._lock:
+            return random.Random(self._rnd.random())
+
+    def _answer(self, body: Any) -> Dict[str, Any]:
+        request = json.loads(body)
+        result = self.respond(request) if self.respond else CANNED_RENDER
+        text = json.dumps(result)
+        prompt = sum(len(b["text"]) for b in request.get("system", [])) + len(json.dumps(request["messages"]))
+        return {
+            "type": "message",
+            "role": "assistant",
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn",
+            "usage": {"input_tokens": prompt // 4, "output_tokens": len(text) // 4},
+        }
+
+    # --- Claude ---
+
+    def invoke_model(self, modelId: str, body: Any, **kwargs: Any) -> Dict[str, Any]:
+        self.calls.add("InvokeModel")
+        self.invoke.pause(self._rng(), "InvokeModel")
+        return {"body": io.BytesIO(json.dumps(self._answer(body)).encode("utf-8"))}
+
+    def invoke_model_with_response_stream(self, modelId: str, body: Any, **kwargs: Any) -> Dict[str, Any]:
+        self.calls.add("InvokeModelWithResponseStream")
+        rnd = self._rng()
+        # time to first byte is a share of the call; the rest is spread over the chunks
+        total = self.invoke.mean * (rnd.lognormvariate(0.0, self.invoke.sigma) if self.invoke.sigma else 1.0)
+        Latency(total * 0.2, 0.0, self.invoke.throttle_rate, self.invoke.throttle_code).pause(
+            rnd, "InvokeModelWithResponseStream"
+        )
+        answer = self._answer(body)
+        text = answer["content"][0]["text"]
+        step = max(1, len(text) // self.stream_chunks)
+        per_chunk = total * 0.8 / max(1, len(text) // step)
+
+        def events() -> Iterator[Dict[str, Any]]:
+            def event(payload: Dict[str, Any]) -> Dict[str, Any]:
+                return {"chunk": {"bytes": json.dumps(payload).encode("utf-8")}}
+
+            yield event({"type": "message_start", "message": {"usage": {**answer["usage"], "output_tokens": 1}}})
+            for i in range(0, len(text), step):
+                if per_chunk:
+                    time.sleep(per_chunk)
+                yield event({"type": "content_block_delta", "delta": {"type": "text_delta", "text": text[i : i + step]}})
+            yield event({
+                "type": "message_delta",
+                "delta": {"stop_reason": "end_turn"},
+                "usage": {"output_tokens": answer["usage"]["output_tokens"]},
+            })
+
+        return {"body": events()}
+
+    # --- Luma (async invoke) ---
+
+    def start_async_invoke(self, modelId: str, modelInput: Dict[str, Any], outputDataConfig: Dict[str, Any], **kwargs: Any) -> Dict[str, Any]:
+        self.calls.add("StartAsyncInvoke")
+        rnd = self._rng()
+        self.async_start.pause(rnd, "StartAsyncInvoke")
+        duration = self.job_seconds * (rnd.lognormvariate(0.0, self.job_sigma) if self.job_sigma else 1.0)
+        job_id = f"{next(self._ids):012x}"
+        arn = f"arn:aws:bedrock:us-west-2:000000000000:async-invoke/{job_id}"
+        base = outputDataConfig["s3OutputDataConfig"]["s3Uri"].rstrip("/")
+        job = _AsyncJob(
+            arn=arn,
+            model_id=modelId,
+            output_uri=f"{base}/{job_id}",
+            submitted=datetime.now(timezone.utc),
+            done_at=time.monotonic() + duration,
+            fails=rnd.random() < self.job_failure_rate,
+        )
+        with self._lock:
+            self._jobs[arn] = job
+        return {"invocationArn": arn}
+
+    def _summary(self, job: _AsyncJob) -> Dict[str, Any]:
+        done = time.monotonic() >= job.done_at
+        if done and not job.fails and not job.written:
+            job.written = True
+            if self.s3 is not None:
+                parsed = urlparse(job.output_uri)
+                self.s3.preload(parsed.netloc, {f"{parsed.path.lstrip('/')}/output.mp4": b"\x00" * 64})
+        status = "InProgress" if not done else ("Failed" if job.fails else "Completed")
+        summary: Dict[str, Any] = {
+            "invocationArn": job.arn,
+            "modelArn": job.model_id,
+            "status": status,
+            "submitTime": job.submitted,
+            "outputDataConfig": {"s3OutputDataConfig": {"s3Uri": job.output_uri}},
+        }
+        if job.fails and done:
+            summary["failureMessage"] = "injected failure"
+        return summary
+
+    def get_async_invoke(self, invocationArn: str, **kwargs: Any) -> Dict[str, Any]:
+        self.calls.add("GetAsyncInvoke")
+        self._status_pause()
+        with self._lock:
+            job = self._jobs.get(invocationArn)
+            if job is None:
+                raise ClientError({"Error": {"Code": "ResourceNotFoundException"}}, "GetAsyncInvoke")
+            return self._summary(job)
+
+    def list_async_invokes(
+        self,
+        submitTimeAfter: Optional[datetime] = None,
+        maxResults: int = 1000,
+        nextToken: Optional[str] = None,
+        **kwargs: Any,
+    ) -> Dict[str, Any]:
+        self.calls.add("ListAsyncInvokes")
+        self._status_pause()
+        with self._lock:
+            jobs = [j for j in self._jobs.values() if submitTimeAfter is None or j.submitted > submitTimeAfter]
+            start = int(nextToken or 0)
+            page = [self._summary(j) for j in jobs[start : start + maxResults]]
+        resp: Dict[str, Any] = {"asyncInvokeSummaries": page}
+        if start + maxResults < len(jobs):
+            resp["nextToken"] = str(start + maxResults)
+        return resp
+
+    def _status_pause(self) -> None:
+        # status reads cost a control-plane round trip but are never throttled here
+        Latency(self.async_start.mean, self.async_start.sigma).pause(self._rng(), "GetAsyncInvoke")
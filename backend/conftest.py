@@ -0,0 +1,4 @@
+# Tests import the API as `app` and the load-test fakes as `benchmarks`, the
+# way uvicorn and `python -m benchmarks...` see them from backend/. pytest
+# puts this directory on sys.path because it holds a conftest, so
+# `python -m pytest backend/tests` works from the repo root as well.
@@ -0,0 +1,158 @@
+import threading
+import time
+
+import pytest
+from botocore.exceptions import ClientError
+
+from app import bedrock_limiter as limiter_module
+from app.bedrock_limiter import AdaptiveLimiter, BedrockOverloaded, TokenBucket
+
+
+def _limiter(**kwargs) -> AdaptiveLimiter:
+    options = dict(rpm=60000, tpm=10_000_000, max_concurrency=10, queue_max=8, queue_timeout=5.0, max_retries=2)
+    options.update(kwargs)
+    return AdaptiveLimiter(**options)
+
+
+def _throttle() -> ClientError:
+    return ClientError({"Error": {"Code": "ThrottlingException", "Message": "slow down"}}, "InvokeModel")
+
+
+def _raise(error: BaseException):
+    def fn():
+        raise error
+    return fn
+
+
+def _exit_with(hold, error: BaseException) -> None:
+    # leave a hold() block by raising `error` inside it
+    assert hold.__exit__(type(error), error, None) is False
+
+
+def _wait_for(predicate, timeout: float = 2.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.005)
+
+
+def test_token_bucket_waits_for_refill_and_adjusts():
+    bucket = TokenBucket(60)  # one token per second
+    now = bucket.updated
+    assert bucket.wait_time(60, now) == 0.0
+    bucket.take(60)
+    assert bucket.wait_time(1, now) == pytest.approx(1.0)
+    bucket.adjust(30)  # over-charged estimate given back
+    assert bucket.wait_time(30, now) == 0.0
+    bucket.adjust(1000)
+    assert bucket.tokens == bucket.capacity
+
+
+def test_throttles_from_one_window_decrease_the_limit_once():
+    limiter = _limiter()
+    holds = [limiter.hold(lambda: None, 1) for _ in range(3)]
+    for hold in holds:
+        hold.__enter__()
+    for hold in holds:
+        _exit_with(hold, _throttle())
+    assert limiter.stats()["concurrency_limit"] == pytest.approx(7.0)
+    assert limiter.stats()["throttles"] == 3
+
+    # a call admitted after the decrease is a new signal
+    hold = limiter.hold(lambda: None, 1)
+    hold.__enter__()
+    _exit_with(hold, _throttle())
+    assert limiter.stats()["concurrency_limit"] == pytest.approx(4.9)
+
+
+def test_other_errors_leave_the_limit_alone():
+    limiter = _limiter()
+    hold = limiter.hold(lambda: None, 1)
+    hold.__enter__()
+    _exit_with(hold, _throttle())
+    limit = limiter.stats()["concurrency_limit"]
+
+    for _ in range(5):
+        with pytest.raises(ValueError):
+            limiter.call(_raise(ValueError("bad request")), 1)
+        with pytest.raises(KeyError):
+            with limiter.hold(lambda: None, 1):
+                raise KeyError("stream broke")
+    assert limiter.stats()["concurrency_limit"] == limit
+    assert limiter.stats()["in_flight"] == 0
+
+    limiter.call(lambda: None, 1)
+    assert limiter.stats()["concurrency_limit"] > limit
+
+
+def test_throttled_call_is_retried(monkeypatch):
+    monkeypatch.setattr(limiter_module, "BEDROCK_BACKOFF_BASE_SECONDS", 0.001)
+    limiter = _limiter()
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 2:
+            raise _throttle()
+        return "ok"
+
+    assert limiter.call(flaky, 1) == "ok"
+    assert limiter.stats()["retries"] == 1
+
+
+def test_full_queue_is_rejected_right_away():
+    limiter = _limiter(max_concurrency=1, queue_max=1)
+    waited_out = []
+
+    def wait_for_slot():
+        try:
+            limiter.call(lambda: None, 1, timeout=0.5)
+        except BedrockOverloaded as e:
+            waited_out.append(e)
+
+    with limiter.hold(lambda: None, 1):
+        waiter = threading.Thread(target=wait_for_slot)
+        waiter.start()
+        _wait_for(lambda: limiter.stats()["queue_depth"] == 1)
+        assert limiter.saturated()
+        started = time.monotonic()
+        with pytest.raises(BedrockOverloaded, match="queue is full") as rejected:
+            limiter.call(lambda: None, 1)
+        assert time.monotonic() - started < 0.2
+        assert rejected.value.retry_after >= 1.0
+        waiter.join()
+    assert len(waited_out) == 1
+    assert limiter.stats()["rejected_queue_full"] == 1
+    assert limiter.stats()["rejected_deadline"] == 1
+
+
+def test_deadline_passes_while_waiting_for_a_slot():
+    limiter = _limiter(max_concurrency=1)
+    with limiter.hold(lambda: None, 1):
+        with pytest.raises(BedrockOverloaded, match="Timed out"):
+            limiter.call(lambda: None, 1, timeout=0.05)
+
+
+def test_hold_keeps_the_slot_until_the_block_exits():
+    limiter = _limiter(max_concurrency=1)
+    with limiter.hold(lambda: "stream", 1) as response:
+        assert response == "stream"
+        assert limiter.stats()["in_flight"] == 1
+        with pytest.raises(BedrockOverloaded):
+            limiter.call(lambda: None, 1, timeout=0.05)
+    assert limiter.stats()["in_flight"] == 0
+    assert limiter.call(lambda: "next", 1, timeout=0.05) == "next"
+
+
+def test_hold_releases_when_a_generator_using_it_is_closed():
+    limiter = _limiter(max_concurrency=1)
+
+    def stream():
+        with limiter.hold(lambda: iter(range(10)), 1) as events:
+            yield from events
+
+    events = stream()
+    assert next(events) == 0
+    assert limiter.stats()["in_flight"] == 1
+    events.close()
+    assert limiter.stats()["in_flight"] == 0
@@ -0,0 +1,133 @@
+import fcntl
+import json
+import os
+import threading
+import time
+
+from app.dream_event_wal import DreamEventWAL
+
+
+class RecordingPut:
+    def __init__(self, fail: bool = False, delay: float = 0.0):
+        self.fail = fail
+        self.delay = delay
+        self.uploaded = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, key: str, body: str) -> None:
+        if self.delay:
+            time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("S3 is down")
+        with self._lock:
+            self.uploaded[key] = body
+
+
+def _write_segment(directory, segment, entries, acked=(), torn_tail=False):
+    os.makedirs(directory, exist_ok=True)
+    name = os.path.join(directory, f"segment-{segment:08d}")
+    with open(name + ".log", "w", encoding="utf-8") as f:
+        for entry_id, key in entries:
+            f.write(json.dumps({"id": entry_id, "key": key, "body": f"body of {key}"}) + "\n")
+        if torn_tail:
+            f.write('{"id": "torn", "key": "raw/tor')
+    if acked:
+        with open(name + ".ack", "w", encoding="utf-8") as f:
+            f.write("".join(a + "\n" for a in acked))
+
+
+def _wal(directory, put):
+    return DreamEventWAL(str(directory), put, concurrency=2, fsync=False)
+
+
+def test_crash_replay_uploads_only_unacked_entries(tmp_path):
+    dead = tmp_path / "4242-deadbeef"
+    entries = [("a", "raw/a.json"), ("b", "raw/b.json"), ("c", "raw/c.json")]
+    _write_segment(dead, 1, entries, acked=["a"], torn_tail=True)
+    _write_segment(dead, 2, [("d", "raw/d.json")], acked=["d"])  # fully acked
+    (dead / ".lock").touch()
+
+    put = RecordingPut()
+    wal = _wal(tmp_path, put)
+    wal.start()
+    assert wal.flush(5)
+    assert put.uploaded == {"raw/b.json": "body of raw/b.json", "raw/c.json": "body of raw/c.json"}
+    assert wal.stats()["replayed"] == 2
+    assert not dead.exists()
+    wal.close()
+
+
+def test_legacy_segments_in_the_base_directory_are_replayed(tmp_path):
+    _write_segment(tmp_path, 7, [("a", "raw/a.json")])
+
+    put = RecordingPut()
+    wal = _wal(tmp_path, put)
+    wal.start()
+    assert wal.flush(5)
+    assert list(put.uploaded) == ["raw/a.json"]
+    assert not (tmp_path / "segment-00000007.log").exists()
+    wal.close()
+
+
+def test_live_process_directory_is_left_alone(tmp_path):
+    live = tmp_path / "1111-cafebabe"
+    _write_segment(live, 1, [("a", "raw/live.json")])
+    lock = os.open(str(live / ".lock"), os.O_RDWR | os.O_CREAT)
+    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    dead = tmp_path / "2222-deadbeef"
+    _write_segment(dead, 1, [("b", "raw/dead.json")])
+    (dead / ".lock").touch()
+
+    try:
+        put = RecordingPut()
+        wal = _wal(tmp_path, put)
+        wal.start()
+        assert wal.flush(5)
+        assert list(put.uploaded) == ["raw/dead.json"]
+        assert (live / "segment-00000001.log").exists()
+        assert not dead.exists()
+        wal.close()
+    finally:
+        os.close(lock)
+
+
+def test_orphan_is_adopted_by_exactly_one_process(tmp_path):
+    dead = tmp_path / "3333-deadbeef"
+    _write_segment(dead, 1, [("a", "raw/a.json")])
+
+    first, second = RecordingPut(), RecordingPut()
+    wal_a, wal_b = _wal(tmp_path, first), _wal(tmp_path, second)
+    wal_a.start()
+    wal_b.start()
+    assert wal_a.flush(5) and wal_b.flush(5)
+    assert list(first.uploaded) + list(second.uploaded) == ["raw/a.json"]
+    wal_a.close()
+    wal_b.close()
+
+
+def test_close_flushes_and_removes_the_drained_log(tmp_path):
+    put = RecordingPut(delay=0.05)
+    wal = _wal(tmp_path, put)
+    for i in range(10):
+        wal.append(f"raw/{i}.json", f"body {i}")
+    own = wal._dir
+    wal.close(timeout=5)
+    assert len(put.uploaded) == 10
+    assert not os.path.exists(own)
+
+
+def test_close_keeps_unflushed_entries_for_the_next_start(tmp_path):
+    failing = RecordingPut(fail=True)
+    wal = _wal(tmp_path, failing)
+    wal.append("raw/kept.json", "body")
+    own = wal._dir
+    wal.close(timeout=1)
+    assert os.path.exists(os.path.join(own, "segment-00000001.log"))
+
+    put = RecordingPut()
+    restarted = _wal(tmp_path, put)
+    restarted.start()
+    assert restarted.flush(5)
+    assert put.uploaded == {"raw/kept.json": "body"}
+    assert not os.path.exists(own)
+    restarted.close()
@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+from app.json_stream import IncrementalJSONFieldParser
+
+DOCUMENTS = [
+    # escapes, including an escaped quote and backslash right before the closing quote
+    r'{"movie_script": "She said \"run\"\\", "psychoanalysis": "tab\there\nnewline \/ slash"}',
+    # unicode: literal non-ASCII, a \u escape and a surrogate pair written as escapes
+    '{"movie_script": "café — 清め", "psychoanalysis": "\\u00e9 \\ud83d\\ude00 end"}',
+    # nested objects and arrays whose strings contain brackets, braces and commas
+    '{"style_profile": {"palette": ["#000", "{not a brace}"], "camera": {"moves": [1, [2, 3]], "note": "a, b]"}},'
+    ' "psycho_metadata": {"day_residues": [], "register_feel": null}}',
+    # bare literals ended by a comma, by whitespace and by the closing brace
+    '{"a": 12, "b": -3.5e2 , "c": true,"d": false, "e": null}',
+    # escaped quote and unicode in a key
+    '{"we\\"ird \\u00e9": 1, "x": "y"}',
+]
+
+
+def _feed_all(chunks):
+    parser = IncrementalJSONFieldParser()
+    fields = []
+    for chunk in chunks:
+        fields.extend(parser.feed(chunk))
+    return parser, fields
+
+
+@pytest.mark.parametrize("document", DOCUMENTS)
+def test_split_at_every_offset_matches_json_loads(document):
+    expected = list(json.loads(document).items())
+    for offset in range(len(document) + 1):
+        parser, fields = _feed_all([document[:offset], document[offset:]])
+        assert fields == expected, offset
+        assert parser.done
+
+
+@pytest.mark.parametrize("document", DOCUMENTS)
+def test_one_character_at_a_time_matches_json_loads(document):
+    parser, fields = _feed_all(list(document))
+    assert fields == list(json.loads(document).items())
+    assert parser.done
+
+
+def test_fields_are_emitted_as_soon_as_they_complete():
+    parser = IncrementalJSONFieldParser()
+    assert parser.feed('{"movie_script": "opening sh') == []
+    assert parser.feed('ot", "style_') == [("movie_script", "opening shot")]
+    assert parser.feed('profile": {"a": [1]}') == [("style_profile", {"a": [1]})]
+    assert not parser.done
+    assert parser.feed("}") == []
+    assert parser.done
+
+
+def test_text_around_the_object_is_ignored():
+    document = '{"a": "x", "b": [1, 2]}'
+    fenced = "Sure, here it is:\n```json\n" + document + "\n```\n{not json"
+    for offset in range(len(fenced) + 1):
+        _, fields = _feed_all([fenced[:offset], fenced[offset:]])
+        assert fields == [("a", "x"), ("b", [1, 2])], offset
+
+
+def test_malformed_object_raises():
+    with pytest.raises(ValueError):
+        IncrementalJSONFieldParser().feed('{"a" 1}')
+    with pytest.raises(ValueError):
+        IncrementalJSONFieldParser().feed("{oops: 1}")
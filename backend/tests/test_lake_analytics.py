@@ -0,0 +1,28 @@
+from app.lake_analytics import LAKE_TABLE_PREFIX, MANIFEST_DIR, UNKNOWN_DATE, LakeAnalytics
+from benchmarks.fakes import FakeS3
+
+BUCKET = "lake"
+
+
+def _analytics(*event_dates: str) -> LakeAnalytics:
+    s3 = FakeS3()
+    s3.preload(
+        BUCKET,
+        {f"{LAKE_TABLE_PREFIX}{MANIFEST_DIR}event_date={d}.json": b'{"files": []}' for d in event_dates},
+    )
+    return LakeAnalytics(s3, BUCKET)
+
+
+def test_start_only_range_excludes_unknown_date():
+    lake = _analytics("2024-05-31", "2024-06-01", "2024-06-02", UNKNOWN_DATE)
+    assert sorted(lake._partitions("2024-06-01", None)) == ["2024-06-01", "2024-06-02"]
+
+
+def test_end_only_range_excludes_unknown_date():
+    lake = _analytics("2024-05-31", "2024-06-01", UNKNOWN_DATE)
+    assert sorted(lake._partitions(None, "2024-05-31")) == ["2024-05-31"]
+
+
+def test_unbounded_range_includes_unknown_date():
+    lake = _analytics("2024-06-01", UNKNOWN_DATE)
+    assert sorted(lake._partitions(None, None)) == ["2024-06-01", UNKNOWN_DATE]
@@ -0,0 +1,176 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app import inference_service
+from app import render_backfill as backfill_module
+from app.dream_store import InMemoryDreamStore
+from app.inference_service import build_claude_request, build_model_input, claude_request_model_input
+from app.render_backfill import LocalBatchRunner, LocalStorage, RenderBackfill, _stub_response, render_event_key
+from app.schemas import Dream
+
+RUN_ID = "test-run"
+
+
+class RecordingSearch:
+    def __init__(self):
+        self.signifiers = {}
+
+    def set_signifiers(self, dream, signifiers):
+        self.signifiers[dream.id] = list(signifiers)
+
+
+class CountingRunner(LocalBatchRunner):
+    """LocalBatchRunner that remembers what was submitted and can fail whole jobs."""
+
+    def __init__(self, storage, respond=_stub_response, failed_jobs=()):
+        super().__init__(storage, respond)
+        self.submitted = []
+        self._failed_jobs = set(failed_jobs)
+        self._job_ids = {}
+
+    def submit(self, job_name, input_key, output_prefix, model_id):
+        job_id = super().submit(job_name, input_key, output_prefix, model_id)
+        self.submitted.append(input_key.rsplit("/", 1)[-1])
+        self._job_ids[job_id] = len(self.submitted)
+        return job_id
+
+    def status(self, job_id):
+        return "Failed" if self._job_ids[job_id] in self._failed_jobs else "Completed"
+
+
+@pytest.fixture(autouse=True)
+def search(monkeypatch):
+    recording = RecordingSearch()
+    monkeypatch.setattr(backfill_module, "dream_search", recording)
+    return recording
+
+
+def _store(count):
+    store = InMemoryDreamStore()
+    start = datetime(2024, 6, 1, tzinfo=timezone.utc)
+    for i in range(count):
+        store.put(Dream(
+            id=f"d{i}",
+            created_at=start + timedelta(days=i),
+            title=f"Dream {i}",
+            narrative=f"I was in my mother's house again, number {i}, and the stairs went down forever.",
+        ))
+    return store
+
+
+def _backfill(store, storage, runner):
+    return RenderBackfill(store, storage, runner, RUN_ID, model_id="test-model")
+
+
+def _events(storage, store):
+    events = {}
+    for dream in store.list():
+        body = storage.get(render_event_key(dream, RUN_ID))
+        if body:
+            events[dream.id] = json.loads(body)
+    return events
+
+
+def _failing_for(*dream_ids):
+    def respond(request):
+        if claude_request_model_input(request)["context"]["id"] in dream_ids:
+            raise ValueError("model refused")
+        return _stub_response(request)
+    return respond
+
+
+def test_plan_submit_ingest_writes_one_render_event_per_dream(tmp_path):
+    store, storage = _store(5), LocalStorage(str(tmp_path))
+    runner = CountingRunner(storage)
+    backfill = _backfill(store, storage, runner)
+
+    state = backfill.plan([d.id for d in store.list()], chunk_size=2)
+    assert [c.dream_ids for c in state.chunks] == [["d0", "d1"], ["d2", "d3"], ["d4"]]
+
+    backfill.run(max_jobs=2, poll_seconds=0)
+    assert state.counts() == {"ingested": 3}
+    assert runner.submitted == ["chunk-00000.jsonl", "chunk-00001.jsonl", "chunk-00002.jsonl"]
+
+    events = _events(storage, store)
+    assert sorted(events) == ["d0", "d1", "d2", "d3", "d4"]
+    event = events["d3"]
+    assert event["dream"]["id"] == "d3"
+    assert event["run_id"] == RUN_ID and event["model_id"] == "test-model"
+    assert event["render"]["movie_script"]
+    assert event["batch_job_id"] == state.chunks[1].job_id
+
+    saved = backfill_module.RunState.from_json(storage.get(f"{backfill_module.RENDER_BACKFILL_PREFIX}{RUN_ID}/state.json"))
+    assert saved.counts() == {"ingested": 3}
+
+
+def test_resume_carries_on_without_resubmitting(tmp_path):
+    store, storage = _store(5), LocalStorage(str(tmp_path))
+    first = CountingRunner(storage)
+    backfill = _backfill(store, storage, first)
+    backfill.plan([d.id for d in store.list()], chunk_size=2)
+    backfill.run(max_jobs=1, poll_seconds=0, wait=False)
+    assert first.submitted == ["chunk-00000.jsonl"]
+    assert backfill.state.counts() == {"ingested": 1, "planned": 2}
+
+    second = CountingRunner(storage)
+    resumed = _backfill(store, storage, second)
+    assert resumed.load().counts() == {"ingested": 1, "planned": 2}
+    resumed.run(max_jobs=1, poll_seconds=0)
+    assert second.submitted == ["chunk-00001.jsonl", "chunk-00002.jsonl"]
+    assert resumed.state.counts() == {"ingested": 3}
+    assert len(_events(storage, store)) == 5
+
+
+def test_retry_failed_requeues_failed_jobs_and_failed_records(tmp_path):
+    store, storage = _store(6), LocalStorage(str(tmp_path))
+    # job 2 (d2, d3) fails outright; d4's record fails inside job 3
+    runner = CountingRunner(storage, respond=_failing_for("d4"), failed_jobs={2})
+    backfill = _backfill(store, storage, runner)
+    backfill.plan([d.id for d in store.list()], chunk_size=2)
+    state = backfill.run(max_jobs=3, poll_seconds=0)
+    assert [c.status for c in state.chunks] == ["ingested", "failed", "ingested"]
+    assert state.chunks[2].failed_ids == ["d4"]
+    assert sorted(_events(storage, store)) == ["d0", "d1", "d5"]
+
+    resumed = _backfill(store, storage, CountingRunner(storage))
+    resumed.load()
+    assert resumed.retry_failed(chunk_size=2) == 3
+    assert [c.name for c in resumed.state.chunks if c.status == "planned"] == ["chunk-00001", "chunk-00003"]
+    assert resumed.state.chunks[3].dream_ids == ["d4"]
+
+    state = resumed.run(max_jobs=3, poll_seconds=0)
+    assert state.counts() == {"ingested": 4}
+    assert not any(c.failed_ids for c in state.chunks)
+    assert sorted(_events(storage, store)) == ["d0", "d1", "d2", "d3", "d4", "d5"]
+
+
+def test_cli_resumes_and_retries_failed_records(tmp_path, monkeypatch, capsys):
+    store = _store(3)
+    monkeypatch.setattr(backfill_module, "dream_store", store)
+    respond = [_failing_for("d1")]
+    monkeypatch.setattr(backfill_module, "LocalBatchRunner", lambda storage: LocalBatchRunner(storage, respond[0]))
+    argv = ["--run-id", RUN_ID, "--local", str(tmp_path), "--chunk-size", "2", "--poll-seconds", "0"]
+
+    backfill_module.main(argv)
+    assert "2 renders ingested, 1 failed" in capsys.readouterr().out
+
+    respond[0] = _stub_response
+    backfill_module.main(argv + ["--retry-failed"])
+    out = capsys.readouterr().out
+    assert "Resuming" in out and "Re-queued 1 dreams" in out
+    assert "3 renders ingested, 0 failed" in out
+    assert sorted(_events(LocalStorage(str(tmp_path)), store)) == ["d0", "d1", "d2"]
+
+
+def test_stub_reads_the_dream_from_the_request_whatever_the_template(monkeypatch):
+    dream = _store(1).get("d0").model_copy(update={"narrative": "first\n\nsecond paragraph"})
+    model_input = build_model_input(dream)
+    monkeypatch.setattr(inference_service, "CLAUDE_USER_TEMPLATE", "Dream:\n\n\n{dream_json}\n\nJSON only.\n\nThanks.")
+    request = build_claude_request(model_input)
+    assert claude_request_model_input(request) == model_input
+    assert json.loads(_stub_response(request)["content"][0]["text"])["movie_script"]
+
+    with pytest.raises(ValueError):
+        claude_request_model_input({"messages": [{"content": [{"text": "something else"}]}]})
@@ -13,6 +13,16 @@ interface DreamRenderResponse {
   video_url?: string | null;
 }
 
+interface RenderJob {
+  id: string;
+  stage: "text_model" | "video_queued" | "video_running" | "done" | "failed";
+  movie_script?: string | null;
+  psychoanalysis?: string | null;
+  style_profile?: any;
+  video_url?: string | null;
+  error?: string | null;
+}
+
 type TheaterPageProps = {
   dreamId: string;
   onExit?: () => void;
@@ -29,6 +39,8 @@ export const TheaterPage: React.FC<TheaterPageProps> = ({
   const videoRef = useRef<HTMLVideoElement | null>(null);
 
   useEffect(() => {
+    let cancelled = false;
+
     async function runInference() {
       try {
         setLoading(true);
@@ -47,11 +59,42 @@ export const TheaterPage: React.FC<TheaterPageProps> = ({
           throw new Error(txt || `HTTP ${res.status}`);
         }
 
-        const json = (await res.json()) as DreamRenderResponse;
-        setData(json);
+        // The backend answers 202 with a render job; poll it until the
+        // film is done. Text results show up before the video does.
+        let job = (await res.json()) as RenderJob;
+
+        while (!cancelled) {
+          if (job.movie_script) {
+            setData({
+              movie_script: job.movie_script,
+              psychoanalysis: job.psychoanalysis ?? "",
+              style_profile: job.style_profile,
+              video_url: job.video_url,
+            });
+            setLoading(false);
+          }
+
+          if (job.stage === "failed") {
+            throw new Error(job.error || "Render failed.");
+          }
+
+          if (job.stage === "done") {
+            if (job.video_url) {
+              setCurtainsOpen(true);
+            }
+            break;
+          }
 
-        if (json.video_url) {
-          setCurtainsOpen(true);
+          await new Promise((resolve) => setTimeout(resolve, 2000));
+
+          const pollRes = await fetch(
+            `http://127.0.0.1:8000/render-jobs/${job.id}`
+          );
+          if (!pollRes.ok) {
+            const txt = await pollRes.text();
+            throw new Error(txt || `HTTP ${pollRes.status}`);
+          }
+          job = (await pollRes.json()) as RenderJob;
         }
       } catch (err: any) {
         console.error(err);
@@ -62,6 +105,10 @@ export const TheaterPage: React.FC<TheaterPageProps> = ({
     }
 
     runInference();
+
+    return () => {
+      cancelled = true;
+    };
   }, [dreamId]);
 
   useEffect(() => {